@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Room, Contract, MeterReading, Invoice
+from .models import Room, Contract, MeterReading, Invoice, InvoiceStatusLog, Tariff, Job, ScheduledRun
 
 
 @admin.register(Room)
@@ -45,3 +45,32 @@ class InvoiceAdmin(admin.ModelAdmin):
             'fields': ('issued_at', 'due_date', 'created_at', 'updated_at')
         }),
     )
+
+
+@admin.register(Tariff)
+class TariffAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'name', 'effective_from', 'created_at']
+    list_filter = ['kind']
+    ordering = ['kind', '-effective_from']
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'status', 'attempts', 'progress_done', 'progress_total', 'run_at', 'created_at']
+    list_filter = ['status', 'name']
+    readonly_fields = ['locked_by', 'locked_at', 'started_at', 'finished_at']
+    ordering = ['-created_at']
+
+
+@admin.register(ScheduledRun)
+class ScheduledRunAdmin(admin.ModelAdmin):
+    list_display = ['name', 'scheduled_for', 'status', 'instance', 'duration_ms', 'finished_at']
+    list_filter = ['status', 'name']
+    ordering = ['-scheduled_for']
+
+
+@admin.register(InvoiceStatusLog)
+class InvoiceStatusLogAdmin(admin.ModelAdmin):
+    list_display = ['invoice', 'from_status', 'to_status', 'changed_at', 'changed_by']
+    list_filter = ['to_status']
+    ordering = ['-changed_at']
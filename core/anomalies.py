@@ -0,0 +1,178 @@
+"""
+Phát hiện chỉ số điện nước bất thường (gõ nhầm, rò rỉ, can thiệp đồng hồ).
+
+Mỗi hợp đồng có một mốc tiêu thụ (kWh, m³) tính từ lịch sử các kỳ trước
+(ANOMALY_HISTORY_MONTHS kỳ): trung vị, MAD và tứ phân vị. Một kỳ bị đánh dấu
+khi vừa có robust z-score vượt ANOMALY_Z_THRESHOLD, vừa nằm ngoài hàng rào
+Tukey [Q1 - k*IQR, Q3 + k*IQR] (k = ANOMALY_IQR_K), vừa lệch đủ lớn so với
+trung vị: gấp hơn ANOMALY_MIN_RATIO lần (hoặc dưới 1/ANOMALY_MIN_RATIO) và
+chênh ít nhất ANOMALY_MIN_DELTA đơn vị. Lịch sử đều đặn (10, 10, 10 m³) có
+MAD gần 0 nên z-score rất lớn ngay cả với mức tăng bình thường như 10 → 20 m³;
+hai điều kiện sau chặn các trường hợp đó. Tiêu thụ âm luôn bị đánh dấu.
+
+Toàn bộ lịch sử được đọc bằng một query rồi tính bằng NumPy cho mọi hợp đồng
+cùng lúc (sắp xếp theo nhóm, lấy phân vị theo chỉ số), không lặp theo hợp đồng.
+"""
+import logging
+
+import numpy as np
+from django.conf import settings
+from django.db.models import F
+
+from .models import MeterReading
+
+logger = logging.getLogger(__name__)
+
+METRICS = ("kwh", "m3")
+# Hằng số để MAD tương đương độ lệch chuẩn với phân phối chuẩn (Iglewicz-Hoaglin)
+MAD_SCALE = 0.6745
+
+HIGH = "HIGH"
+LOW = "LOW"
+NEGATIVE = "NEGATIVE"
+
+
+def shift_period(period, months):
+    """Cộng/trừ số tháng cho kỳ YYYY-MM."""
+    year, month = int(period[:4]), int(period[5:7])
+    index = year * 12 + month - 1 + months
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def _group_quantile(values, starts, counts, q):
+    # values đã sắp theo (nhóm, giá trị); nội suy tuyến tính như np.quantile
+    position = starts + q * (counts - 1)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.ceil(position).astype(np.int64)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def group_baselines(groups, values):
+    """
+    Thống kê theo nhóm cho mảng groups (số nguyên) và values.
+
+    Trả về (keys, counts, median, mad, q1, q3), mỗi mảng một phần tử cho mỗi
+    nhóm, keys tăng dần.
+    """
+    order = np.lexsort((values, groups))
+    groups, values = groups[order], values[order]
+    keys, starts, counts = np.unique(groups, return_index=True, return_counts=True)
+    median = _group_quantile(values, starts, counts, 0.5)
+    q1 = _group_quantile(values, starts, counts, 0.25)
+    q3 = _group_quantile(values, starts, counts, 0.75)
+    deviation = np.abs(values - np.repeat(median, counts))
+    deviation = deviation[np.lexsort((deviation, groups))]
+    mad = _group_quantile(deviation, starts, counts, 0.5)
+    return keys, counts, median, mad, q1, q3
+
+
+def score_readings(history_groups, history_values, groups, values, min_delta=0.0):
+    """
+    So sánh values (kỳ cần kiểm tra, theo groups) với lịch sử cùng nhóm;
+    min_delta là độ lệch tuyệt đối tối thiểu so với trung vị để bị đánh dấu.
+
+    Trả về dict các mảng cùng độ dài với values: evaluated (đủ lịch sử),
+    flagged, z, median, mad, q1, q3.
+    """
+    size = len(values)
+    result = {name: np.full(size, np.nan) for name in ("z", "median", "mad", "q1", "q3")}
+    result["evaluated"] = np.zeros(size, dtype=bool)
+    result["flagged"] = values < 0
+    if not len(history_values) or not size:
+        return result
+
+    keys, counts, median, mad, q1, q3 = group_baselines(history_groups, history_values)
+    index = np.minimum(np.searchsorted(keys, groups), len(keys) - 1)
+    evaluated = (keys[index] == groups) & (counts[index] >= settings.ANOMALY_MIN_HISTORY)
+
+    median, mad, q1, q3 = median[index], mad[index], q1[index], q3[index]
+    # Lịch sử gần như không đổi thì MAD/IQR = 0: dùng sàn theo tỉ lệ trung vị
+    floor = np.maximum(np.abs(median) * settings.ANOMALY_MIN_SPREAD, 1.0)
+    z = MAD_SCALE * (values - median) / np.maximum(mad, floor)
+    iqr = np.maximum(q3 - q1, floor)
+    k = settings.ANOMALY_IQR_K
+    outside = (values > q3 + k * iqr) | (values < q1 - k * iqr)
+    ratio = settings.ANOMALY_MIN_RATIO
+    large = (np.abs(values - median) >= min_delta) & ((values > median * ratio) | (values < median / ratio))
+    flagged = evaluated & (np.abs(z) > settings.ANOMALY_Z_THRESHOLD) & outside & large
+
+    result.update(
+        evaluated=evaluated,
+        flagged=result["flagged"] | flagged,
+        z=np.where(evaluated, z, np.nan),
+        median=np.where(evaluated, median, np.nan),
+        mad=np.where(evaluated, mad, np.nan),
+        q1=np.where(evaluated, q1, np.nan),
+        q3=np.where(evaluated, q3, np.nan),
+    )
+    return result
+
+
+def _number(value, digits=2):
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def detect_anomalies(period, contract_ids=None):
+    """
+    Kiểm tra chỉ số kỳ period (có thể giới hạn theo contract_ids).
+
+    Trả về {"checked", "evaluated", "results": [...]}, mỗi phần tử results là
+    một chỉ số bất thường: reading, contract, metric (kwh/m3), value, median,
+    mad, q1, q3, z, direction (HIGH/LOW/NEGATIVE), history.
+    """
+    start = shift_period(period, -settings.ANOMALY_HISTORY_MONTHS)
+    readings = MeterReading.objects.filter(period__gte=start, period__lte=period)
+    if contract_ids is not None:
+        readings = readings.filter(contract_id__in=contract_ids)
+    rows = list(
+        readings.annotate(kwh=F("elec_curr") - F("elec_prev"), m3=F("water_curr") - F("water_prev"))
+        .values_list("id", "contract_id", "period", "kwh", "m3")
+    )
+    if not rows:
+        return {"checked": 0, "evaluated": 0, "results": []}
+
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    contracts = np.array([row[1] for row in rows], dtype=np.int64)
+    current = np.array([row[2] == period for row in rows], dtype=bool)
+    usage = {
+        "kwh": np.array([row[3] for row in rows], dtype=np.float64),
+        "m3": np.array([row[4] for row in rows], dtype=np.float64),
+    }
+    history = ~current
+    current_ids, current_contracts = ids[current], contracts[current]
+
+    results = []
+    evaluated = np.zeros(int(current.sum()), dtype=bool)
+    history_counts = dict(zip(*np.unique(contracts[history], return_counts=True)))
+    for metric in METRICS:
+        values = usage[metric][current]
+        scores = score_readings(
+            contracts[history], usage[metric][history], current_contracts, values,
+            min_delta=settings.ANOMALY_MIN_DELTA[metric],
+        )
+        evaluated |= scores["evaluated"]
+        for i in np.flatnonzero(scores["flagged"]):
+            value = values[i]
+            if value < 0:
+                direction = NEGATIVE
+            else:
+                direction = HIGH if value > scores["median"][i] else LOW
+            results.append({
+                "reading": int(current_ids[i]),
+                "contract": int(current_contracts[i]),
+                "period": period,
+                "metric": metric,
+                "value": _number(value),
+                "median": _number(scores["median"][i]),
+                "mad": _number(scores["mad"][i]),
+                "q1": _number(scores["q1"][i]),
+                "q3": _number(scores["q3"][i]),
+                "z": _number(scores["z"][i]),
+                "direction": direction,
+                "history": int(history_counts.get(current_contracts[i], 0)),
+            })
+
+    results.sort(key=lambda item: (item["contract"], item["metric"]))
+    checked = int(current.sum())
+    logger.info("detect_anomalies(%s): %s readings, %s flagged", period, checked, len(results))
+    return {"checked": checked, "evaluated": int(evaluated.sum()), "results": results}
@@ -1,6 +1,24 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def _ensure_fulltext_index(sender, using, **kwargs):
+    from django.db import connections
+    from .search import install_fulltext_index
+    conn = connections[using]
+    with conn.cursor() as cursor:
+        if "core_room" not in conn.introspection.table_names(cursor):
+            return
+        columns = {c.name for c in conn.introspection.get_table_description(cursor, "core_room")}
+    # Chỉ khi đã có cột search_document (migrate ngược về trước 0018 thì bỏ qua)
+    if "search_document" in columns:
+        install_fulltext_index(conn)
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        post_migrate.connect(_ensure_fulltext_index, sender=self)
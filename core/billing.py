@@ -0,0 +1,167 @@
+"""
+Lập hóa đơn hàng loạt cho mọi hợp đồng ACTIVE trong một hoặc nhiều kỳ
+(POST /api/invoices/generate-batch/, lệnh generate_invoices).
+
+Hợp đồng, chỉ số và hóa đơn đã có được đọc bằng ba query cho cả lô, tiền
+điện nước tính theo bảng giá trong một lượt (core.tariffs), rồi bulk_create
+các hóa đơn. Cặp (contract, period) đã có hóa đơn thì bỏ qua nên chạy lại
+nhiều lần vẫn cho cùng kết quả; created chỉ đếm hóa đơn thực sự được chèn,
+dry_run trả về would_create thay cho created.
+"""
+import calendar
+import logging
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .anomalies import detect_anomalies, shift_period
+from .jobs import report_progress
+from .models import Contract, Invoice, InvoiceStatusLog, MeterReading
+from .tariffs import reading_costs
+
+logger = logging.getLogger(__name__)
+
+MAX_PERIODS = 24
+
+
+def period_range(start, end):
+    """Các kỳ YYYY-MM từ start tới end (tính cả hai đầu)."""
+    periods = []
+    period = start
+    while period <= end:
+        periods.append(period)
+        period = shift_period(period, 1)
+    return periods
+
+
+def period_bounds(period):
+    year, month = int(period[:4]), int(period[5:7])
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def invoice_room_price(monthly_rent, base_price):
+    # Giá thuê trên hợp đồng (có thể đã tăng khi gia hạn), hợp đồng cũ chưa có thì theo giá phòng
+    return monthly_rent if monthly_rent else base_price
+
+
+def generate_invoices(periods, contracts=None, service_cost=Decimal("0"), due_days=30, force=False, dry_run=False):
+    """
+    Lập hóa đơn cho các hợp đồng ACTIVE (trong queryset contracts nếu có) có
+    hiệu lực trong từng kỳ của periods.
+
+    Bỏ qua: cặp đã có hóa đơn (existing), chưa có chỉ số điện nước
+    (missing_reading) và chỉ số bất thường theo core.anomalies (anomaly, trừ
+    khi force). Trả về {"created", "existing", "missing_reading": [...],
+    "anomaly": [...]}; hai danh sách gồm các {"contract", "period"}.
+    """
+    periods = sorted(set(periods))
+    first_day, _ = period_bounds(periods[0])
+    _, last_day = period_bounds(periods[-1])
+    contracts = Contract.objects.all() if contracts is None else contracts
+    contracts = contracts.filter(status=Contract.ACTIVE, start_date__lte=last_day, end_date__gte=first_day)
+
+    # 1. Hợp đồng, 2. chỉ số, 3. hóa đơn đã có: mỗi loại một query cho cả lô
+    rows = list(contracts.order_by("pk").values("id", "start_date", "end_date", "monthly_rent", "room__base_price"))
+    readings = {
+        (reading.contract_id, reading.period): reading
+        for reading in MeterReading.objects.filter(contract__in=contracts, period__in=periods)
+    }
+    existing = set(
+        Invoice.objects.filter(contract__in=contracts, period__in=periods).values_list("contract_id", "period")
+    )
+
+    report_progress(0, 3, "Đã đọc hợp đồng và chỉ số")
+    flagged = set()
+    if not force:
+        for period in periods:
+            report = detect_anomalies(period, contract_ids=contracts.values("pk"))
+            flagged.update((item["contract"], period) for item in report["results"])
+
+    pending = []
+    stats = {"created": 0, "existing": 0, "missing_reading": [], "anomaly": []}
+    for period in periods:
+        start, end = period_bounds(period)
+        for row in rows:
+            if row["start_date"] > end or row["end_date"] < start:
+                continue
+            key = (row["id"], period)
+            if key in existing:
+                stats["existing"] += 1
+            elif key not in readings:
+                stats["missing_reading"].append({"contract": row["id"], "period": period})
+            elif key in flagged:
+                stats["anomaly"].append({"contract": row["id"], "period": period})
+            else:
+                pending.append((row, readings[key]))
+
+    report_progress(1, 3, "Đang tính tiền điện nước")
+    # Tiền điện nước cho cả lô trong một lượt
+    costs = reading_costs([reading for _, reading in pending])
+    now = timezone.now()
+    due_date = timezone.localdate() + timedelta(days=due_days)
+    invoices = []
+    for (row, reading), (elec_cost, water_cost) in zip(pending, costs):
+        room_price = invoice_room_price(row["monthly_rent"], row["room__base_price"])
+        invoices.append(Invoice(
+            contract_id=row["id"],
+            period=reading.period,
+            room_price=room_price,
+            elec_cost=elec_cost,
+            water_cost=water_cost,
+            service_cost=service_cost,
+            # bulk_create không gọi Invoice.save() nên tự tính tổng
+            total=room_price + elec_cost + water_cost + service_cost,
+            status=Invoice.UNPAID,
+            issued_at=now,
+            due_date=due_date,
+        ))
+
+    report_progress(2, 3, f"Đang lưu {len(invoices)} hóa đơn")
+    if dry_run:
+        stats["would_create"] = len(invoices)
+    elif invoices:
+        with transaction.atomic():
+            # ignore_conflicts: hóa đơn vừa được tạo song song thì bỏ qua thay vì lỗi
+            Invoice.objects.bulk_create(
+                invoices, batch_size=settings.BULK_IMPORT_BATCH_SIZE, ignore_conflicts=True
+            )
+            # bulk_create bỏ qua xung đột không cho biết dòng nào được chèn: hóa đơn
+            # của lần chạy này là những dòng mang đúng issued_at = now
+            stats["created"] = Invoice.objects.filter(
+                contract_id__in={invoice.contract_id for invoice in invoices},
+                period__in=periods,
+                issued_at=now,
+            ).count()
+        stats["existing"] += len(invoices) - stats["created"]
+    report_progress(3, 3, "Hoàn tất")
+
+    logger.info(
+        "generate_invoices(%s..%s, dry_run=%s): created=%s would_create=%s existing=%s missing_reading=%s anomaly=%s",
+        periods[0], periods[-1], dry_run, stats["created"], stats.get("would_create", 0), stats["existing"],
+        len(stats["missing_reading"]), len(stats["anomaly"]),
+    )
+    return stats
+
+
+def change_invoice_status(invoice, to_status, user=None):
+    """
+    Chuyển invoice từ trạng thái đang đọc được sang to_status và ghi
+    InvoiceStatusLog trong cùng một transaction, như mark_overdue_invoices.
+    UPDATE có điều kiện status nên nếu thao tác khác đã đổi trạng thái trước
+    thì không ghi gì và trả về False.
+    """
+    now = timezone.now()
+    from_status = invoice.status
+    with transaction.atomic():
+        changed = Invoice.objects.filter(pk=invoice.pk, status=from_status).update(status=to_status, updated_at=now)
+        if not changed:
+            return False
+        InvoiceStatusLog.objects.create(
+            invoice=invoice, from_status=from_status, to_status=to_status, changed_at=now, changed_by=user
+        )
+    invoice.status = to_status
+    invoice.updated_at = now
+    return True
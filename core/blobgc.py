@@ -0,0 +1,107 @@
+"""
+Dọn blob không còn được dùng (`manage.py gc_blobs`, tác vụ gc_blobs).
+
+Blob lưu theo nội dung nên một key có thể được nhiều phòng/hợp đồng dùng
+chung, và upload của request khác có thể trả về đúng key mà request này vừa
+tạo (created=False). Vì vậy request lỗi chỉ xoá blob do chính nó tạo ra và
+chưa dòng nào tham chiếu (discard_unreferenced); mọi trường hợp còn lại để
+gc_blobs dọn định kỳ. gc_blobs chỉ xoá blob cũ hơn BLOB_GC_MIN_AGE giây để
+không đụng vào ảnh vừa upload nhưng chưa kịp gắn vào phòng/hợp đồng.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.db.models import Q
+
+from .blobstore import KEY_RE, URL_KEY_RE, get_blob_store, get_private_blob_store
+from .models import Contract, Room
+
+logger = logging.getLogger(__name__)
+
+
+def is_referenced(key):
+    """Có phòng (image/images) hoặc hợp đồng (contract_image) nào đang dùng blob key không."""
+    return (
+        Room.objects.filter(Q(image__contains=key) | Q(images__icontains=key)).exists()
+        or Contract.objects.filter(contract_image__endswith=key).exists()
+    )
+
+
+def discard_unreferenced(store, keys):
+    """Xoá các blob request vừa tạo (created=True) nếu chưa dòng nào tham chiếu; trả về số blob đã xoá."""
+    deleted = 0
+    for key in keys:
+        if is_referenced(key):
+            continue
+        store.delete(key)
+        deleted += 1
+    return deleted
+
+
+def _url_key(url):
+    if not isinstance(url, str) or not url or url.startswith("data:"):
+        return None
+    match = URL_KEY_RE.search(url.split("?", 1)[0])
+    return match.group("key") if match else None
+
+
+def referenced_keys():
+    """Tập key đang được phòng hoặc hợp đồng tham chiếu (đọc một lượt cả hai bảng)."""
+    keys = set()
+    rooms = Room.objects.values_list("image", "images").iterator(chunk_size=500)
+    for image, images in rooms:
+        for url in [image] + (images if isinstance(images, list) else []):
+            key = _url_key(url)
+            if key:
+                keys.add(key)
+    for name in Contract.objects.exclude(contract_image="").exclude(contract_image__isnull=True).values_list(
+        "contract_image", flat=True
+    ).iterator(chunk_size=500):
+        key = _url_key(name)
+        if key:
+            keys.add(key)
+    return keys
+
+
+def _collect(store, in_use, cutoff, dry_run, stats):
+    if not store.root.exists():
+        return
+    for path in store.root.glob("[0-9a-f][0-9a-f]/[0-9a-f][0-9a-f]/*"):
+        key = path.name
+        if not KEY_RE.match(key):
+            # Bản WebP/AVIF sinh ra cạnh ảnh gốc, bị xoá cùng ảnh gốc
+            continue
+        stats["checked"] += 1
+        if key in in_use:
+            continue
+        stat = path.stat()
+        if stat.st_mtime > cutoff:
+            continue
+        stats["deleted"] += 1
+        stats["bytes"] += stat.st_size
+        if not dry_run:
+            store.delete(key)
+    # File tạm của upload bị ngắt giữa chừng
+    for path in (store.root / ".incoming").glob(".tmp-*"):
+        if path.stat().st_mtime <= cutoff:
+            stats["temp_files"] += 1
+            if not dry_run:
+                path.unlink(missing_ok=True)
+
+
+def gc_blobs(min_age=None, dry_run=False):
+    """
+    Xoá blob (cùng thumbnail, bản WebP/AVIF) trong store công khai và store
+    ảnh hợp đồng mà không phòng/hợp đồng nào tham chiếu và cũ hơn min_age giây
+    (mặc định BLOB_GC_MIN_AGE). Trả về dict thống kê.
+    """
+    min_age = settings.BLOB_GC_MIN_AGE if min_age is None else min_age
+    cutoff = time.time() - min_age
+    # Đọc tham chiếu trước khi quét file: blob tạo sau thời điểm này đều mới hơn cutoff
+    in_use = referenced_keys()
+    stats = {"checked": 0, "deleted": 0, "bytes": 0, "temp_files": 0}
+    for store in (get_blob_store(), get_private_blob_store()):
+        _collect(store, in_use, cutoff, dry_run, stats)
+    logger.info("gc_blobs: %s", stats)
+    return stats
@@ -0,0 +1,292 @@
+"""
+Kho lưu ảnh theo nội dung (content-addressed blob store).
+
+Mỗi blob được định danh bằng SHA-256 của nội dung nên cùng một ảnh chỉ được
+lưu một lần dù nhiều phòng dùng chung. Các bản ghi trong DB chỉ giữ URL ngắn
+thay vì cả chuỗi base64.
+
+    store = get_blob_store()
+    key = store.save(data, "png")      # "<sha256>.png"
+    store.url(key)                     # "/media/blobs/ab/cd/<sha256>.png"
+
+Ảnh hợp đồng nằm trong một store riêng (get_private_blob_store) dưới
+PRIVATE_MEDIA_ROOT, không có URL công khai.
+"""
+import base64
+import binascii
+import hashlib
+import os
+import re
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+
+# Định dạng ảnh được chấp nhận (content type -> phần mở rộng)
+CONTENT_TYPE_EXTENSIONS = {
+    "image/jpeg": "jpg",
+    "image/jpg": "jpg",
+    "image/png": "png",
+    "image/gif": "gif",
+    "image/webp": "webp",
+    "image/avif": "avif",
+}
+EXTENSION_CONTENT_TYPES = {
+    "jpg": "image/jpeg",
+    "png": "image/png",
+    "gif": "image/gif",
+    "webp": "image/webp",
+    "avif": "image/avif",
+}
+
+# Tham chiếu blob mà client gửi lại cho serializer sau khi upload: "blob:<key>"
+BLOB_REF_PREFIX = "blob:"
+
+KEY_RE = re.compile(r"^(?P<digest>[0-9a-f]{64})\.(?P<ext>[a-z0-9]{2,5})$")
+URL_KEY_RE = re.compile(r"(?P<key>[0-9a-f]{64}\.[a-z0-9]{2,5})$")
+# Đường dẫn bên trong store: [thumbs/<size>/]ab/cd/<key>
+RELPATH_RE = re.compile(
+    r"^(?:thumbs/(?P<size>\d+)/)?(?P<d1>[0-9a-f]{2})/(?P<d2>[0-9a-f]{2})/"
+    r"(?P<key>(?P<digest>[0-9a-f]{64})\.(?P<ext>[a-z0-9]{2,5}))$"
+)
+
+
+class BlobError(ValueError):
+    """Dữ liệu ảnh không hợp lệ hoặc không lưu được."""
+
+
+class LocalBlobStore:
+    """Backend lưu blob trên filesystem, dưới MEDIA_ROOT/<BLOB_STORAGE_DIR>."""
+
+    def __init__(self, root, base_url):
+        self.root = Path(root)
+        self.base_url = base_url if base_url.endswith("/") else base_url + "/"
+
+    @staticmethod
+    def make_key(digest, ext):
+        return f"{digest}.{ext}"
+
+    def relpath(self, key):
+        match = KEY_RE.match(key)
+        if not match:
+            raise BlobError(f"Blob key không hợp lệ: {key}")
+        digest = match.group("digest")
+        return f"{digest[:2]}/{digest[2:4]}/{key}"
+
+    def path(self, key):
+        return self.root / self.relpath(key)
+
+    def url(self, key):
+        return self.base_url + self.relpath(key)
+
+    def exists(self, key):
+        return self.path(key).exists()
+
+    def open(self, key):
+        return open(self.path(key), "rb")
+
+    def size(self, key):
+        return self.path(key).stat().st_size
+
+    def thumbnail_relpath(self, key, size):
+        return f"thumbs/{size}/{self.relpath(key)}"
+
+    def thumbnail_path(self, key, size):
+        return self.root / self.thumbnail_relpath(key, size)
+
+    def thumbnail_url(self, key, size):
+        return self.base_url + self.thumbnail_relpath(key, size)
+
+    def save(self, data, ext):
+        """Lưu bytes, trả về key. Nếu nội dung đã tồn tại thì không ghi lại."""
+        key = self.make_key(hashlib.sha256(data).hexdigest(), ext)
+        target = self.path(key)
+        if target.exists():
+            # Làm mới mtime để gc_blobs không xoá blob vừa được dùng lại
+            os.utime(target)
+        else:
+            self._write_atomic(target, data)
+        return key
+
+    def media_name(self, key):
+        """Đường dẫn tương đối với MEDIA_ROOT, dùng để gán cho FileField."""
+        return f"{settings.BLOB_STORAGE_DIR.strip('/')}/{self.relpath(key)}"
+
+    def open_temp(self):
+        """File tạm cùng filesystem với store, dùng khi ghi blob theo luồng."""
+        incoming = self.root / ".incoming"
+        incoming.mkdir(parents=True, exist_ok=True)
+        return tempfile.NamedTemporaryFile(dir=incoming, prefix=".tmp-", delete=False)
+
+    def commit_temp(self, tmp_path, digest, ext):
+        """
+        Chuyển file tạm đã ghi xong vào vị trí theo nội dung.
+        Trả về (key, created); nếu blob đã tồn tại thì file tạm bị xoá.
+        """
+        key = self.make_key(digest, ext)
+        target = self.path(key)
+        if target.exists():
+            os.unlink(tmp_path)
+            os.utime(target)
+            return key, False
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp_path, target)
+        return key, True
+
+    def delete(self, key):
+        """
+        Xoá blob cùng thumbnail và các bản WebP/AVIF sinh ra từ nó. Không kiểm
+        tra tham chiếu: dùng core.blobgc.discard_unreferenced thay vì gọi thẳng.
+        """
+        for path in [self.path(key)] + [
+            self.thumbnail_path(key, size) for size in settings.ROOM_IMAGE_THUMBNAIL_SIZES
+        ]:
+            for candidate in [path, *path.parent.glob(f"{path.name}.*")]:
+                if candidate.exists():
+                    candidate.unlink()
+
+    def save_thumbnail(self, key, size, data):
+        self._write_atomic(self.thumbnail_path(key, size), data)
+
+    @staticmethod
+    def _write_atomic(target, data):
+        target.parent.mkdir(parents=True, exist_ok=True)
+        # Ghi ra file tạm rồi rename để không bao giờ có blob ghi dở
+        fd, tmp_path = tempfile.mkstemp(dir=target.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(data)
+            os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def resolve_relpath(self, relpath):
+        """
+        Kiểm tra đường dẫn tương đối do client yêu cầu, trả về
+        (path, key, size) với size là cỡ thumbnail hoặc None; None nếu không hợp lệ.
+        """
+        match = RELPATH_RE.match(relpath)
+        if not match or match.group("digest")[:4] != match.group("d1") + match.group("d2"):
+            return None
+        key = match.group("key")
+        size = match.group("size")
+        if size is None:
+            return self.path(key), key, None
+        if int(size) not in settings.ROOM_IMAGE_THUMBNAIL_SIZES:
+            return None
+        return self.thumbnail_path(key, int(size)), key, int(size)
+
+    def key_from_url(self, url):
+        """Lấy lại key từ URL do store này sinh ra, None nếu không phải blob."""
+        if not url or not isinstance(url, str):
+            return None
+        path = url.split("?", 1)[0]
+        if self.base_url not in path:
+            return None
+        match = URL_KEY_RE.search(path)
+        return match.group("key") if match else None
+
+
+_default_store = None
+_private_store = None
+
+
+def get_blob_store():
+    global _default_store
+    if _default_store is None:
+        blob_dir = settings.BLOB_STORAGE_DIR.strip("/")
+        _default_store = LocalBlobStore(
+            root=Path(settings.MEDIA_ROOT) / blob_dir,
+            base_url=f"{settings.MEDIA_URL}{blob_dir}/",
+        )
+    return _default_store
+
+
+def get_private_blob_store():
+    """Store cho ảnh hợp đồng; url() là đường dẫn internal cho X-Accel-Redirect, không truy cập trực tiếp được."""
+    global _private_store
+    if _private_store is None:
+        blob_dir = settings.BLOB_STORAGE_DIR.strip("/")
+        _private_store = LocalBlobStore(
+            root=Path(settings.PRIVATE_MEDIA_ROOT) / blob_dir,
+            base_url=f"{settings.PRIVATE_SENDFILE_PREFIX.rstrip('/')}/{blob_dir}/",
+        )
+    return _private_store
+
+
+def private_storage():
+    """Storage của Contract.contract_image (callable để không cố định đường dẫn trong migration)."""
+    return FileSystemStorage(location=settings.PRIVATE_MEDIA_ROOT, base_url=settings.PRIVATE_SENDFILE_PREFIX)
+
+
+def is_data_uri(value):
+    return isinstance(value, str) and value.startswith("data:image/")
+
+
+def decode_data_uri(value):
+    """Tách data URI 'data:image/png;base64,...' thành (bytes, ext)."""
+    try:
+        header, encoded = value.split(";base64,", 1)
+    except ValueError:
+        raise BlobError("Ảnh base64 không đúng định dạng data URI")
+    content_type = header[len("data:"):].lower()
+    ext = CONTENT_TYPE_EXTENSIONS.get(content_type)
+    if ext is None:
+        raise BlobError(f"Định dạng ảnh không được hỗ trợ: {content_type}")
+    try:
+        data = base64.b64decode(encoded, validate=False)
+    except (binascii.Error, ValueError):
+        raise BlobError("Dữ liệu base64 bị lỗi")
+    if not data:
+        raise BlobError("Ảnh rỗng")
+    return data, ext
+
+
+def sniff_image_ext(head):
+    """Nhận dạng định dạng ảnh từ các byte đầu file (không tin content type của client)."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    if head[4:12] in (b"ftypavif", b"ftypavis"):
+        return "avif"
+    return None
+
+
+def is_blob_ref(value):
+    return isinstance(value, str) and value.startswith(BLOB_REF_PREFIX)
+
+
+def resolve_blob_ref(value, store=None):
+    """Trả về key của tham chiếu 'blob:<key>', raise BlobError nếu blob không tồn tại trong store."""
+    store = store or get_blob_store()
+    key = value[len(BLOB_REF_PREFIX):]
+    if not KEY_RE.match(key) or not store.exists(key):
+        raise BlobError(f"Không tìm thấy ảnh đã upload: {value}")
+    return key
+
+
+def save_data_uri(value, store=None):
+    """Lưu ảnh data URI nguyên bản (không chuẩn hoá) vào blob store, trả về key."""
+    data, ext = decode_data_uri(value)
+    return (store or get_blob_store()).save(data, ext)
+
+
+def store_image(value):
+    """
+    Nếu value là data URI thì lưu vào blob store và trả về URL của blob,
+    tham chiếu 'blob:<key>' được đổi thành URL, còn lại (URL, chuỗi rỗng,
+    None) trả về nguyên giá trị.
+    """
+    if is_blob_ref(value):
+        return get_blob_store().url(resolve_blob_ref(value))
+    if not is_data_uri(value):
+        return value
+    return get_blob_store().url(save_data_uri(value))
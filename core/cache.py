@@ -0,0 +1,130 @@
+"""
+Cache response cho danh sách/chi tiết phòng.
+
+Key của mỗi response chứa số phiên bản của bảng phòng. Với cache dùng chung
+giữa các process (file, redis) đó là bộ đếm ROOM_VERSION_KEY trong cache:
+mỗi lần Room được lưu/xoá (core.signals) hoặc ghi hàng loạt
+(bump_room_version) thì phiên bản tăng lên, mọi key cũ tự hết hiệu lực
+mà không phải xoá từng key, và request trúng cache không chạm tới DB.
+Với locmem, bộ đếm của process này không thấy thay đổi từ worker/scheduler
+khác nên phiên bản được lấy từ DB (số phòng + updated_at lớn nhất), giống
+get_tariff_version/get_contract_version. Khi cache miss, chỉ một worker
+được tính lại (khoá bằng cache.add), các worker khác chờ kết quả thay vì
+cùng query DB.
+"""
+import hashlib
+import logging
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import Count, Max
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import Room
+
+logger = logging.getLogger(__name__)
+
+ROOM_VERSION_KEY = "rooms:version"
+LOCK_POLL_INTERVAL = 0.05
+
+
+def get_cache():
+    return caches[settings.ROOM_CACHE_ALIAS]
+
+
+def get_version(key):
+    cache = get_cache()
+    version = cache.get(key)
+    if version is None:
+        # Khởi tạo theo thời gian để không dùng lại số phiên bản cũ khi key bị evict
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    cache = get_cache()
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = int(time.time() * 1000)
+        cache.set(key, version, timeout=None)
+        return version
+
+
+def is_shared(cache):
+    """Cache có dùng chung giữa các process (worker web, scheduler, job worker) không."""
+    return not isinstance(cache, (LocMemCache, DummyCache))
+
+
+def get_room_version():
+    if is_shared(get_cache()):
+        return get_version(ROOM_VERSION_KEY)
+    version = Room.objects.aggregate(count=Count("id"), updated=Max("updated_at"))
+    updated = version["updated"].timestamp() if version["updated"] else 0
+    return f"{version['count']}-{int(updated * 1_000_000)}"
+
+
+def bump_room_version():
+    """Gọi sau mọi thay đổi bảng phòng không đi qua Room.save()/delete() (bulk_create, update...)."""
+    return bump_version(ROOM_VERSION_KEY)
+
+
+def room_cache_key(request, scope, ignore_params=()):
+    # Host nằm trong key vì URL ảnh trong response là URL tuyệt đối
+    params = sorted(
+        (name, value) for name, values in request.query_params.lists()
+        if name not in ignore_params for value in values
+    )
+    raw = f"{request.get_host()}|{request.path}?{urlencode(params)}|{request.accepted_media_type}"
+    digest = hashlib.sha1(raw.encode()).hexdigest()
+    return f"rooms:v{get_room_version()}:{scope}:{digest}"
+
+
+def cached_room_response(request, scope, compute, ignore_params=()):
+    """
+    Trả response từ cache nếu có, ngược lại gọi compute() (trả về Response)
+    và lưu lại kết quả 200. Header X-Cache cho biết HIT/MISS.
+    Tham số query trong ignore_params không ảnh hưởng tới key.
+    """
+    cache = get_cache()
+    timeout = settings.ROOM_CACHE_TIMEOUT
+    key = room_cache_key(request, scope, ignore_params)
+
+    hit = cache.get(key)
+    if hit is not None:
+        return _cached(hit, "HIT")
+
+    lock_key = f"{key}:lock"
+    if not cache.add(lock_key, 1, timeout=settings.ROOM_CACHE_LOCK_TIMEOUT):
+        # Worker khác đang tính: chờ kết quả, hết thời gian thì tự tính
+        deadline = time.monotonic() + settings.ROOM_CACHE_LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            hit = cache.get(key)
+            if hit is not None:
+                return _cached(hit, "HIT")
+        logger.warning("Timed out waiting for room cache key %s", key)
+        return _mark(compute(), "MISS")
+
+    try:
+        response = compute()
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, timeout=timeout)
+    finally:
+        cache.delete(lock_key)
+    return _mark(response, "MISS")
+
+
+def _cached(data, state):
+    return _mark(Response(data), state)
+
+
+def _mark(response, state):
+    response["X-Cache"] = state
+    return response
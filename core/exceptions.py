@@ -0,0 +1,20 @@
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class ConflictError(APIException):
+    """Dữ liệu đã bị thay đổi bởi thao tác khác (phòng vừa được thuê...), trả về 409."""
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Dữ liệu đã bị thay đổi bởi thao tác khác, vui lòng thử lại"
+    default_code = "conflict"
+
+
+class LockTimeoutError(ConflictError):
+    """
+    CSDL không khoá được dòng kịp (SQLite "database is locked", lock timeout
+    hay lỗi serialization trên PostgreSQL): 409 kèm Retry-After để client thử lại.
+    """
+    default_detail = "Hệ thống đang bận xử lý yêu cầu khác cho dữ liệu này, vui lòng thử lại sau giây lát"
+    default_code = "lock_timeout"
+    # DRF thêm header Retry-After (giây) khi exception có thuộc tính wait
+    wait = 1
@@ -0,0 +1,64 @@
+import django_filters
+from django.conf import settings
+from django.db.models import Count, Max, Min, Q
+
+from .models import Room
+
+
+class RoomFilterSet(django_filters.FilterSet):
+    """
+    Lọc phòng theo khoảng giá, diện tích, số phòng ngủ/tắm và trạng thái.
+    Ví dụ: /api/rooms/?status=EMPTY&base_price__gte=2000000&base_price__lte=5000000&bedrooms__gte=2
+    Các cột lọc được hỗ trợ bởi index khai báo trong Room.Meta.
+    """
+
+    class Meta:
+        model = Room
+        fields = {
+            "base_price": ["gte", "lte"],
+            "area_m2": ["gte", "lte"],
+            "bedrooms": ["exact", "gte", "lte"],
+            "bathrooms": ["exact", "gte", "lte"],
+            "status": ["exact", "in"],
+        }
+
+
+def room_facets(queryset):
+    """
+    Đếm phòng theo trạng thái, số phòng ngủ và khoảng giá trên queryset đã
+    lọc, tất cả trong một câu aggregate (COUNT(*) FILTER (WHERE ...)).
+    """
+    buckets = list(settings.ROOM_PRICE_BUCKETS)
+    bedroom_values = list(settings.ROOM_BEDROOM_FACETS)
+
+    aggregates = {
+        "total": Count("id"),
+        "price_min": Min("base_price"),
+        "price_max": Max("base_price"),
+    }
+    for value, _label in Room.STATUS_CHOICES:
+        aggregates[f"status_{value}"] = Count("id", filter=Q(status=value))
+    for value in bedroom_values:
+        aggregates[f"bedrooms_{value}"] = Count("id", filter=Q(bedrooms=value))
+    aggregates["bedrooms_more"] = Count("id", filter=Q(bedrooms__gt=bedroom_values[-1]))
+    ranges = list(zip(buckets, buckets[1:] + [None]))
+    for i, (low, high) in enumerate(ranges):
+        condition = Q(base_price__gte=low)
+        if high is not None:
+            condition &= Q(base_price__lt=high)
+        aggregates[f"price_{i}"] = Count("id", filter=condition)
+
+    row = queryset.order_by().aggregate(**aggregates)
+
+    bedrooms = {str(value): row[f"bedrooms_{value}"] for value in bedroom_values}
+    bedrooms[f"{bedroom_values[-1] + 1}+"] = row["bedrooms_more"]
+    return {
+        "total": row["total"],
+        "status": {value: row[f"status_{value}"] for value, _label in Room.STATUS_CHOICES},
+        "bedrooms": bedrooms,
+        "price": [
+            {"min": low, "max": high, "count": row[f"price_{i}"]}
+            for i, (low, high) in enumerate(ranges)
+        ],
+        "price_range": {"min": row["price_min"], "max": row["price_max"]},
+    }
@@ -0,0 +1,106 @@
+"""
+Toạ độ phòng và tìm phòng theo bán kính.
+
+Phòng có latitude/longitude do chủ nhà nhập, hoặc được gán theo tâm quận
+lấy từ danh bạ core/data/districts.json khi địa chỉ có tên quận. Tìm phòng
+gần một điểm gồm 2 bước: lọc theo khung toạ độ (dùng index room_lat_lng_idx)
+rồi tính khoảng cách haversine bằng numpy cho các phòng còn lại.
+"""
+import json
+import math
+import re
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+from .search import fold_text
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+
+GAZETTEER_PATH = Path(__file__).resolve().parent / "data" / "districts.json"
+_NON_WORD_RE = re.compile(r"[^a-z0-9]+")
+
+
+def _normalize(text):
+    # "Q.7, TP.HCM" -> " q 7 tp hcm "
+    return f" {_NON_WORD_RE.sub(' ', fold_text(text)).strip()} "
+
+
+@lru_cache(maxsize=1)
+def load_gazetteer():
+    with open(GAZETTEER_PATH, encoding="utf-8") as fh:
+        data = json.load(fh)
+    cities = {c["name"]: [f" {a} " for a in c["aliases"]] for c in data["cities"]}
+    districts = [
+        {**d, "aliases": [f" {a} " for a in d["aliases"]]}
+        for d in data["districts"]
+    ]
+    return cities, districts
+
+
+def geocode_address(address):
+    """
+    Trả về (lat, lng) tâm quận xuất hiện trong địa chỉ, None nếu không nhận ra.
+    Nếu có nhiều quận khớp thì lấy quận đứng sau cùng (địa chỉ VN viết từ
+    số nhà -> phường -> quận -> thành phố), ưu tiên quận thuộc thành phố có
+    trong địa chỉ.
+    """
+    if not address:
+        return None
+    text = _normalize(address)
+    cities, districts = load_gazetteer()
+    mentioned = {name for name, aliases in cities.items() if any(a in text for a in aliases)}
+
+    best = None
+    for district in districts:
+        if mentioned and district["city"] not in mentioned:
+            continue
+        for alias in district["aliases"]:
+            pos = text.rfind(alias)
+            if pos < 0:
+                continue
+            rank = (pos + len(alias), len(alias))
+            if best is None or rank > best[0]:
+                best = (rank, district)
+    if best is None:
+        return None
+    return best[1]["lat"], best[1]["lng"]
+
+
+def bounding_box(lat, lng, radius_km):
+    """(min_lat, max_lat, min_lng, max_lng) bao quanh hình tròn bán kính radius_km."""
+    dlat = radius_km / KM_PER_DEGREE_LAT
+    dlng = radius_km / (KM_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 0.01))
+    return lat - dlat, lat + dlat, lng - dlng, lng + dlng
+
+
+def haversine_km(lat, lng, lats, lngs):
+    """Khoảng cách (km) từ (lat, lng) tới từng điểm trong mảng lats/lngs."""
+    lat1 = math.radians(lat)
+    lats = np.radians(lats)
+    dlat = lats - lat1
+    dlng = np.radians(lngs) - math.radians(lng)
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat1) * np.cos(lats) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def nearby_room_ids(queryset, lat, lng, radius_km, limit):
+    """
+    [(room_id, distance_km), ...] của các phòng trong bán kính, gần nhất trước.
+    Chỉ đọc (id, latitude, longitude) của các phòng nằm trong khung toạ độ.
+    """
+    min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_km)
+    rows = list(
+        queryset.filter(latitude__range=(min_lat, max_lat), longitude__range=(min_lng, max_lng))
+        .order_by()
+        .values_list("id", "latitude", "longitude")
+    )
+    if not rows:
+        return []
+    data = np.array(rows, dtype=float)
+    distances = haversine_km(lat, lng, data[:, 1], data[:, 2])
+    inside = np.flatnonzero(distances <= radius_km)
+    order = inside[np.argsort(distances[inside], kind="stable")][:limit]
+    return [(int(data[i, 0]), float(distances[i])) for i in order]
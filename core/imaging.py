@@ -0,0 +1,210 @@
+"""
+Chuẩn hoá ảnh phòng khi upload và sinh thumbnail.
+
+Ảnh được xoay theo EXIF, giới hạn kích thước, bỏ metadata (EXIF/GPS) rồi
+encode lại trước khi đưa vào blob store; sau đó sinh thumbnail theo các
+kích thước trong settings.ROOM_IMAGE_THUMBNAIL_SIZES. Việc xử lý nặng CPU này
+chạy trong process pool khi có nhiều ảnh một lúc.
+"""
+import io
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+from .blobstore import (
+    BlobError, LocalBlobStore, decode_data_uri, get_blob_store, is_blob_ref, is_data_uri,
+    resolve_blob_ref,
+)
+
+logger = logging.getLogger(__name__)
+
+JPEG_QUALITY = 85
+# Chặn ảnh "bom giải nén" (khoảng 50 megapixel)
+Image.MAX_IMAGE_PIXELS = 50_000_000
+
+_pool = None
+
+# Định dạng nén tốt hơn có thể trả về thay cho JPEG/PNG khi trình duyệt hỗ trợ
+VARIANT_ENCODERS = {
+    "avif": ("AVIF", {"quality": 60}),
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+}
+VARIANT_SOURCE_EXTENSIONS = ("jpg", "png")
+
+
+def _encode(img, ext):
+    buf = io.BytesIO()
+    if ext == "png":
+        img.save(buf, "PNG", optimize=True)
+    else:
+        img.save(buf, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return buf.getvalue()
+
+
+def normalize_image(data, max_dimension):
+    """
+    Trả về (bytes, ext) của ảnh đã chuẩn hoá: xoay đúng chiều, cạnh dài nhất
+    không quá max_dimension, không còn EXIF. Ảnh có kênh alpha giữ PNG,
+    còn lại encode JPEG.
+    """
+    try:
+        img = Image.open(io.BytesIO(data))
+        img = ImageOps.exif_transpose(img)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise BlobError("Không đọc được ảnh hoặc ảnh quá lớn")
+
+    has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+    img = img.convert("RGBA" if has_alpha else "RGB")
+    img.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+    ext = "png" if has_alpha else "jpg"
+    return _encode(img, ext), ext
+
+
+def make_thumbnail(data, ext, size):
+    img = Image.open(io.BytesIO(data))
+    img.thumbnail((size, size), Image.LANCZOS)
+    return _encode(img, ext)
+
+
+def _ingest(data, root, base_url, max_dimension, sizes):
+    """Chạy trong process con: chuẩn hoá, lưu blob và thumbnail, trả về key."""
+    store = LocalBlobStore(root, base_url)
+    data, ext = normalize_image(data, max_dimension)
+    key = store.save(data, ext)
+    for size in sizes:
+        if not store.thumbnail_path(key, size).exists():
+            store.save_thumbnail(key, size, make_thumbnail(data, ext, size))
+    return key
+
+
+def _ingest_file(path, root, base_url, max_dimension, sizes):
+    with open(path, "rb") as fh:
+        data = fh.read()
+    return _ingest(data, root, base_url, max_dimension, sizes)
+
+
+def _pool_args(store):
+    return (
+        str(store.root), store.base_url,
+        settings.ROOM_IMAGE_MAX_DIMENSION, settings.ROOM_IMAGE_THUMBNAIL_SIZES,
+    )
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.IMAGE_PROCESS_WORKERS)
+    return _pool
+
+
+def ingest_images(values):
+    """
+    Nhận danh sách giá trị ảnh (data URI hoặc URL), trả về danh sách URL
+    tương ứng. Data URI được chuẩn hoá + sinh thumbnail; ảnh trùng nhau
+    trong cùng lô chỉ xử lý một lần. Lỗi dữ liệu ảnh raise BlobError.
+    """
+    store = get_blob_store()
+    args = _pool_args(store)
+
+    pending = list(dict.fromkeys(v for v in values if is_data_uri(v)))
+    decoded = [decode_data_uri(v) for v in pending]
+
+    keys = None
+    if len(decoded) > 1 and settings.IMAGE_PROCESS_WORKERS > 1:
+        pool = _get_pool()
+        try:
+            futures = [pool.submit(_ingest, data, *args) for data, _ext in decoded]
+            keys = [f.result() for f in futures]
+        except BrokenProcessPool:
+            logger.warning("Image process pool is broken, falling back to inline processing")
+            _reset_pool()
+    if keys is None:
+        keys = [_ingest(data, *args) for data, _ext in decoded]
+
+    urls = {value: store.url(key) for value, key in zip(pending, keys)}
+    result = []
+    for v in values:
+        if is_data_uri(v):
+            v = urls[v]
+        elif is_blob_ref(v):
+            # Ảnh đã upload qua /api/uploads/images/ (đã chuẩn hoá ở bước upload)
+            v = store.url(resolve_blob_ref(v))
+        result.append(v)
+    return result
+
+
+def ingest_blob(key):
+    """
+    Chuẩn hoá + sinh thumbnail cho một blob đã lưu nguyên bản (upload theo
+    luồng). Ảnh được đọc trong process con nên worker xử lý request không
+    phải giữ ảnh trong bộ nhớ. Trả về key của ảnh đã chuẩn hoá.
+    """
+    store = get_blob_store()
+    args = (str(store.path(key)),) + _pool_args(store)
+    if settings.IMAGE_PROCESS_WORKERS > 0:
+        try:
+            return _get_pool().submit(_ingest_file, *args).result()
+        except BrokenProcessPool:
+            logger.warning("Image process pool is broken, falling back to inline processing")
+            _reset_pool()
+    return _ingest_file(*args)
+
+
+def _reset_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False)
+    _pool = None
+
+
+def thumbnail_urls(url):
+    """{size: url} cho các thumbnail đã có của một ảnh trong blob store."""
+    store = get_blob_store()
+    key = store.key_from_url(url)
+    if key is None:
+        return {}
+    return {
+        size: store.thumbnail_url(key, size)
+        for size in settings.ROOM_IMAGE_THUMBNAIL_SIZES
+        if store.thumbnail_path(key, size).exists()
+    }
+
+
+def thumbnail_url(url, size):
+    """URL thumbnail kích thước size nếu có, ngược lại trả về ảnh gốc."""
+    store = get_blob_store()
+    key = store.key_from_url(url)
+    if key is None or not store.thumbnail_path(key, size).exists():
+        return url
+    return store.thumbnail_url(key, size)
+
+
+def variant_supported(fmt):
+    return fmt in VARIANT_ENCODERS and features.check(fmt)
+
+
+def ensure_variant(path, fmt):
+    """
+    Trả về đường dẫn bản WebP/AVIF của ảnh tại path (lưu cạnh ảnh gốc,
+    tên '<key>.<fmt>'), tạo ở lần yêu cầu đầu tiên. Trả về None nếu không
+    tạo được hoặc bản mới không nhỏ hơn ảnh gốc.
+    """
+    variant_path = path.with_name(f"{path.name}.{fmt}")
+    if not variant_path.exists():
+        encoder, options = VARIANT_ENCODERS[fmt]
+        try:
+            with Image.open(path) as img:
+                img.load()
+                buf = io.BytesIO()
+                img.save(buf, encoder, **options)
+        except (OSError, ValueError, KeyError):
+            logger.warning("Could not encode %s variant of %s", fmt, path, exc_info=True)
+            return None
+        LocalBlobStore._write_atomic(variant_path, buf.getvalue())
+    if variant_path.stat().st_size >= path.stat().st_size:
+        return None
+    return variant_path
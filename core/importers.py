@@ -0,0 +1,98 @@
+"""
+Đọc dữ liệu import hàng loạt (CSV hoặc JSON Lines) theo từng dòng.
+
+Dữ liệu được đọc dạng luồng từ file upload hoặc body request nên không
+phải giữ cả file trong bộ nhớ; mỗi dòng được trả về ngay để validate.
+
+    for line_no, row, error in iter_rows(stream, "csv"):
+        ...
+"""
+import codecs
+import csv
+import json
+
+from rest_framework.parsers import BaseParser
+
+CSV = "csv"
+JSONL = "jsonl"
+FORMATS = (CSV, JSONL)
+
+
+def detect_format(name="", content_type=""):
+    """Đoán định dạng từ tên file hoặc content type, None nếu không rõ."""
+    name = (name or "").lower()
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if name.endswith(".csv") or content_type in ("text/csv", "application/csv"):
+        return CSV
+    if name.endswith((".jsonl", ".ndjson")) or content_type in (
+        "application/jsonl", "application/x-ndjson", "application/x-jsonlines",
+    ):
+        return JSONL
+    return None
+
+
+def _clean(row):
+    # Ô trống trong CSV coi như không truyền, để serializer dùng giá trị mặc định
+    return {
+        key.strip(): value.strip() if isinstance(value, str) else value
+        for key, value in row.items()
+        if key and not (value is None or (isinstance(value, str) and not value.strip()))
+    }
+
+
+def iter_rows(stream, fmt, encoding="utf-8-sig"):
+    """
+    Sinh (line_no, row, error) cho từng dòng dữ liệu: row là dict các cột đã
+    bỏ ô trống, error là thông báo lỗi khi dòng không đọc được (row=None).
+    """
+    text = codecs.getreader(encoding)(stream, errors="strict")
+    if fmt == CSV:
+        reader = csv.DictReader(text)
+        try:
+            for row in reader:
+                if None in row:
+                    yield reader.line_num, None, "Dòng có nhiều cột hơn tiêu đề"
+                    continue
+                yield reader.line_num, _clean(row), None
+        except (csv.Error, UnicodeDecodeError) as e:
+            yield max(reader.line_num, 1), None, f"Không đọc được CSV: {e}"
+    elif fmt == JSONL:
+        line_no = 0
+        try:
+            for line_no, line in enumerate(text, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    yield line_no, None, f"JSON không hợp lệ: {e}"
+                    continue
+                if not isinstance(row, dict):
+                    yield line_no, None, "Mỗi dòng phải là một object JSON"
+                    continue
+                yield line_no, _clean(row), None
+        except UnicodeDecodeError as e:
+            yield line_no + 1, None, f"File không phải UTF-8: {e}"
+    else:
+        raise ValueError(f"Định dạng không được hỗ trợ: {fmt}")
+
+
+class RowStreamParser(BaseParser):
+    """
+    Parser cho body thô text/csv hoặc application/x-ndjson: không đọc body
+    ngay mà trả về stream để view đọc dần từng dòng.
+    """
+    format = None
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return {"stream": stream, "format": self.format}
+
+
+class CSVRowsParser(RowStreamParser):
+    media_type = "text/csv"
+    format = CSV
+
+
+class JSONLinesParser(RowStreamParser):
+    media_type = "application/x-ndjson"
+    format = JSONL
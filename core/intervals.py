@@ -0,0 +1,117 @@
+"""
+Cây khoảng (centered interval tree) cho truy vấn chồng lấn ngày.
+
+Khoảng là đoạn đóng [start, end] (ngày bắt đầu/kết thúc hợp đồng đều
+tính). Dựng cây một lần từ kết quả của một câu query rồi trả lời nhiều
+truy vấn overlap trong bộ nhớ, mỗi truy vấn O(log n + k).
+
+    tree = IntervalTree([(date(2025, 1, 1), date(2025, 6, 30), contract_id), ...])
+    tree.overlap(date(2025, 3, 1), date(2025, 3, 31))  # [(start, end, data), ...]
+"""
+from datetime import timedelta
+
+ONE_DAY = timedelta(days=1)
+
+
+class _Node:
+    __slots__ = ("center", "by_start", "by_end", "left", "right")
+
+    def __init__(self, center, overlapping, left, right):
+        self.center = center
+        # Các khoảng chứa center, sắp theo start tăng dần và end giảm dần
+        self.by_start = sorted(overlapping, key=lambda iv: iv[0])
+        self.by_end = sorted(overlapping, key=lambda iv: iv[1], reverse=True)
+        self.left = left
+        self.right = right
+
+
+class IntervalTree:
+    def __init__(self, intervals):
+        items = []
+        for interval in intervals:
+            start, end = interval[0], interval[1]
+            if start > end:
+                raise ValueError(f"Khoảng không hợp lệ: {start} > {end}")
+            items.append(tuple(interval))
+        self._size = len(items)
+        self._root = self._build(items)
+
+    def __len__(self):
+        return self._size
+
+    def _build(self, items):
+        if not items:
+            return None
+        endpoints = sorted(p for iv in items for p in (iv[0], iv[1]))
+        center = endpoints[len(endpoints) // 2]
+        left, right, here = [], [], []
+        for iv in items:
+            if iv[1] < center:
+                left.append(iv)
+            elif iv[0] > center:
+                right.append(iv)
+            else:
+                here.append(iv)
+        return _Node(center, here, self._build(left), self._build(right))
+
+    def overlap(self, start, end):
+        """Các khoảng có giao với [start, end]."""
+        result = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            if end < node.center:
+                # Chỉ cần khoảng ở node này bắt đầu không sau end
+                for iv in node.by_start:
+                    if iv[0] > end:
+                        break
+                    result.append(iv)
+                stack.append(node.left)
+            elif start > node.center:
+                for iv in node.by_end:
+                    if iv[1] < start:
+                        break
+                    result.append(iv)
+                stack.append(node.right)
+            else:
+                # [start, end] chứa center: mọi khoảng ở node này đều giao
+                result.extend(node.by_start)
+                stack.append(node.left)
+                stack.append(node.right)
+        return result
+
+    def at(self, day):
+        return self.overlap(day, day)
+
+
+def merge_intervals(intervals):
+    """Gộp các khoảng [start, end] chồng lấn hoặc liền kề, trả về list (start, end) đã sắp."""
+    merged = []
+    for start, end in sorted((iv[0], iv[1]) for iv in intervals):
+        if merged and start <= merged[-1][1] + ONE_DAY:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def free_gaps(intervals, start, end):
+    """Các đoạn trống trong [start, end] không bị khoảng nào phủ."""
+    gaps = []
+    cursor = start
+    for busy_start, busy_end in merge_intervals(intervals):
+        if busy_end < cursor:
+            continue
+        if busy_start > end:
+            break
+        if busy_start > cursor:
+            gaps.append((cursor, busy_start - ONE_DAY))
+        cursor = max(cursor, busy_end + ONE_DAY)
+        if cursor > end:
+            return gaps
+    if cursor <= end:
+        gaps.append((cursor, end))
+    return gaps
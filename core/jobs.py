@@ -0,0 +1,226 @@
+"""
+Hàng đợi tác vụ nền lưu trong CSDL (bảng core.Job), không cần broker ngoài.
+
+    job = enqueue("generate_invoices", {"periods": ["2025-08"]}, user=request.user)
+
+Worker (`manage.py run_worker`) nhận job đến hạn bằng SELECT ... FOR UPDATE
+SKIP LOCKED (CSDL không hỗ trợ thì dựa vào câu UPDATE có điều kiện status),
+chạy hàm tương ứng trong core.tasks.TASKS với payload làm tham số keyword,
+rồi lưu kết quả. Job lỗi được chạy lại sau JOB_RETRY_BACKOFF * 2^(lần thử - 1)
+giây cho tới max_attempts. Trong lúc chạy, tác vụ gọi report_progress() để
+cập nhật tiến độ; lời gọi này không làm gì khi tác vụ chạy ngoài worker.
+
+Một luồng heartbeat làm mới locked_at mỗi JOB_HEARTBEAT_INTERVAL giây nên
+tác vụ chạy lâu mà không báo tiến độ không bị coi là worker đã chết. Mọi
+cập nhật kết thúc job đều có điều kiện status=RUNNING và locked_by của
+worker đang giữ, để worker cũ không ghi đè job đã bị đưa lại hàng đợi.
+"""
+import contextvars
+import json
+import logging
+import random
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Cập nhật tiến độ vào CSDL tối đa một lần mỗi khoảng này (giây)
+PROGRESS_INTERVAL = 1.0
+
+_current_job = contextvars.ContextVar("current_job", default=None)
+
+
+class UnknownTask(ValueError):
+    pass
+
+
+def get_tasks():
+    from .tasks import TASKS
+    return TASKS
+
+
+def enqueue(name, payload=None, run_at=None, max_attempts=None, user=None):
+    if name not in get_tasks():
+        raise UnknownTask(f"Tác vụ không tồn tại: {name}")
+    return Job.objects.create(
+        name=name,
+        payload=json_safe(payload or {}),
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+        created_by=user if getattr(user, "is_authenticated", False) else None,
+    )
+
+
+def claim_job(worker_id):
+    """Nhận một job đến hạn cho worker_id, trả về Job (đã RUNNING) hoặc None."""
+    now = timezone.now()
+    while True:
+        with transaction.atomic():
+            queued = Job.objects.filter(status=Job.QUEUED, run_at__lte=now).order_by("run_at", "id")
+            if connection.features.has_select_for_update_skip_locked:
+                queued = queued.select_for_update(skip_locked=True)
+            job = queued.first()
+            if job is None:
+                return None
+            # Điều kiện status giữ cho việc nhận job đúng cả khi CSDL không khoá dòng
+            claimed = Job.objects.filter(pk=job.pk, status=Job.QUEUED).update(
+                status=Job.RUNNING,
+                attempts=job.attempts + 1,
+                locked_by=worker_id,
+                locked_at=now,
+                started_at=now,
+                error='',
+            )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def requeue_stale_jobs():
+    """Đưa job RUNNING của worker đã chết (quá JOB_LOCK_TIMEOUT không có heartbeat) về hàng đợi."""
+    cutoff = timezone.now() - timedelta(seconds=settings.JOB_LOCK_TIMEOUT)
+    stale = Job.objects.filter(status=Job.RUNNING, locked_at__lt=cutoff)
+    count = 0
+    for job in stale.only("id", "attempts", "max_attempts", "locked_by"):
+        # locked_at__lt lặp lại: heartbeat vừa làm mới thì job vẫn còn sống
+        count += _finish_failed(job, "Worker dừng giữa chừng (quá JOB_LOCK_TIMEOUT)", locked_at__lt=cutoff)
+    if count:
+        logger.warning("Requeued or failed %s stale jobs", count)
+    return count
+
+
+def retry_delay(attempts):
+    delay = settings.JOB_RETRY_BACKOFF * 2 ** max(attempts - 1, 0)
+    # Thêm nhiễu để các job lỗi cùng lúc không chạy lại cùng lúc
+    return min(delay, settings.JOB_RETRY_BACKOFF_MAX) * random.uniform(0.8, 1.2)
+
+
+def json_safe(value):
+    return json.loads(json.dumps(value, cls=DjangoJSONEncoder))
+
+
+def _owned(job, **conditions):
+    """Job còn RUNNING và vẫn do worker đã nhận nó giữ."""
+    return Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=job.locked_by, **conditions)
+
+
+def _finish_failed(job, error, **conditions):
+    now = timezone.now()
+    jobs = _owned(job, **conditions)
+    if job.attempts < job.max_attempts:
+        fields = {"status": Job.QUEUED, "run_at": now + timedelta(seconds=retry_delay(job.attempts))}
+    else:
+        fields = {"status": Job.FAILED, "finished_at": now}
+    return jobs.update(error=error, locked_by='', locked_at=None, **fields)
+
+
+class Heartbeat(threading.Thread):
+    """Luồng làm mới locked_at của job đang chạy cho tới khi stop()."""
+
+    def __init__(self, job):
+        super().__init__(name=f"job-{job.pk}-heartbeat", daemon=True)
+        self.job = job
+        self._stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self._stopped.wait(settings.JOB_HEARTBEAT_INTERVAL):
+                try:
+                    if not _owned(self.job).update(locked_at=timezone.now()):
+                        # Job đã bị đưa lại hàng đợi hoặc kết thúc ở nơi khác
+                        return
+                except DatabaseError:
+                    logger.warning("Heartbeat for job %s failed", self.job.pk, exc_info=True)
+        finally:
+            # Luồng có kết nối CSDL riêng
+            connection.close()
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def run_job(job):
+    """Chạy một job đã được nhận (RUNNING) và lưu kết quả hoặc lỗi."""
+    task = get_tasks().get(job.name)
+    token = _current_job.set({"job": job, "last_write": 0.0})
+    heartbeat = Heartbeat(job)
+    heartbeat.start()
+    started = time.monotonic()
+    try:
+        if task is None:
+            raise UnknownTask(f"Tác vụ không tồn tại: {job.name}")
+        result = task(**job.payload)
+    except Exception:
+        logger.exception("Job %s (%s) failed on attempt %s/%s", job.pk, job.name, job.attempts, job.max_attempts)
+        # Tác vụ không tồn tại thì thử lại cũng vô ích
+        if task is None:
+            job.max_attempts = job.attempts
+        if not _finish_failed(job, traceback.format_exc(limit=5)):
+            logger.warning("Job %s (%s) was taken over before it failed; result discarded", job.pk, job.name)
+        return False
+    finally:
+        heartbeat.stop()
+        _current_job.reset(token)
+
+    saved = _owned(job).update(
+        status=Job.SUCCEEDED,
+        result=json_safe(result),
+        finished_at=timezone.now(),
+        locked_by='',
+        locked_at=None,
+    )
+    if not saved:
+        logger.warning("Job %s (%s) was taken over before it finished; result discarded", job.pk, job.name)
+        return False
+    logger.info("Job %s (%s) succeeded in %.2fs", job.pk, job.name, time.monotonic() - started)
+    return True
+
+
+def report_progress(done, total=None, message=""):
+    """Báo tiến độ cho job đang chạy; ngoài worker thì bỏ qua."""
+    state = _current_job.get()
+    if state is None:
+        return
+    now = time.monotonic()
+    finished = total is not None and done >= total
+    if not finished and now - state["last_write"] < PROGRESS_INTERVAL:
+        return
+    state["last_write"] = now
+    _owned(state["job"]).update(
+        progress_done=done,
+        progress_total=total,
+        progress_message=message[:255],
+        locked_at=timezone.now(),
+    )
+
+
+def work(worker_id, once=False, stop=lambda: False):
+    """
+    Vòng lặp của một worker: nhận và chạy job cho tới khi stop() trả True.
+    once: chạy hết các job đang đến hạn rồi thoát. Trả về số job đã chạy.
+    """
+    processed = 0
+    last_stale_check = 0.0
+    while not stop():
+        if time.monotonic() - last_stale_check > settings.JOB_LOCK_TIMEOUT / 2:
+            requeue_stale_jobs()
+            last_stale_check = time.monotonic()
+        job = claim_job(worker_id)
+        if job is None:
+            if once:
+                break
+            time.sleep(settings.JOB_POLL_INTERVAL)
+            continue
+        run_job(job)
+        processed += 1
+    return processed
@@ -0,0 +1,182 @@
+import statistics
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.models import Contract, Room
+from core.views import ContractViewSet
+
+User = get_user_model()
+
+PREFIX = 'bench-contract'
+
+
+class Command(BaseCommand):
+    help = (
+        'Fire parallel POST /api/contracts/ requests against the same room and against '
+        'different rooms, then report throughput, latency and whether exactly one '
+        'ACTIVE contract exists per room and every response is 201 or 409. '
+        'Exits non-zero otherwise. Benchmark data is removed afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=50,
+            help='Number of contract creations fired per scenario (default: 50)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Number of parallel threads, each with its own DB connection (default: 8)',
+        )
+        parser.add_argument(
+            '--scenario',
+            choices=['same', 'different', 'both'],
+            default='both',
+            help='"same": every request targets one room; "different": one room per request',
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the benchmark rooms, tenants and contracts instead of deleting them',
+        )
+
+    def handle(self, *args, **options):
+        total = options['requests']
+        workers = options['workers']
+        if total < 1 or workers < 1:
+            raise CommandError('--requests and --workers must be positive')
+
+        self.owner, _ = User.objects.get_or_create(
+            username=f'{PREFIX}-owner',
+            defaults={'email': f'{PREFIX}-owner@example.com', 'role': 'OWNER'},
+        )
+        self.tenants = [
+            User.objects.get_or_create(
+                username=f'{PREFIX}-tenant-{i}',
+                defaults={'email': f'{PREFIX}-tenant-{i}@example.com', 'role': 'TENANT'},
+            )[0]
+            for i in range(total)
+        ]
+        self.view = ContractViewSet.as_view({'post': 'create'})
+        self.factory = APIRequestFactory()
+
+        scenarios = ['same', 'different'] if options['scenario'] == 'both' else [options['scenario']]
+        failed = False
+        try:
+            for scenario in scenarios:
+                failed |= not self.run_scenario(scenario, total, workers)
+        finally:
+            if not options['keep']:
+                self.cleanup()
+
+        if failed:
+            raise CommandError('Consistency check failed, see output above')
+
+    def run_scenario(self, scenario, total, workers):
+        if scenario == 'same':
+            room = Room.objects.create(name=f'{PREFIX}-same', base_price=1_000_000)
+            rooms = [room] * total
+        else:
+            rooms = Room.objects.bulk_create(
+                Room(name=f'{PREFIX}-{i}', base_price=1_000_000) for i in range(total)
+            )
+        today = timezone.localdate()
+        payloads = [
+            {
+                'room': room.pk,
+                'tenant': tenant.pk,
+                'start_date': today.isoformat(),
+                'end_date': (today + timedelta(days=365)).isoformat(),
+                'monthly_rent': '1000000',
+            }
+            for room, tenant in zip(rooms, self.tenants)
+        ]
+
+        start_barrier = threading.Barrier(min(workers, total))
+        barrier_passed = threading.local()
+
+        def post(payload):
+            # Các luồng cùng xuất phát để tạo tranh chấp thật sự
+            if not getattr(barrier_passed, 'done', False):
+                barrier_passed.done = True
+                try:
+                    start_barrier.wait(timeout=10)
+                except threading.BrokenBarrierError:
+                    pass
+            request = self.factory.post('/api/contracts/', payload, format='json')
+            force_authenticate(request, user=self.owner)
+            began = time.perf_counter()
+            try:
+                status_code = self.view(request).status_code
+            except Exception as e:  # lỗi không bắt được trong view (vd. database is locked)
+                status_code = type(e).__name__
+            latency = time.perf_counter() - began
+            # Mỗi luồng có kết nối riêng, đóng lại để không rò kết nối sau khi pool kết thúc
+            connection.close()
+            return status_code, latency
+
+        began = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(post, payloads))
+        elapsed = time.perf_counter() - began
+
+        codes = Counter(code for code, _ in results)
+        latencies = sorted(latency * 1000 for _, latency in results)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+
+        room_ids = {room.pk for room in rooms}
+        active = Counter(
+            Contract.objects.filter(room_id__in=room_ids, status=Contract.ACTIVE)
+            .values_list('room_id', flat=True)
+        )
+        not_rented = Room.objects.filter(pk__in=room_ids).exclude(status=Room.RENTED).count()
+        # Mỗi request phải tạo được hợp đồng (201) hoặc bị từ chối rõ ràng vì xung đột (409)
+        unexpected = {code: count for code, count in codes.items() if code not in (201, 409)}
+        if unexpected:
+            ok = False
+        elif scenario == 'same':
+            ok = active[rooms[0].pk] == 1 and codes.get(201, 0) == 1 and not_rented == 0
+        else:
+            # Mỗi request một phòng trống riêng: mọi 409 đều là xung đột giả
+            ok = (
+                codes.get(409, 0) == 0
+                and all(active[pk] == 1 for pk in room_ids)
+                and codes.get(201, 0) == len(room_ids)
+                and not_rented == 0
+            )
+
+        self.stdout.write(f'Scenario "{scenario}": {total} requests, {workers} workers')
+        self.stdout.write(f'  elapsed     {elapsed:.3f}s ({total / elapsed:.1f} req/s)')
+        self.stdout.write(
+            f'  latency ms  p50={statistics.median(latencies):.1f} p95={p95:.1f} max={latencies[-1]:.1f}'
+        )
+        self.stdout.write('  responses   ' + ', '.join(f'{code}: {count}' for code, count in sorted(codes.items(), key=str)))
+        self.stdout.write(
+            f'  contracts   {sum(active.values())} ACTIVE over {len(room_ids)} rooms'
+        )
+        if unexpected:
+            self.stdout.write(self.style.ERROR(
+                '  unexpected  ' + ', '.join(f'{code}: {count}' for code, count in sorted(unexpected.items(), key=str))
+            ))
+        if ok:
+            self.stdout.write(self.style.SUCCESS('  consistent  yes'))
+        else:
+            self.stdout.write(self.style.ERROR('  consistent  NO'))
+        return ok
+
+    def cleanup(self):
+        Contract.objects.filter(room__name__startswith=PREFIX).delete()
+        Room.objects.filter(name__startswith=PREFIX).delete()
+        User.objects.filter(username__startswith=PREFIX).delete()
@@ -0,0 +1,56 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from core.tasks import expire_contracts
+
+
+class Command(BaseCommand):
+    help = (
+        'End ACTIVE contracts whose end_date has passed and release their rooms (EMPTY). '
+        'Safe to run repeatedly, e.g. daily from cron or the scheduler.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of contracts ended per transaction (default: 1000)',
+        )
+        parser.add_argument(
+            '--date',
+            help='Treat this day (YYYY-MM-DD) as today; contracts ending before it are expired',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            dest='dry_run',
+            help='Count the contracts that would be ended without updating anything',
+        )
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            try:
+                today = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError('--date must be in YYYY-MM-DD format')
+
+        stats = expire_contracts(
+            today=today,
+            batch_size=max(1, options['batch_size']),
+            dry_run=options['dry_run'],
+        )
+
+        if options['dry_run']:
+            self.stdout.write(
+                self.style.WARNING(f'DRY RUN: Would end {stats["contracts_ended"]} contracts')
+            )
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'Ended {stats["contracts_ended"]} contracts, activated '
+                    f'{stats["contracts_activated"]} renewals (canceled {stats["renewals_canceled"]}) and '
+                    f'released {stats["rooms_released"]} rooms in {stats["batches"]} batches'
+                )
+            )
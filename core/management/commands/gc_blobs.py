@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from core.blobgc import gc_blobs
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete blobs (with their thumbnails and WebP/AVIF variants) that no room or contract '
+        'references, in both the public and the private contract store. Blobs younger than '
+        'BLOB_GC_MIN_AGE are kept so fresh uploads are not removed before they are attached.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            help=f'Only delete blobs older than this many seconds (default: BLOB_GC_MIN_AGE = {settings.BLOB_GC_MIN_AGE})',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            dest='dry_run',
+            help='Count the blobs that would be deleted without deleting anything',
+        )
+
+    def handle(self, *args, **options):
+        stats = gc_blobs(min_age=options['min_age'], dry_run=options['dry_run'])
+        prefix = 'DRY RUN: Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'{prefix} {stats["deleted"]} of {stats["checked"]} blobs '
+                f'({stats["bytes"] / 1024 / 1024:.1f} MB) and {stats["temp_files"]} stale temp files'
+            )
+        )
@@ -0,0 +1,98 @@
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+from core.billing import MAX_PERIODS, generate_invoices, period_range
+from core.models import Contract
+from core.serializers import PERIOD_RE
+
+
+class Command(BaseCommand):
+    help = (
+        'Create invoices for every ACTIVE contract in a period (or a range of periods to backfill). '
+        'Contracts that already have an invoice for the period are skipped, so it is safe to re-run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--period', help='Billing period (YYYY-MM)')
+        parser.add_argument('--from', dest='period_from', help='First period to backfill (YYYY-MM)')
+        parser.add_argument('--to', dest='period_to', help='Last period to backfill, inclusive (YYYY-MM)')
+        parser.add_argument(
+            '--room',
+            type=int,
+            action='append',
+            dest='rooms',
+            help='Only bill contracts of this room id (repeatable)',
+        )
+        parser.add_argument(
+            '--contract',
+            type=int,
+            action='append',
+            dest='contracts',
+            help='Only bill this contract id (repeatable)',
+        )
+        parser.add_argument('--service-cost', default='0', help='Service cost added to every invoice (default: 0)')
+        parser.add_argument('--due-days', type=int, default=30, help='Days until the invoice is due (default: 30)')
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Bill readings flagged as anomalous instead of skipping them',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            dest='dry_run',
+            help='Report what would be created without writing anything',
+        )
+
+    def handle(self, *args, **options):
+        if options['period']:
+            if options['period_from'] or options['period_to']:
+                raise CommandError('Use either --period or --from/--to')
+            periods = [options['period']]
+        elif options['period_from'] and options['period_to']:
+            periods = [options['period_from'], options['period_to']]
+        else:
+            raise CommandError('--period or both --from and --to are required')
+        for period in periods:
+            if not PERIOD_RE.match(period):
+                raise CommandError(f'Invalid period "{period}", expected YYYY-MM')
+        if len(periods) == 2:
+            periods = period_range(*periods)
+            if not periods:
+                raise CommandError('--to must not be before --from')
+            if len(periods) > MAX_PERIODS:
+                raise CommandError(f'At most {MAX_PERIODS} periods per run')
+
+        try:
+            service_cost = Decimal(options['service_cost'])
+        except InvalidOperation:
+            raise CommandError('--service-cost must be a number')
+
+        contracts = Contract.objects.all()
+        if options['rooms']:
+            contracts = contracts.filter(room_id__in=options['rooms'])
+        if options['contracts']:
+            contracts = contracts.filter(pk__in=options['contracts'])
+
+        stats = generate_invoices(
+            periods,
+            contracts=contracts,
+            service_cost=service_cost,
+            due_days=options['due_days'],
+            force=options['force'],
+            dry_run=options['dry_run'],
+        )
+
+        label = f'{periods[0]}..{periods[-1]}' if len(periods) > 1 else periods[0]
+        count = stats['would_create'] if options['dry_run'] else stats['created']
+        message = (
+            f'{count} invoices for {label}, {stats["existing"]} already existed, '
+            f'{len(stats["missing_reading"])} without meter readings, '
+            f'{len(stats["anomaly"])} skipped as anomalous'
+        )
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'DRY RUN: Would create {message}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Created {message}'))
+        for item in stats['anomaly']:
+            self.stdout.write(f'  - Anomalous reading: contract {item["contract"]}, period {item["period"]}')
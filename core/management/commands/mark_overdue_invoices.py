@@ -1,12 +1,26 @@
-from django.core.management.base import BaseCommand
-from django.utils import timezone
-from core.models import Invoice
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from core.tasks import mark_overdue_invoices
 
 
 class Command(BaseCommand):
-    help = 'Mark invoices as overdue if they are past their due date'
+    help = (
+        'Mark UNPAID invoices past their due date as OVERDUE and record the transition. '
+        'Only newly overdue invoices are touched, so it is cheap to run every few minutes.'
+    )
 
     def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of invoices updated per transaction (default: 1000)',
+        )
+        parser.add_argument(
+            '--date',
+            help='Treat this day (YYYY-MM-DD) as today; invoices due before it become overdue',
+        )
         parser.add_argument(
             '--dry-run',
             action='store_true',
@@ -15,30 +29,28 @@ class Command(BaseCommand):
         )
 
     def handle(self, *args, **options):
-        dry_run = options['dry_run']
-        today = timezone.now().date()
-        
-        # Find unpaid invoices past their due date
-        overdue_invoices = Invoice.objects.filter(
-            status=Invoice.UNPAID,
-            due_date__lt=today
+        today = None
+        if options['date']:
+            try:
+                today = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError('--date must be in YYYY-MM-DD format')
+
+        stats = mark_overdue_invoices(
+            today=today,
+            batch_size=max(1, options['batch_size']),
+            dry_run=options['dry_run'],
         )
-        
-        count = overdue_invoices.count()
-        
-        if dry_run:
+
+        if options['dry_run']:
             self.stdout.write(
-                self.style.WARNING(f'DRY RUN: Would mark {count} invoices as overdue')
+                self.style.WARNING(f'DRY RUN: Would mark {stats["invoices_overdue"]} invoices as overdue')
             )
-            for invoice in overdue_invoices:
-                self.stdout.write(f'  - Invoice {invoice.id} (Contract: {invoice.contract}, Due: {invoice.due_date})')
-        else:
-            if count > 0:
-                overdue_invoices.update(status=Invoice.OVERDUE)
-                self.stdout.write(
-                    self.style.SUCCESS(f'Successfully marked {count} invoices as overdue')
-                )
-            else:
-                self.stdout.write(
-                    self.style.SUCCESS('No invoices to mark as overdue')
+        elif stats['invoices_overdue']:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'Marked {stats["invoices_overdue"]} invoices as overdue in {stats["batches"]} batches'
                 )
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS('No invoices to mark as overdue'))
@@ -0,0 +1,133 @@
+import shutil
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from core.blobstore import URL_KEY_RE, BlobError, get_private_blob_store, is_data_uri, save_data_uri
+from core.models import Contract, Room
+
+
+class Command(BaseCommand):
+    help = (
+        'Move base64 signed-contract scans stored on Contract.contract_image_base64 into the '
+        'private blob store (PRIVATE_MEDIA_ROOT) and point Contract.contract_image at the blob. '
+        'Scans previously saved under the public MEDIA_ROOT are moved to PRIVATE_MEDIA_ROOT too. '
+        'Rows are processed in primary-key order, so an interrupted run can be resumed with --start-after.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Number of contracts loaded and updated per transaction (default: 50)',
+        )
+        parser.add_argument(
+            '--start-after',
+            type=int,
+            default=0,
+            help='Resume after this contract id (printed by a previous run)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            dest='dry_run',
+            help='Report what would be migrated without writing anything',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        last_id = options['start_after']
+        dry_run = options['dry_run']
+        store = get_private_blob_store()
+
+        migrated = 0
+        bytes_removed = 0
+
+        while True:
+            # Chỉ lấy id của các hợp đồng còn ảnh base64, không kéo cột ảnh lên
+            ids = list(
+                Contract.objects.filter(pk__gt=last_id)
+                .exclude(contract_image_base64='')
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+
+            changed = []
+            contracts = (
+                Contract.objects.filter(pk__in=ids)
+                .only('id', 'contract_image', 'contract_image_base64')
+                .order_by('pk')
+            )
+            for contract in contracts:
+                value = contract.contract_image_base64
+                if not is_data_uri(value):
+                    self.stdout.write(self.style.WARNING(f'  - Contract {contract.id}: not a data URI, skipped'))
+                    continue
+                # Ảnh đã upload dạng file trước đây được giữ nguyên, chỉ bỏ bản base64
+                if not dry_run and not contract.contract_image:
+                    try:
+                        contract.contract_image = store.media_name(save_data_uri(value, store=store))
+                    except BlobError as e:
+                        self.stdout.write(self.style.ERROR(f'  - Contract {contract.id}: {e}'))
+                        continue
+                contract.contract_image_base64 = ''
+                changed.append(contract)
+                bytes_removed += len(value)
+
+            if changed and not dry_run:
+                with transaction.atomic():
+                    Contract.objects.bulk_update(changed, ['contract_image', 'contract_image_base64'])
+            migrated += len(changed)
+
+            last_id = ids[-1]
+            self.stdout.write(f'Processed contracts up to id {last_id} ({migrated} migrated so far)')
+
+        moved = self.move_public_files(options['start_after'], dry_run)
+
+        prefix = 'DRY RUN: Would migrate' if dry_run else 'Migrated'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'{prefix} {migrated} contract images '
+                f'({bytes_removed / 1024 / 1024:.1f} MB of base64 removed from rows), '
+                f'{"would move" if dry_run else "moved"} {moved} files out of MEDIA_ROOT'
+            )
+        )
+
+    def move_public_files(self, start_after, dry_run):
+        """
+        Ảnh hợp đồng trước đây nằm trong MEDIA_ROOT (công khai). Chuyển sang
+        PRIVATE_MEDIA_ROOT với cùng tên tương đối (giá trị cột không đổi); bản
+        công khai chỉ bị xoá khi không có phòng nào dùng chung blob đó.
+        """
+        public_root = Path(settings.MEDIA_ROOT)
+        private_root = Path(settings.PRIVATE_MEDIA_ROOT)
+        names = (
+            Contract.objects.filter(pk__gt=start_after)
+            .exclude(contract_image='').exclude(contract_image__isnull=True)
+            .order_by('pk')
+            .values_list('contract_image', flat=True)
+            .distinct()
+        )
+        moved = 0
+        for name in names.iterator():
+            source = public_root / name
+            target = private_root / name
+            if target.exists() or not source.is_file():
+                continue
+            moved += 1
+            if dry_run:
+                continue
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(source, target)
+            match = URL_KEY_RE.search(name)
+            shared = match and Room.objects.filter(
+                Q(image__contains=match['key']) | Q(images__icontains=match['key'])
+            ).exists()
+            if not shared:
+                source.unlink()
+        return moved
@@ -0,0 +1,101 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from core.blobstore import BlobError, is_data_uri
+from core.cache import bump_room_version
+from core.imaging import ingest_images
+from core.models import Room
+
+
+class Command(BaseCommand):
+    help = (
+        'Move base64 images stored on Room.image / Room.images into the blob store. '
+        'Rows are processed in primary-key order, so an interrupted run can be resumed '
+        'with --start-after; already migrated rows are left untouched.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Number of rooms loaded and updated per transaction (default: 50)',
+        )
+        parser.add_argument(
+            '--start-after',
+            type=int,
+            default=0,
+            help='Resume after this room id (printed by a previous run)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            dest='dry_run',
+            help='Report what would be migrated without writing anything',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        last_id = options['start_after']
+        dry_run = options['dry_run']
+
+        migrated_rooms = 0
+        migrated_images = 0
+        bytes_removed = 0
+
+        while True:
+            # Chỉ lấy id trước để không kéo cả cột ảnh của toàn bảng lên
+            ids = list(
+                Room.objects.filter(pk__gt=last_id)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+
+            changed = []
+            rooms = Room.objects.filter(pk__in=ids).only('id', 'image', 'images').order_by('pk')
+            for room in rooms:
+                try:
+                    images_moved, size = self.migrate_room(room, dry_run)
+                except BlobError as e:
+                    self.stdout.write(self.style.ERROR(f'  - Room {room.id}: {e}'))
+                    continue
+                if images_moved:
+                    room.refresh_image_summary()
+                    room.updated_at = timezone.now()
+                    changed.append(room)
+                    migrated_images += images_moved
+                    bytes_removed += size
+
+            if changed and not dry_run:
+                with transaction.atomic():
+                    Room.objects.bulk_update(changed, ['image', 'images', 'updated_at', *Room.IMAGE_SUMMARY_FIELDS])
+                # bulk_update không phát signal nên phải tự làm mới cache phòng
+                bump_room_version()
+            migrated_rooms += len(changed)
+
+            last_id = ids[-1]
+            self.stdout.write(f'Processed rooms up to id {last_id} ({migrated_rooms} migrated so far)')
+
+        prefix = 'DRY RUN: Would migrate' if dry_run else 'Migrated'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'{prefix} {migrated_images} images on {migrated_rooms} rooms '
+                f'({bytes_removed / 1024 / 1024:.1f} MB of base64 removed from rows)'
+            )
+        )
+
+    def migrate_room(self, room, dry_run):
+        """Returns (number of images moved, base64 bytes removed from the row)."""
+        images = room.images if isinstance(room.images, list) else []
+        pending = [value for value in [room.image] + images if is_data_uri(value)]
+        if not pending:
+            return 0, 0
+
+        if not dry_run:
+            # Normalised and thumbnailed exactly like a fresh upload
+            stored = ingest_images([room.image] + images)
+            room.image = stored[0]
+            room.images = stored[1:]
+        return len(pending), sum(len(value) for value in pending)
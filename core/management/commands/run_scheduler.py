@@ -0,0 +1,74 @@
+import os
+import signal
+import socket
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from core.models import ScheduledRun
+from core.scheduler import ScheduleError, get_entries, tick
+
+
+class Command(BaseCommand):
+    help = (
+        'Run the periodic tasks declared in settings.SCHEDULED_TASKS. '
+        'Several instances may run at once: each scheduled slot is executed by exactly one of them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Check the schedule once, run whatever is due, then exit',
+        )
+        parser.add_argument(
+            '--list',
+            action='store_true',
+            help='Show each schedule with its next and last run, then exit',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            entries = get_entries()
+        except (ScheduleError, KeyError) as e:
+            raise CommandError(f'Invalid SCHEDULED_TASKS: {e}')
+
+        if options['list']:
+            self.list_entries(entries)
+            return
+
+        instance = f'{socket.gethostname()}:{os.getpid()}'
+        stopping = False
+
+        def stop(signum, frame):
+            nonlocal stopping
+            stopping = True
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        self.stdout.write(f'Scheduler {instance} started with {len(entries)} schedules')
+
+        while not stopping:
+            for name, status in tick(entries, instance):
+                self.stdout.write(f'{timezone.localtime():%Y-%m-%d %H:%M} {name}: {status}')
+            if options['once']:
+                break
+            # Ngủ tới đầu phút kế tiếp, thức dậy mỗi giây để dừng kịp khi nhận tín hiệu
+            deadline = (time.time() // 60 + 1) * 60 + 1
+            while not stopping and time.time() < deadline:
+                time.sleep(min(1, deadline - time.time()))
+        self.stdout.write(self.style.SUCCESS('Scheduler stopped'))
+
+    def list_entries(self, entries):
+        now = timezone.now()
+        for entry in entries:
+            last = ScheduledRun.objects.filter(name=entry.name).first()
+            upcoming = entry.schedule.next_after(now)
+            self.stdout.write(
+                f'{entry.name:<25} {entry.schedule.expression:<15} -> {entry.task}'
+                f'{" (queued)" if entry.queue else ""}'
+            )
+            self.stdout.write(f'    next: {upcoming:%Y-%m-%d %H:%M}' if upcoming else '    next: never')
+            if last:
+                duration = f', {last.duration_ms}ms' if last.duration_ms is not None else ''
+                self.stdout.write(f'    last: {timezone.localtime(last.scheduled_for):%Y-%m-%d %H:%M} {last.status}{duration}')
@@ -0,0 +1,82 @@
+import multiprocessing
+import os
+import signal
+import socket
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from core.jobs import work
+
+
+class Command(BaseCommand):
+    help = (
+        'Run background jobs queued in the database (core.Job). '
+        'SIGTERM/SIGINT stop the worker after the job it is currently running.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=1,
+            help='Number of worker processes (default: 1)',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run every job that is currently due, then exit',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            help=f'Seconds to wait when the queue is empty (default: JOB_POLL_INTERVAL = {settings.JOB_POLL_INTERVAL})',
+        )
+
+    def handle(self, *args, **options):
+        if options['poll_interval'] is not None:
+            settings.JOB_POLL_INTERVAL = max(0.1, options['poll_interval'])
+        processes = max(1, options['processes'])
+        hostname = socket.gethostname()
+
+        if processes == 1:
+            processed = _run(f'{hostname}:{os.getpid()}', options['once'])
+            self.stdout.write(self.style.SUCCESS(f'Worker stopped after {processed} jobs'))
+            return
+
+        # Mỗi process con phải mở kết nối CSDL riêng
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=_run, args=(f'{hostname}:{os.getpid()}-{index}', options['once']))
+            for index in range(processes)
+        ]
+        for process in workers:
+            process.start()
+        self.stdout.write(f'Started {processes} worker processes')
+
+        def forward(signum, frame):
+            for process in workers:
+                if process.is_alive():
+                    os.kill(process.pid, signum)
+
+        signal.signal(signal.SIGTERM, forward)
+        signal.signal(signal.SIGINT, forward)
+        for process in workers:
+            process.join()
+        self.stdout.write(self.style.SUCCESS('All workers stopped'))
+
+
+def _run(worker_id, once):
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    try:
+        return work(worker_id, once=once, stop=lambda: stopping)
+    finally:
+        connections.close_all()
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:25
+
+from django.db import migrations, models
+
+
+def fill_image_summary(apps, schema_editor):
+    Room = apps.get_model('core', 'Room')
+    batch = []
+    for room in Room.objects.only('id', 'image', 'images').iterator(chunk_size=100):
+        images = room.images if isinstance(room.images, list) else []
+        room.cover_image = next(
+            (url for url in [room.image] + images
+             if isinstance(url, str) and url and not url.startswith('data:') and len(url) <= 500),
+            '',
+        )
+        room.image_count = len(images) if images else int(bool(room.image))
+        batch.append(room)
+        if len(batch) >= 100:
+            Room.objects.bulk_update(batch, ['cover_image', 'image_count'])
+            batch = []
+    if batch:
+        Room.objects.bulk_update(batch, ['cover_image', 'image_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_alter_contract_tenant_contract_contract_image_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='cover_image',
+            field=models.CharField(blank=True, default='', help_text='URL ảnh đại diện (không chứa base64)', max_length=500),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='image_count',
+            field=models.PositiveIntegerField(default=0, help_text='Số lượng ảnh của phòng'),
+        ),
+        migrations.RunPython(fill_image_summary, migrations.RunPython.noop),
+    ]
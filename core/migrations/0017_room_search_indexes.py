@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_room_cover_image_image_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['base_price', 'id'], name='room_price_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['status', 'base_price', 'id'], name='room_status_price_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['bedrooms', 'base_price'], name='room_bedrooms_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['area_m2'], name='room_area_idx'),
+        ),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:32
+
+import unicodedata
+
+from django.db import OperationalError, migrations, models
+
+# Migration không import core.search: code đó thay đổi theo thời gian, migration
+# phải cho cùng kết quả dù chạy lúc nào. Sau mỗi lần migrate, core.apps vẫn gọi
+# core.search.install_fulltext_index để dựng lại trigger nếu bị mất.
+FTS_TABLE = "core_room_fts"
+PG_TSVECTOR = "to_tsvector('simple', \"core_room\".\"search_document\")"
+SQLITE_TRIGGERS = {
+    f"{FTS_TABLE}_ai": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON core_room BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, search_document) VALUES (new.id, new.search_document);
+        END""",
+    f"{FTS_TABLE}_ad": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON core_room BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_document) VALUES ('delete', old.id, old.search_document);
+        END""",
+    f"{FTS_TABLE}_au": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF search_document ON core_room BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_document) VALUES ('delete', old.id, old.search_document);
+            INSERT INTO {FTS_TABLE}(rowid, search_document) VALUES (new.id, new.search_document);
+        END""",
+}
+
+
+def fold_text(*parts):
+    """'Phòng trọ Quận 7' -> 'phong tro quan 7' (bỏ dấu, đ -> d, viết thường)."""
+    text = " ".join(p for p in parts if p)
+    text = text.replace("đ", "d").replace("Đ", "D")
+    text = unicodedata.normalize("NFD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.lower().split())
+
+
+def fill_search_document(apps, schema_editor):
+    Room = apps.get_model('core', 'Room')
+    batch = []
+    for room in Room.objects.only('id', 'name', 'address', 'detail').iterator(chunk_size=500):
+        room.search_document = fold_text(room.name, room.address, room.detail)
+        batch.append(room)
+        if len(batch) >= 500:
+            Room.objects.bulk_update(batch, ['search_document'])
+            batch = []
+    if batch:
+        Room.objects.bulk_update(batch, ['search_document'])
+
+
+def create_fulltext_index(apps, schema_editor):
+    conn = schema_editor.connection
+    with conn.cursor() as cursor:
+        if conn.vendor == 'postgresql':
+            cursor.execute(
+                'CREATE INDEX IF NOT EXISTS room_search_document_gin '
+                f'ON core_room USING GIN ({PG_TSVECTOR})'
+            )
+        elif conn.vendor == 'sqlite':
+            try:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                    "search_document, content='core_room', content_rowid='id')"
+                )
+            except OperationalError:
+                # SQLite build không có FTS5: tìm kiếm dùng icontains
+                return
+            for sql in SQLITE_TRIGGERS.values():
+                cursor.execute(sql)
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def remove_fulltext_index(apps, schema_editor):
+    conn = schema_editor.connection
+    with conn.cursor() as cursor:
+        if conn.vendor == 'postgresql':
+            cursor.execute('DROP INDEX IF EXISTS room_search_document_gin')
+        elif conn.vendor == 'sqlite':
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_room_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(fill_search_document, migrations.RunPython.noop),
+        migrations.RunPython(create_fulltext_index, remove_fulltext_index),
+    ]
@@ -0,0 +1,138 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:34
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+# Bản sao cố định của core/data/districts.json tại thời điểm viết migration:
+# thành phố -> alias, và (thành phố, vĩ độ, kinh độ, alias) của từng quận
+CITIES = {
+    'Hồ Chí Minh': ('ho chi minh', 'tp hcm', 'hcm', 'sai gon'),
+    'Hà Nội': ('ha noi',),
+    'Đà Nẵng': ('da nang',),
+}
+DISTRICTS = [
+    ('Hồ Chí Minh', 10.7769, 106.7009, ('quan 1', 'q 1', 'q1', 'district 1')),
+    ('Hồ Chí Minh', 10.7872, 106.7498, ('quan 2', 'q 2', 'q2', 'district 2')),
+    ('Hồ Chí Minh', 10.7843, 106.6844, ('quan 3', 'q 3', 'q3', 'district 3')),
+    ('Hồ Chí Minh', 10.7579, 106.7013, ('quan 4', 'q 4', 'q4', 'district 4')),
+    ('Hồ Chí Minh', 10.754, 106.6634, ('quan 5', 'q 5', 'q5', 'district 5')),
+    ('Hồ Chí Minh', 10.748, 106.6352, ('quan 6', 'q 6', 'q6', 'district 6')),
+    ('Hồ Chí Minh', 10.734, 106.7216, ('quan 7', 'q 7', 'q7', 'district 7')),
+    ('Hồ Chí Minh', 10.724, 106.6286, ('quan 8', 'q 8', 'q8', 'district 8')),
+    ('Hồ Chí Minh', 10.8428, 106.8287, ('quan 9', 'q 9', 'q9', 'district 9')),
+    ('Hồ Chí Minh', 10.773, 106.6679, ('quan 10', 'q 10', 'q10', 'district 10')),
+    ('Hồ Chí Minh', 10.763, 106.6433, ('quan 11', 'q 11', 'q11', 'district 11')),
+    ('Hồ Chí Minh', 10.8672, 106.6413, ('quan 12', 'q 12', 'q12', 'district 12')),
+    ('Hồ Chí Minh', 10.8494, 106.7537, ('thu duc', 'quan thu duc')),
+    ('Hồ Chí Minh', 10.8106, 106.7091, ('binh thanh', 'quan binh thanh')),
+    ('Hồ Chí Minh', 10.8387, 106.6653, ('go vap', 'quan go vap')),
+    ('Hồ Chí Minh', 10.7992, 106.6803, ('phu nhuan', 'quan phu nhuan')),
+    ('Hồ Chí Minh', 10.8014, 106.6526, ('tan binh', 'quan tan binh')),
+    ('Hồ Chí Minh', 10.79, 106.6282, ('tan phu', 'quan tan phu')),
+    ('Hồ Chí Minh', 10.7653, 106.6035, ('binh tan', 'quan binh tan')),
+    ('Hồ Chí Minh', 10.695, 106.7046, ('nha be', 'quan nha be')),
+    ('Hồ Chí Minh', 10.6874, 106.5938, ('binh chanh', 'quan binh chanh')),
+    ('Hồ Chí Minh', 10.8863, 106.5923, ('hoc mon', 'quan hoc mon')),
+    ('Hồ Chí Minh', 10.9733, 106.4934, ('cu chi', 'quan cu chi')),
+    ('Hồ Chí Minh', 10.4113, 106.9547, ('can gio', 'quan can gio')),
+    ('Hà Nội', 21.0341, 105.8143, ('ba dinh', 'quan ba dinh')),
+    ('Hà Nội', 21.0288, 105.8525, ('hoan kiem', 'quan hoan kiem')),
+    ('Hà Nội', 21.0058, 105.8575, ('hai ba trung', 'quan hai ba trung')),
+    ('Hà Nội', 21.0181, 105.8294, ('dong da', 'quan dong da')),
+    ('Hà Nội', 21.0702, 105.8188, ('tay ho', 'quan tay ho')),
+    ('Hà Nội', 21.0362, 105.7906, ('cau giay', 'quan cau giay')),
+    ('Hà Nội', 20.9936, 105.8117, ('thanh xuan', 'quan thanh xuan')),
+    ('Hà Nội', 20.9744, 105.8631, ('hoang mai', 'quan hoang mai')),
+    ('Hà Nội', 21.0468, 105.8878, ('long bien', 'quan long bien')),
+    ('Hà Nội', 21.0124, 105.7652, ('nam tu liem', 'quan nam tu liem')),
+    ('Hà Nội', 21.0705, 105.7628, ('bac tu liem', 'quan bac tu liem')),
+    ('Hà Nội', 20.9714, 105.7788, ('ha dong', 'quan ha dong')),
+    ('Đà Nẵng', 16.0471, 108.2062, ('hai chau', 'quan hai chau')),
+    ('Đà Nẵng', 16.064, 108.187, ('thanh khe', 'quan thanh khe')),
+    ('Đà Nẵng', 16.0865, 108.244, ('son tra', 'quan son tra')),
+    ('Đà Nẵng', 16.0003, 108.2496, ('ngu hanh son', 'quan ngu hanh son')),
+    ('Đà Nẵng', 16.0718, 108.15, ('lien chieu', 'quan lien chieu')),
+    ('Đà Nẵng', 16.0152, 108.196, ('cam le', 'quan cam le')),
+]
+
+_NON_WORD_RE = re.compile(r"[^a-z0-9]+")
+
+
+# Migration không import core.geo/core.search: code đó thay đổi theo thời gian,
+# migration phải cho cùng kết quả dù chạy lúc nào
+def _normalize(text):
+    # "Q.7, TP.HCM" -> " q 7 tp hcm " (bỏ dấu, đ -> d, viết thường như fold_text)
+    text = text.replace("đ", "d").replace("Đ", "D")
+    text = unicodedata.normalize("NFD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return f" {_NON_WORD_RE.sub(' ', ' '.join(text.lower().split())).strip()} "
+
+
+def geocode_address(address):
+    """(lat, lng) tâm quận cuối cùng xuất hiện trong địa chỉ, ưu tiên quận thuộc thành phố có trong địa chỉ."""
+    if not address:
+        return None
+    text = _normalize(address)
+    mentioned = {name for name, aliases in CITIES.items() if any(f" {a} " in text for a in aliases)}
+    best = None
+    for city, lat, lng, aliases in DISTRICTS:
+        if mentioned and city not in mentioned:
+            continue
+        for alias in aliases:
+            alias = f" {alias} "
+            pos = text.rfind(alias)
+            if pos < 0:
+                continue
+            rank = (pos + len(alias), len(alias))
+            if best is None or rank > best[0]:
+                best = (rank, (lat, lng))
+    return best[1] if best else None
+
+
+def fill_location(apps, schema_editor):
+    Room = apps.get_model('core', 'Room')
+    batch = []
+    for room in Room.objects.only('id', 'address').exclude(address='').iterator(chunk_size=500):
+        coords = geocode_address(room.address)
+        if not coords:
+            continue
+        room.latitude, room.longitude = coords
+        room.location_source = 'GAZETTEER'
+        batch.append(room)
+        if len(batch) >= 500:
+            Room.objects.bulk_update(batch, ['latitude', 'longitude', 'location_source'])
+            batch = []
+    if batch:
+        Room.objects.bulk_update(batch, ['latitude', 'longitude', 'location_source'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_room_search_document'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='latitude',
+            field=models.FloatField(blank=True, help_text='Vĩ độ', null=True),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='location_source',
+            field=models.CharField(blank=True, choices=[('OWNER', 'OWNER'), ('GAZETTEER', 'GAZETTEER')], default='', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='longitude',
+            field=models.FloatField(blank=True, help_text='Kinh độ', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['latitude', 'longitude'], name='room_lat_lng_idx'),
+        ),
+        migrations.RunPython(fill_location, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_room_location'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(fields=['status', 'end_date'], name='contract_status_end_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_contract_room_dates_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tariff',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('ELEC', 'Điện'), ('WATER', 'Nước')], max_length=5)),
+                ('name', models.CharField(blank=True, default='', max_length=100)),
+                ('effective_from', models.DateField(help_text='Áp dụng cho các kỳ bắt đầu từ ngày này')),
+                ('tiers', models.JSONField(default=list, help_text='Các bậc giá: [{"up_to": 50, "price": 1984}, ..., {"up_to": null, "price": 3460}]')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['kind', '-effective_from'],
+                'unique_together': {('kind', 'effective_from')},
+            },
+        ),
+    ]
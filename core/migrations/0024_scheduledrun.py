@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:56
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduledRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Tên lịch trong SCHEDULED_TASKS', max_length=100)),
+                ('scheduled_for', models.DateTimeField(help_text='Mốc lịch của lần chạy')),
+                ('status', models.CharField(choices=[('RUNNING', 'RUNNING'), ('SUCCEEDED', 'SUCCEEDED'), ('FAILED', 'FAILED'), ('QUEUED', 'QUEUED'), ('SKIPPED', 'SKIPPED')], default='RUNNING', max_length=10)),
+                ('instance', models.CharField(blank=True, default='', help_text='Scheduler đã nhận lần chạy', max_length=100)),
+                ('lease_until', models.DateTimeField(blank=True, help_text='Hết hạn giữ lịch khi scheduler dừng giữa chừng', null=True)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('duration_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('job', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='scheduled_runs', to='core.job')),
+            ],
+            options={
+                'ordering': ['-scheduled_for'],
+                'unique_together': {('name', 'scheduled_for')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_invoice_status_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tariff',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
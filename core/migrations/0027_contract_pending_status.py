@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0026_tariff_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contract',
+            name='status',
+            field=models.CharField(choices=[('ACTIVE', 'ACTIVE'), ('ENDED', 'ENDED'), ('SUSPENDED', 'SUSPENDED'), ('PENDING', 'PENDING')], default='ACTIVE', max_length=10),
+        ),
+    ]
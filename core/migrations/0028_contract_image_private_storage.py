@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:07
+
+import core.blobstore
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_contract_pending_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contract',
+            name='contract_image',
+            field=models.ImageField(blank=True, help_text='Ảnh hợp đồng đã ký (nếu có)', null=True, storage=core.blobstore.private_storage, upload_to='contracts/'),
+        ),
+    ]
@@ -2,11 +2,17 @@ from django.db import models
 from django.utils import timezone
 from django.conf import settings
 
+from .blobstore import private_storage
+from .geo import geocode_address
+from .search import fold_text
+
 
 
 class Room(models.Model):
     EMPTY = "EMPTY"; RENTED = "RENTED"; MAINT = "MAINT"
     STATUS_CHOICES = [(EMPTY,"EMPTY"), (RENTED,"RENTED"), (MAINT,"MAINT")]
+    LOCATION_OWNER = "OWNER"; LOCATION_GAZETTEER = "GAZETTEER"
+    LOCATION_SOURCE_CHOICES = [(LOCATION_OWNER,"OWNER"), (LOCATION_GAZETTEER,"GAZETTEER")]
     
     name = models.CharField(max_length=50)
     area_m2 = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
@@ -22,6 +28,18 @@ class Room(models.Model):
    
     images = models.JSONField(default=list, blank=True, help_text="Danh sách tất cả hình ảnh của phòng (base64)")
     
+    # Tóm tắt ảnh cho danh sách phòng, tự tính lại khi lưu (xem refresh_image_summary)
+    cover_image = models.CharField(max_length=500, blank=True, default='', help_text="URL ảnh đại diện (không chứa base64)")
+    image_count = models.PositiveIntegerField(default=0, help_text="Số lượng ảnh của phòng")
+    
+    # Toạ độ phòng: chủ nhà nhập (OWNER) hoặc lấy theo tâm quận trong địa chỉ (GAZETTEER, xem core.geo)
+    latitude = models.FloatField(null=True, blank=True, help_text="Vĩ độ")
+    longitude = models.FloatField(null=True, blank=True, help_text="Kinh độ")
+    location_source = models.CharField(max_length=10, choices=LOCATION_SOURCE_CHOICES, blank=True, default='')
+    
+    # Nội dung tìm kiếm (name + address + detail đã bỏ dấu), tự tính lại khi lưu (xem core.search)
+    search_document = models.TextField(blank=True, default='', editable=False)
+    
     # Thông tin liên hệ chủ nhà
     owner_name = models.CharField(max_length=100, blank=True, default='', help_text="Tên chủ nhà")
     owner_phone = models.CharField(max_length=20, blank=True, default='', help_text="Số điện thoại chủ nhà")
@@ -31,11 +49,70 @@ class Room(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
 
+    IMAGE_SUMMARY_FIELDS = ("cover_image", "image_count")
+    SEARCH_SOURCE_FIELDS = ("name", "address", "detail")
+    LOCATION_FIELDS = ("latitude", "longitude", "location_source")
+
     def __str__(self):
         return f"{self.name} - {self.base_price}đ"
 
+    def refresh_image_summary(self):
+        """Tính lại cover_image/image_count từ image và images"""
+        images = self.images if isinstance(self.images, list) else []
+        candidates = [self.image] + images
+        self.cover_image = next(
+            (url for url in candidates
+             if isinstance(url, str) and url and not url.startswith("data:") and len(url) <= 500),
+            "",
+        )
+        self.image_count = len(images) if images else int(bool(self.image))
+
+    def refresh_search_document(self):
+        """Tính lại search_document, gọi trước bulk_create/bulk_update vì khi đó save() không chạy"""
+        self.search_document = fold_text(self.name, self.address, self.detail)
+
+    def refresh_location(self):
+        """Gán toạ độ theo quận trong địa chỉ, trừ khi toạ độ do chủ nhà nhập"""
+        if self.latitude is not None and self.location_source != self.LOCATION_GAZETTEER:
+            return
+        coords = geocode_address(self.address)
+        if coords:
+            self.latitude, self.longitude = coords
+            self.location_source = self.LOCATION_GAZETTEER
+        elif self.location_source == self.LOCATION_GAZETTEER:
+            self.latitude = self.longitude = None
+            self.location_source = ''
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or {"image", "images"} & set(update_fields):
+            self.refresh_image_summary()
+            if update_fields is not None:
+                kwargs["update_fields"] = set(kwargs["update_fields"]) | set(self.IMAGE_SUMMARY_FIELDS)
+        if update_fields is None or set(self.SEARCH_SOURCE_FIELDS) & set(update_fields):
+            self.refresh_search_document()
+            if update_fields is not None:
+                kwargs["update_fields"] = set(kwargs["update_fields"]) | {"search_document"}
+        if update_fields is None or "address" in update_fields:
+            self.refresh_location()
+            if update_fields is not None:
+                kwargs["update_fields"] = set(kwargs["update_fields"]) | set(self.LOCATION_FIELDS)
+        if update_fields is not None:
+            # updated_at là một phần phiên bản cache phòng (core.cache.get_room_version)
+            kwargs["update_fields"] = set(kwargs["update_fields"]) | {"updated_at"}
+        super().save(*args, **kwargs)
+
     class Meta:
         ordering = ['name']
+        indexes = [
+            # Tìm kiếm theo khoảng giá (kèm id cho keyset pagination)
+            models.Index(fields=["base_price", "id"], name="room_price_id_idx"),
+            models.Index(fields=["status", "base_price", "id"], name="room_status_price_id_idx"),
+            models.Index(fields=["bedrooms", "base_price"], name="room_bedrooms_price_idx"),
+            models.Index(fields=["area_m2"], name="room_area_idx"),
+            # Lọc khung toạ độ cho /api/rooms/nearby/
+            models.Index(fields=["latitude", "longitude"], name="room_lat_lng_idx"),
+        ]
 
 
 
@@ -62,7 +139,9 @@ class RentalRequest(models.Model):
 
 class Contract(models.Model):
     ACTIVE = "ACTIVE"; ENDED = "ENDED"; SUSPENDED = "SUSPENDED"
-    STATUS = [(ACTIVE,"ACTIVE"), (ENDED,"ENDED"), (SUSPENDED,"SUSPENDED")]
+    # Hợp đồng gia hạn (reissue) chờ hợp đồng hiện tại hết hạn, expire_contracts chuyển sang ACTIVE
+    PENDING = "PENDING"
+    STATUS = [(ACTIVE,"ACTIVE"), (ENDED,"ENDED"), (SUSPENDED,"SUSPENDED"), (PENDING,"PENDING")]
 
     room = models.ForeignKey("core.Room", on_delete=models.PROTECT, related_name="contracts")
     tenant = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT, related_name="contracts", limit_choices_to={'role': 'TENANT'})
@@ -75,7 +154,8 @@ class Contract(models.Model):
     notes = models.TextField(blank=True, default='', help_text="Ghi chú về hợp đồng")
     
     # Upload ảnh hợp đồng đã ký
-    contract_image = models.ImageField(upload_to='contracts/', blank=True, null=True, help_text="Ảnh hợp đồng đã ký (nếu có)")
+    # Lưu ngoài MEDIA_ROOT (PRIVATE_MEDIA_ROOT), chỉ tải qua /api/contracts/{id}/image/
+    contract_image = models.ImageField(upload_to='contracts/', storage=private_storage, blank=True, null=True, help_text="Ảnh hợp đồng đã ký (nếu có)")
     contract_image_base64 = models.TextField(blank=True, default='', help_text="Ảnh hợp đồng dạng base64")
     
     # Thông tin liên kết và thời gian
@@ -90,6 +170,12 @@ class Contract(models.Model):
                 name="uniq_active_contract_per_room"
             )
         ]
+        indexes = [
+            # Tìm hợp đồng ACTIVE đã hết hạn (core.tasks.expire_contracts)
+            models.Index(fields=["status", "end_date"], name="contract_status_end_idx"),
+            # Truy vấn chồng lấn ngày theo phòng (core.occupancy)
+            models.Index(fields=["room", "start_date", "end_date"], name="contract_room_dates_idx"),
+        ]
 
 class MeterReading(models.Model):
     contract = models.ForeignKey("core.Contract", on_delete=models.CASCADE, related_name="readings")
@@ -109,6 +195,31 @@ class MeterReading(models.Model):
         return f"{self.contract_id} - {self.period}"
 
 
+class Tariff(models.Model):
+    """
+    Bảng giá bậc thang điện/nước (theo bậc EVN). Mỗi lần đổi giá tạo một bản
+    ghi mới với effective_from, bản cũ giữ nguyên để tính lại các kỳ trước.
+    tiers: [{"up_to": 50, "price": 1984}, ..., {"up_to": null, "price": 3460}],
+    up_to là chỉ số tích luỹ cuối của bậc (kWh/m³), bậc cuối up_to = null.
+    """
+    ELEC = "ELEC"; WATER = "WATER"
+    KINDS = [(ELEC, "Điện"), (WATER, "Nước")]
+
+    kind = models.CharField(max_length=5, choices=KINDS)
+    name = models.CharField(max_length=100, blank=True, default='')
+    effective_from = models.DateField(help_text="Áp dụng cho các kỳ bắt đầu từ ngày này")
+    tiers = models.JSONField(default=list, help_text="Các bậc giá: [{\"up_to\": 50, \"price\": 1984}, ..., {\"up_to\": null, \"price\": 3460}]")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["kind", "-effective_from"]
+        unique_together = ("kind", "effective_from")
+
+    def __str__(self):
+        return f"{self.get_kind_display()} từ {self.effective_from}"
+
+
 class Invoice(models.Model):
     UNPAID = "UNPAID"
     PAID = "PAID" 
@@ -136,6 +247,10 @@ class Invoice(models.Model):
     class Meta:
         unique_together = ("contract", "period")  # mỗi hợp đồng–kỳ chỉ 1 hóa đơn
         ordering = ["-issued_at"]
+        indexes = [
+            # Tìm hóa đơn UNPAID đã quá hạn (core.tasks.mark_overdue_invoices) chỉ quét các dòng cần đổi
+            models.Index(fields=["status", "due_date"], name="invoice_status_due_idx"),
+        ]
 
     def save(self, *args, **kwargs):
         # Tự động tính tổng tiền khi lưu
@@ -145,6 +260,21 @@ class Invoice(models.Model):
     def __str__(self):
         return f"Invoice {self.id} - {self.contract} - {self.period} - {self.total}đ"
 
+
+class InvoiceStatusLog(models.Model):
+    """Lịch sử đổi trạng thái hóa đơn; changed_by trống là do hệ thống (tác vụ định kỳ)."""
+    invoice = models.ForeignKey("core.Invoice", on_delete=models.CASCADE, related_name="status_logs")
+    from_status = models.CharField(max_length=10, choices=Invoice.STATUS_CHOICES)
+    to_status = models.CharField(max_length=10, choices=Invoice.STATUS_CHOICES)
+    changed_at = models.DateTimeField(default=timezone.now)
+    changed_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+
+    class Meta:
+        ordering = ["-changed_at"]
+
+    def __str__(self):
+        return f"Invoice {self.invoice_id}: {self.from_status} -> {self.to_status}"
+
 class Payment(models.Model):
     CASH = "CASH"
     BANK = "BANK"
@@ -165,3 +295,76 @@ class Payment(models.Model):
 
     class Meta:
         ordering = ["-paid_at"]
+
+
+class Job(models.Model):
+    """
+    Tác vụ nền chạy bởi `manage.py run_worker` (xem core.jobs). Worker nhận job
+    bằng SELECT ... FOR UPDATE SKIP LOCKED nên không cần broker ngoài.
+    """
+    QUEUED = "QUEUED"; RUNNING = "RUNNING"; SUCCEEDED = "SUCCEEDED"; FAILED = "FAILED"
+    STATUSES = [(QUEUED, "QUEUED"), (RUNNING, "RUNNING"), (SUCCEEDED, "SUCCEEDED"), (FAILED, "FAILED")]
+
+    name = models.CharField(max_length=100, help_text="Tên tác vụ trong core.tasks.TASKS")
+    payload = models.JSONField(default=dict, blank=True, help_text="Tham số keyword của tác vụ")
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_at = models.DateTimeField(default=timezone.now, help_text="Chưa chạy trước thời điểm này (dùng cho retry)")
+
+    # Tiến độ do tác vụ báo về (core.jobs.report_progress)
+    progress_done = models.PositiveIntegerField(default=0)
+    progress_total = models.PositiveIntegerField(null=True, blank=True)
+    progress_message = models.CharField(max_length=255, blank=True, default='')
+
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+
+    locked_by = models.CharField(max_length=100, blank=True, default='', help_text="Worker đang chạy job")
+    locked_at = models.DateTimeField(null=True, blank=True, help_text="Lần cuối worker báo còn sống")
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name="jobs")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            # Worker tìm job đến hạn (core.jobs.claim_job)
+            models.Index(fields=["status", "run_at"], name="job_status_run_at_idx"),
+        ]
+
+    def __str__(self):
+        return f"Job {self.id} {self.name} ({self.status})"
+
+
+class ScheduledRun(models.Model):
+    """
+    Một lần chạy của tác vụ định kỳ trong SCHEDULED_TASKS (xem core.scheduler).
+    Ràng buộc unique (name, scheduled_for) bảo đảm mỗi mốc lịch chỉ một
+    instance của `manage.py run_scheduler` nhận chạy.
+    """
+    RUNNING = "RUNNING"; SUCCEEDED = "SUCCEEDED"; FAILED = "FAILED"; QUEUED = "QUEUED"; SKIPPED = "SKIPPED"
+    STATUSES = [
+        (RUNNING, "RUNNING"), (SUCCEEDED, "SUCCEEDED"), (FAILED, "FAILED"),
+        (QUEUED, "QUEUED"), (SKIPPED, "SKIPPED"),
+    ]
+
+    name = models.CharField(max_length=100, help_text="Tên lịch trong SCHEDULED_TASKS")
+    scheduled_for = models.DateTimeField(help_text="Mốc lịch của lần chạy")
+    status = models.CharField(max_length=10, choices=STATUSES, default=RUNNING)
+    instance = models.CharField(max_length=100, blank=True, default='', help_text="Scheduler đã nhận lần chạy")
+    lease_until = models.DateTimeField(null=True, blank=True, help_text="Hết hạn giữ lịch khi scheduler dừng giữa chừng")
+    job = models.ForeignKey("core.Job", null=True, blank=True, on_delete=models.SET_NULL, related_name="scheduled_runs")
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    duration_ms = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-scheduled_for"]
+        unique_together = ("name", "scheduled_for")
+
+    def __str__(self):
+        return f"{self.name} @ {self.scheduled_for:%Y-%m-%d %H:%M} ({self.status})"
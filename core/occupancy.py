@@ -0,0 +1,144 @@
+"""
+Lịch trống/đã thuê của phòng.
+
+Availability dùng một OccupancyIndex (IntervalTree của mọi hợp đồng còn
+giữ phòng: ACTIVE, SUSPENDED, PENDING) nạp bằng một query và giữ trong bộ nhớ của
+process; chỉ nạp lại khi phiên bản bảng hợp đồng đọc từ CSDL (số bản ghi,
+updated_at mới nhất) thay đổi, nên thay đổi từ process khác (run_worker,
+run_scheduler, web worker khác) có hiệu lực ngay ở request kế tiếp.
+Timeline của một phòng đọc trực tiếp các hợp đồng giao với khoảng ngày
+(index contract_room_dates_idx), kể cả hợp đồng đã kết thúc.
+
+Phòng đang MAINT bị coi là bận từ hôm nay trở đi vì chưa có lịch bảo trì
+theo ngày.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .intervals import IntervalTree, free_gaps
+from .models import Contract, Room
+
+logger = logging.getLogger(__name__)
+
+BLOCKING_STATUSES = (Contract.ACTIVE, Contract.SUSPENDED, Contract.PENDING)
+# Nạp lại chỉ mục sau tối đa chừng này giây dù phiên bản không đổi: transaction
+# dài có thể commit sau với updated_at cũ hơn bản ghi mới nhất (giây)
+INDEX_MAX_AGE = 60
+
+
+class OccupancyIndex:
+    def __init__(self, rows):
+        intervals = []
+        for start, end, room_id, contract_id, status in rows:
+            if start > end:
+                logger.warning("Contract %s has start_date after end_date, ignored", contract_id)
+                continue
+            intervals.append((start, end, room_id, contract_id, status))
+        self.tree = IntervalTree(intervals)
+
+    @classmethod
+    def load(cls):
+        rows = Contract.objects.filter(status__in=BLOCKING_STATUSES).values_list(
+            "start_date", "end_date", "room_id", "id", "status"
+        )
+        return cls(rows)
+
+    def busy(self, start, end):
+        """{room_id: [(start, end, contract_id, status), ...]} giao với [start, end]."""
+        result = defaultdict(list)
+        for iv_start, iv_end, room_id, contract_id, status in self.tree.overlap(start, end):
+            result[room_id].append((iv_start, iv_end, contract_id, status))
+        return result
+
+
+_index = None
+_index_version = None
+_index_loaded = 0.0
+_index_lock = threading.Lock()
+
+
+def get_contract_version():
+    # Mọi đường ghi hợp đồng (save, update hàng loạt, bulk_create) đều đổi updated_at; xoá làm đổi số bản ghi
+    version = Contract.objects.aggregate(count=Count("id"), updated=Max("updated_at"))
+    return version["count"], version["updated"]
+
+
+def get_occupancy_index():
+    global _index, _index_version, _index_loaded
+    version = get_contract_version()
+    with _index_lock:
+        expired = time.monotonic() - _index_loaded > INDEX_MAX_AGE
+        if _index is None or _index_version != version or expired:
+            _index = OccupancyIndex.load()
+            _index_version = version
+            _index_loaded = time.monotonic()
+        return _index
+
+
+def _maint_window(start, end, today):
+    if end < today:
+        return []
+    return [(max(start, today), end)]
+
+
+def _dates(intervals):
+    return [{"start": s, "end": e} for s, e in intervals]
+
+
+def room_availability(rooms, start, end, today=None):
+    """
+    rooms: các dict có id, name, status. Trả về list
+    {"id", "name", "available", "busy": [...], "free": [...]} theo thứ tự rooms.
+    """
+    today = today or timezone.localdate()
+    busy = get_occupancy_index().busy(start, end)
+    results = []
+    for room in rooms:
+        intervals = [(s, e) for s, e, _cid, _status in busy.get(room["id"], [])]
+        if room["status"] == Room.MAINT:
+            intervals += _maint_window(start, end, today)
+        intervals = [(max(s, start), min(e, end)) for s, e in intervals]
+        results.append({
+            "id": room["id"],
+            "name": room["name"],
+            "available": not intervals,
+            "busy": _dates(sorted(intervals)),
+            "free": _dates(free_gaps(intervals, start, end)),
+        })
+    return results
+
+
+def room_timeline(room, start, end, include_contracts=False, today=None):
+    """
+    Các đoạn trong [start, end]: OCCUPIED (hợp đồng đang giữ phòng), ENDED
+    (thời gian của hợp đồng đã kết thúc), MAINT hoặc FREE (không có hợp đồng nào).
+    """
+    today = today or timezone.localdate()
+    contracts = (
+        Contract.objects.filter(room=room, start_date__lte=end, end_date__gte=start)
+        .order_by("start_date", "id")
+        .values("id", "start_date", "end_date", "status")
+    )
+    segments = []
+    intervals = []
+    for contract in contracts:
+        seg_start, seg_end = max(contract["start_date"], start), min(contract["end_date"], end)
+        blocking = contract["status"] in BLOCKING_STATUSES
+        segment = {"start": seg_start, "end": seg_end, "state": "OCCUPIED" if blocking else "ENDED"}
+        if include_contracts:
+            segment["contract"] = contract["id"]
+        segments.append(segment)
+        intervals.append((seg_start, seg_end))
+    if room.status == Room.MAINT:
+        for seg_start, seg_end in _maint_window(start, end, today):
+            segments.append({"start": seg_start, "end": seg_end, "state": "MAINT"})
+            intervals.append((seg_start, seg_end))
+    for seg_start, seg_end in free_gaps(intervals, start, end):
+        segments.append({"start": seg_start, "end": seg_end, "state": "FREE"})
+    segments.sort(key=lambda seg: (seg["start"], seg["end"]))
+    return segments
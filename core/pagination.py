@@ -1,6 +1,121 @@
+import base64
+import binascii
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
 
 class DefaultPagination(PageNumberPagination):
     page_size = 10
-    page_size_query_param = "page_size"   
+    page_size_query_param = "page_size"
     max_page_size = 100
+
+
+class RoomPagination(DefaultPagination):
+    """
+    Phân trang cho danh sách phòng.
+
+    Mặc định vẫn là page number (?page=2). Khi gửi ?cursor=... (hoặc
+    ?pagination=keyset cho trang đầu) thì chuyển sang keyset theo
+    (base_price, id): trang sau chỉ cần "WHERE (base_price, id) > (...)"
+    trên index room_price_id_idx / room_status_price_id_idx, không OFFSET
+    và không COUNT(*), nên thời gian không tăng theo số trang.
+    ?ordering=-base_price để duyệt giá giảm dần.
+    """
+    cursor_query_param = "cursor"
+    mode_query_param = "pagination"
+    price_field = "base_price"
+    invalid_cursor_message = "Cursor không hợp lệ"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = (
+            self.cursor_query_param in request.query_params
+            or request.query_params.get(self.mode_query_param) == "keyset"
+        )
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.page_size_value = self.get_page_size(request)
+        self.descending = request.query_params.get("ordering", "").strip() == f"-{self.price_field}"
+        prefix = "-" if self.descending else ""
+        queryset = queryset.order_by(f"{prefix}{self.price_field}", f"{prefix}id")
+
+        cursor = self.decode_cursor(request.query_params.get(self.cursor_query_param))
+        if cursor is not None:
+            price, pk = cursor
+            op = "lt" if self.descending else "gt"
+            queryset = queryset.filter(
+                Q(**{f"{self.price_field}__{op}": price})
+                | Q(**{self.price_field: price, f"id__{op}": pk})
+            )
+
+        # Lấy dư một dòng để biết còn trang sau hay không
+        rows = list(queryset[:self.page_size_value + 1])
+        self.has_next = len(rows) > self.page_size_value
+        rows = rows[:self.page_size_value]
+        last = rows[-1] if rows else None
+        self.next_cursor = (
+            self.encode_cursor(getattr(last, self.price_field), last.pk) if self.has_next else None
+        )
+        return rows
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response({
+            "next": self.get_next_link(),
+            "results": data,
+        })
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if self.next_cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.mode_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        return None
+
+    @staticmethod
+    def encode_cursor(price, pk):
+        raw = f"{price}:{pk}".encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def decode_cursor(self, value):
+        if not value:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)).decode()
+            price, pk = raw.split(":", 1)
+            return Decimal(price), int(pk)
+        except (binascii.Error, UnicodeDecodeError, ValueError, InvalidOperation):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        parameters += [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Cursor keyset (lấy từ 'next' của trang trước)",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.mode_query_param,
+                "required": False,
+                "in": "query",
+                "description": "'keyset' để lấy trang đầu theo keyset (base_price, id)",
+                "schema": {"type": "string", "enum": ["keyset"]},
+            },
+        ]
+        return parameters
@@ -0,0 +1,196 @@
+"""
+Nhập chỉ số điện nước hàng loạt cho một kỳ (POST /api/meter-readings/bulk/).
+
+Mọi dòng được validate trong bộ nhớ, hợp đồng và chỉ số kỳ trước được đọc
+bằng vài query cho cả lô (không query theo từng dòng), sau đó ghi bằng
+bulk_create(update_conflicts=True) trên (contract, period): kỳ đã có chỉ số
+thì cập nhật, chưa có thì tạo mới.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+
+from .models import Contract, MeterReading
+from .serializers import MeterReadingRowSerializer
+
+READING_FIELDS = ("elec_prev", "elec_curr", "water_prev", "water_curr", "elec_price", "water_price")
+
+
+def prior_readings(period, contract=OuterRef("contract")):
+    """
+    Chỉ số của kỳ gần nhất trước period, dùng làm subquery tương quan theo
+    contract. Mỗi lần tra là một lần seek trên unique index (contract, period).
+    """
+    return MeterReading.objects.filter(contract=contract, period__lt=period).order_by("-period")
+
+
+def previous_readings(contract_ids, period):
+    """{contract_id: dict chỉ số của kỳ gần nhất trước period} trong một query."""
+    rows = (
+        MeterReading.objects.filter(
+            contract_id__in=contract_ids,
+            period=Subquery(prior_readings(period).values("period")[:1]),
+        )
+        .values("contract_id", "period", "elec_curr", "water_curr", "elec_price", "water_price")
+    )
+    return {row["contract_id"]: row for row in rows}
+
+
+def reading_sheet(period, contracts=None):
+    """
+    Phiếu ghi chỉ số của kỳ period cho các hợp đồng ACTIVE, trong một query:
+    chỉ số cũ và đơn giá lấy từ kỳ trước, chỉ số mới lấy từ kỳ này nếu đã nhập.
+    """
+    contracts = Contract.objects.all() if contracts is None else contracts
+    prior = prior_readings(period, OuterRef("pk"))
+    current = MeterReading.objects.filter(contract=OuterRef("pk"), period=period)
+    rows = (
+        contracts.filter(status=Contract.ACTIVE)
+        .annotate(
+            prev_period=Subquery(prior.values("period")[:1]),
+            elec_prev=Subquery(prior.values("elec_curr")[:1]),
+            water_prev=Subquery(prior.values("water_curr")[:1]),
+            elec_price=Subquery(prior.values("elec_price")[:1]),
+            water_price=Subquery(prior.values("water_price")[:1]),
+            reading=Subquery(current.values("pk")[:1]),
+            elec_curr=Subquery(current.values("elec_curr")[:1]),
+            water_curr=Subquery(current.values("water_curr")[:1]),
+        )
+        .order_by("room__name", "pk")
+        .values(
+            "prev_period", "elec_prev", "water_prev", "elec_price", "water_price",
+            "room_id", "reading", "elec_curr", "water_curr",
+            contract=F("pk"), room_name=F("room__name"), tenant_name=F("tenant__full_name"),
+        )
+    )
+    defaults = {
+        "elec_price": MeterReading._meta.get_field("elec_price").default,
+        "water_price": MeterReading._meta.get_field("water_price").default,
+    }
+    sheet = []
+    for row in rows:
+        row["period"] = period
+        for field, default in defaults.items():
+            if row[field] is None:
+                row[field] = default
+        sheet.append(row)
+    return sheet
+
+
+def upsert_readings(rows, period=None, atomic=False):
+    """
+    rows: iterable (line_no, row, error) như core.importers.iter_rows.
+    period: kỳ mặc định cho dòng không có cột period.
+    atomic: có dòng lỗi thì không ghi dòng nào.
+
+    Trả về {"created", "updated", "failed", "errors": [{"line", "errors"}]}.
+    """
+    errors = []
+    error_count = 0
+
+    def fail(line_no, error):
+        nonlocal error_count
+        error_count += 1
+        if len(errors) < settings.BULK_IMPORT_MAX_ERRORS:
+            errors.append({"line": line_no, "errors": error})
+
+    # 1. Validate kiểu dữ liệu từng dòng, không query
+    valid = []
+    seen = set()
+    for count, (line_no, row, error) in enumerate(rows, start=1):
+        if count > settings.BULK_IMPORT_MAX_ROWS:
+            fail(line_no, f"Vượt quá {settings.BULK_IMPORT_MAX_ROWS} dòng mỗi lần nhập")
+            break
+        if error is not None:
+            fail(line_no, error)
+            continue
+        serializer = MeterReadingRowSerializer(data=row)
+        if not serializer.is_valid():
+            fail(line_no, serializer.errors)
+            continue
+        data = serializer.validated_data
+        data.setdefault("period", period)
+        if not data["period"]:
+            fail(line_no, {"period": "Thiếu kỳ (YYYY-MM), truyền cột period hoặc ?period="})
+            continue
+        key = (data["contract"], data["period"])
+        if key in seen:
+            fail(line_no, {"contract": f"Trùng dòng khác của hợp đồng {key[0]} kỳ {key[1]}"})
+            continue
+        seen.add(key)
+        valid.append((line_no, data))
+
+    # 2. Đọc hợp đồng, chỉ số kỳ trước và các kỳ đã nhập cho cả lô
+    contract_ids = {data["contract"] for _, data in valid}
+    periods = {data["period"] for _, data in valid}
+    statuses = dict(Contract.objects.filter(pk__in=contract_ids).values_list("id", "status")) if valid else {}
+    previous = {
+        p: previous_readings([data["contract"] for _, data in valid if data["period"] == p], p)
+        for p in periods
+    }
+    existing = set(
+        MeterReading.objects.filter(contract_id__in=contract_ids, period__in=periods)
+        .values_list("contract_id", "period")
+    ) if valid else set()
+
+    # 3. Kiểm tra nghiệp vụ và dựng bản ghi
+    readings = []
+    updated = 0
+    for line_no, data in valid:
+        contract_status = statuses.get(data["contract"])
+        if contract_status is None:
+            fail(line_no, {"contract": "Hợp đồng không tồn tại."})
+            continue
+        if contract_status != Contract.ACTIVE:
+            fail(line_no, {"contract": "Hợp đồng không ở trạng thái ACTIVE."})
+            continue
+
+        prev = previous[data["period"]].get(data["contract"])
+        row_errors = {}
+        for kind in ("elec", "water"):
+            if f"{kind}_prev" not in data:
+                if prev is None:
+                    row_errors[f"{kind}_prev"] = "Chưa có chỉ số kỳ trước, cần nhập chỉ số cũ."
+                    continue
+                data[f"{kind}_prev"] = prev[f"{kind}_curr"]
+            if data[f"{kind}_curr"] < data[f"{kind}_prev"]:
+                label = "điện" if kind == "elec" else "nước"
+                row_errors[f"{kind}_curr"] = f"Chỉ số {label} mới không được nhỏ hơn chỉ số cũ."
+            # Đơn giá mặc định theo kỳ trước, chưa có thì theo mặc định của model
+            if f"{kind}_price" not in data:
+                data[f"{kind}_price"] = (
+                    prev[f"{kind}_price"] if prev else MeterReading._meta.get_field(f"{kind}_price").default
+                )
+        if row_errors:
+            fail(line_no, row_errors)
+            continue
+
+        if (data["contract"], data["period"]) in existing:
+            updated += 1
+        readings.append(MeterReading(
+            contract_id=data["contract"],
+            period=data["period"],
+            **{field: data[field] for field in READING_FIELDS},
+        ))
+
+    # Lỗi kiểu dữ liệu và lỗi nghiệp vụ được phát hiện ở hai bước, sắp lại theo dòng
+    errors.sort(key=lambda error: error["line"])
+    if atomic and error_count:
+        return {"created": 0, "updated": 0, "failed": error_count, "errors": errors}
+
+    # 4. Ghi một lần (theo lô) bằng upsert trên (contract, period)
+    if readings:
+        with transaction.atomic():
+            MeterReading.objects.bulk_create(
+                readings,
+                batch_size=settings.BULK_IMPORT_BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=["contract", "period"],
+                update_fields=list(READING_FIELDS),
+            )
+    return {
+        "created": len(readings) - updated,
+        "updated": updated,
+        "failed": error_count,
+        "errors": errors,
+    }
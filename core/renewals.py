@@ -0,0 +1,126 @@
+"""
+Gia hạn hợp đồng hàng loạt (POST /api/contracts/renew/).
+
+Hai cách gia hạn, đều chạy trong một transaction:
+- EXTEND: một câu UPDATE đổi end_date và tăng monthly_rent ngay trên hợp đồng cũ.
+- REISSUE: bulk_create hợp đồng mới (PENDING) bắt đầu từ ngày kế tiếp end_date
+  cũ với giá thuê mới. Hợp đồng cũ vẫn ACTIVE tới hết end_date để phòng không
+  bị trống giữa chừng (lập hóa đơn, ghi chỉ số, lịch trống); expire_contracts
+  kết thúc hợp đồng cũ và chuyển hợp đồng mới sang ACTIVE.
+
+Hợp đồng có end_date đã sau ngày kết thúc mới, hoặc (REISSUE) phòng đã có
+hợp đồng PENDING, thì bỏ qua (skipped).
+"""
+import logging
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from .models import Contract
+
+logger = logging.getLogger(__name__)
+
+EXTEND = "extend"
+REISSUE = "reissue"
+MODES = (EXTEND, REISSUE)
+
+RENEWAL_FIELDS = (
+    "id", "room_id", "tenant_id", "start_date", "end_date",
+    "monthly_rent", "deposit", "billing_cycle",
+)
+
+
+def renewed_rent(rent, factor):
+    # Làm tròn tới đồng, giống Round() trong câu UPDATE của EXTEND
+    return (rent * factor).quantize(Decimal("1"), rounding=ROUND_HALF_UP)
+
+
+def renew_contracts(contracts, end_date, rent_increase_percent=Decimal("0"), mode=EXTEND, dry_run=False):
+    """
+    Gia hạn các hợp đồng ACTIVE trong queryset contracts tới end_date, giá thuê
+    tăng rent_increase_percent %. dry_run: tính kết quả rồi rollback.
+
+    Trả về {"matched", "renewed", "skipped", "results": [...]}, mỗi phần tử
+    results gồm contract, room, old/new end_date, old/new rent và new_contract
+    (id hợp đồng mới khi REISSUE).
+    """
+    if mode not in MODES:
+        raise ValueError(f"Cách gia hạn không hợp lệ: {mode}")
+    factor = 1 + Decimal(rent_increase_percent) / 100
+    now = timezone.now()
+    # REISSUE: hợp đồng mới bắt đầu sau end_date cũ một ngày và phải dài ít nhất một ngày
+    cutoff = end_date - timedelta(days=1) if mode == REISSUE else end_date
+    contracts = contracts.filter(status=Contract.ACTIVE)
+
+    with transaction.atomic():
+        eligible = contracts.filter(end_date__lt=cutoff)
+        if mode == REISSUE:
+            eligible = eligible.exclude(room__contracts__status=Contract.PENDING)
+        rows = list(
+            eligible.select_for_update()
+            .order_by("pk")
+            .values(*RENEWAL_FIELDS)
+        )
+        skipped = contracts.count() - len(rows)
+        ids = [row["id"] for row in rows]
+        results = [
+            {
+                "contract": row["id"],
+                "room": row["room_id"],
+                "old_end_date": row["end_date"],
+                "new_end_date": end_date,
+                "old_rent": row["monthly_rent"],
+                "new_rent": renewed_rent(row["monthly_rent"], factor),
+                "new_contract": None,
+            }
+            for row in rows
+        ]
+
+        if ids and mode == EXTEND:
+            Contract.objects.filter(pk__in=ids).update(
+                end_date=end_date,
+                monthly_rent=Round(F("monthly_rent") * factor),
+                updated_at=now,
+            )
+            # Báo đúng giá đã lưu (làm tròn phía CSDL)
+            stored = dict(Contract.objects.filter(pk__in=ids).values_list("id", "monthly_rent"))
+            for result in results:
+                result["new_rent"] = stored[result["contract"]]
+        elif ids:
+            created = Contract.objects.bulk_create(
+                Contract(
+                    room_id=row["room_id"],
+                    tenant_id=row["tenant_id"],
+                    start_date=row["end_date"] + timedelta(days=1),
+                    end_date=end_date,
+                    monthly_rent=result["new_rent"],
+                    deposit=row["deposit"],
+                    billing_cycle=row["billing_cycle"],
+                    status=Contract.PENDING,
+                    notes=f"Gia hạn từ hợp đồng #{row['id']}",
+                    created_at=now,
+                )
+                for row, result in zip(rows, results)
+            )
+            if created and created[0].pk is None:
+                # Backend không trả id sau bulk_create: đọc lại theo phòng
+                new_ids = dict(
+                    Contract.objects.filter(room_id__in=[row["room_id"] for row in rows], status=Contract.PENDING)
+                    .values_list("room_id", "id")
+                )
+                for result in results:
+                    result["new_contract"] = new_ids.get(result["room"])
+            else:
+                for result, contract in zip(results, created):
+                    result["new_contract"] = contract.pk
+
+        if dry_run:
+            transaction.set_rollback(True)
+
+    stats = {"matched": len(rows) + skipped, "renewed": len(rows), "skipped": skipped}
+    logger.info("renew_contracts(%s, %s, %s%%, dry_run=%s): %s", mode, end_date, rent_increase_percent, dry_run, stats)
+    return {**stats, "results": results}
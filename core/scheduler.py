@@ -0,0 +1,208 @@
+"""
+Bộ lập lịch tác vụ định kỳ (`manage.py run_scheduler`).
+
+Lịch khai báo trong settings.SCHEDULED_TASKS theo cú pháp cron 5 trường
+(phút giờ ngày tháng thứ, giờ địa phương theo TIME_ZONE):
+
+    SCHEDULED_TASKS = {
+        "mark-overdue-invoices": {"schedule": "*/15 * * * *", "task": "mark_overdue_invoices"},
+        "monthly-invoices": {"schedule": "0 6 1 * *", "task": "generate_invoices", "queue": True},
+    }
+
+task là tên trong core.tasks.TASKS, kwargs là tham số của tác vụ; queue=True
+thì đưa vào hàng đợi core.jobs thay vì chạy ngay trong scheduler.
+
+Có thể chạy nhiều scheduler cùng lúc (nhiều instance): mỗi mốc lịch được
+nhận bằng cách tạo dòng ScheduledRun unique (name, scheduled_for), instance
+nào tạo được thì chạy, các instance khác bỏ qua. Trong lúc chạy, dòng đó
+giữ lease tới lease_until; lần chạy trước của cùng lịch còn giữ lease thì mốc
+mới được ghi SKIPPED thay vì chạy chồng.
+"""
+import logging
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .jobs import enqueue, get_tasks, json_safe
+from .models import ScheduledRun
+
+logger = logging.getLogger(__name__)
+
+# (tên, nhỏ nhất, lớn nhất) của từng trường cron
+FIELDS = [("minute", 0, 59), ("hour", 0, 23), ("day", 1, 31), ("month", 1, 12), ("weekday", 0, 7)]
+
+
+class ScheduleError(ValueError):
+    pass
+
+
+def _parse_field(text, low, high, name):
+    values = set()
+    for part in text.split(","):
+        expr, _, step = part.partition("/")
+        try:
+            step = int(step) if step else 1
+            if expr == "*":
+                start, end = low, high
+            elif "-" in expr:
+                start, end = (int(v) for v in expr.split("-", 1))
+            else:
+                start = end = int(expr)
+                if step != 1:
+                    end = high
+        except ValueError:
+            raise ScheduleError(f"Trường {name} không hợp lệ: {text!r}")
+        if step < 1 or not low <= start <= end <= high:
+            raise ScheduleError(f"Trường {name} ngoài khoảng {low}-{high}: {text!r}")
+        values.update(range(start, end + 1, step))
+    if name == "weekday":
+        # Chủ nhật viết 0 hay 7 đều được
+        values = {value % 7 for value in values}
+    return frozenset(values)
+
+
+class CronSchedule:
+    """Biểu thức cron 5 trường; hỗ trợ *, a-b, a,b và bước /n."""
+
+    def __init__(self, expression):
+        parts = expression.split()
+        if len(parts) != len(FIELDS):
+            raise ScheduleError(f"Cần {len(FIELDS)} trường (phút giờ ngày tháng thứ): {expression!r}")
+        self.expression = expression
+        for text, (name, low, high) in zip(parts, FIELDS):
+            setattr(self, name, _parse_field(text, low, high, name))
+        # Như cron: giới hạn cả ngày lẫn thứ thì chỉ cần khớp một trong hai
+        self._day_any = parts[2] == "*"
+        self._weekday_any = parts[4] == "*"
+
+    def _day_matches(self, dt):
+        day = dt.day in self.day
+        # Python: thứ Hai = 0; cron: Chủ nhật = 0
+        weekday = (dt.weekday() + 1) % 7 in self.weekday
+        if self._day_any or self._weekday_any:
+            return day and weekday
+        return day or weekday
+
+    def matches(self, dt):
+        return (
+            dt.minute in self.minute and dt.hour in self.hour
+            and dt.month in self.month and self._day_matches(dt)
+        )
+
+    def latest(self, now, window):
+        """Mốc gần nhất trong (now - window, now] khớp lịch, không có thì None."""
+        slot = timezone.localtime(now).replace(second=0, microsecond=0)
+        earliest = now - window
+        while slot > earliest:
+            if self.matches(slot):
+                return slot
+            slot -= timedelta(minutes=1)
+        return None
+
+    def next_after(self, now):
+        """Mốc kế tiếp sau now (tối đa 5 năm)."""
+        slot = timezone.localtime(now).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = slot + timedelta(days=366 * 5)
+        while slot < limit:
+            if slot.month not in self.month or not self._day_matches(slot):
+                slot = (slot + timedelta(days=1)).replace(hour=0, minute=0)
+            elif slot.hour not in self.hour:
+                slot = (slot + timedelta(hours=1)).replace(minute=0)
+            elif slot.minute not in self.minute:
+                slot += timedelta(minutes=1)
+            else:
+                return slot
+        return None
+
+
+class Entry:
+    def __init__(self, name, config):
+        self.name = name
+        self.schedule = CronSchedule(config["schedule"])
+        self.task = config["task"]
+        if self.task not in get_tasks():
+            raise ScheduleError(f"{name}: tác vụ không tồn tại: {self.task}")
+        self.kwargs = config.get("kwargs", {})
+        self.queue = config.get("queue", False)
+        self.lease = timedelta(seconds=config.get("lease", settings.SCHEDULER_LEASE))
+
+
+def get_entries():
+    return [Entry(name, config) for name, config in settings.SCHEDULED_TASKS.items()]
+
+
+def claim(entry, slot, instance):
+    """Nhận mốc slot của entry; trả về ScheduledRun hoặc None nếu instance khác đã nhận."""
+    if ScheduledRun.objects.filter(name=entry.name, scheduled_for=slot).exists():
+        return None
+    now = timezone.now()
+    busy = ScheduledRun.objects.filter(name=entry.name, status=ScheduledRun.RUNNING, lease_until__gt=now).exists()
+    try:
+        with transaction.atomic():
+            return ScheduledRun.objects.create(
+                name=entry.name,
+                scheduled_for=slot,
+                status=ScheduledRun.SKIPPED if busy else ScheduledRun.RUNNING,
+                instance=instance,
+                lease_until=None if busy else now + entry.lease,
+                error="Lần chạy trước vẫn đang chạy" if busy else '',
+                finished_at=now if busy else None,
+            )
+    except IntegrityError:
+        return None
+
+
+def execute(entry, run):
+    started = time.monotonic()
+    try:
+        if entry.queue:
+            job = enqueue(entry.task, entry.kwargs)
+            fields = {"status": ScheduledRun.QUEUED, "job": job}
+        else:
+            result = get_tasks()[entry.task](**entry.kwargs)
+            fields = {"status": ScheduledRun.SUCCEEDED, "result": json_safe(result)}
+    except Exception:
+        logger.exception("Scheduled task %s (%s) failed", entry.name, run.scheduled_for)
+        fields = {"status": ScheduledRun.FAILED, "error": traceback.format_exc(limit=5)}
+    duration = int((time.monotonic() - started) * 1000)
+    ScheduledRun.objects.filter(pk=run.pk).update(
+        finished_at=timezone.now(), duration_ms=duration, lease_until=None, **fields
+    )
+    logger.info("Scheduled task %s (%s): %s in %sms", entry.name, run.scheduled_for, fields["status"], duration)
+    return fields["status"]
+
+
+def expire_leases():
+    """Lần chạy RUNNING đã hết lease (scheduler chết giữa chừng) được ghi FAILED."""
+    now = timezone.now()
+    return ScheduledRun.objects.filter(status=ScheduledRun.RUNNING, lease_until__lte=now).update(
+        status=ScheduledRun.FAILED, finished_at=now, lease_until=None, error="Hết lease, scheduler dừng giữa chừng"
+    )
+
+
+def tick(entries, instance, now=None):
+    """
+    Chạy các lịch đến hạn. Mốc bị lỡ (scheduler tắt, tick chậm) vẫn được chạy
+    nếu chưa quá SCHEDULER_MISFIRE_GRACE giây. Trả về danh sách (tên, trạng thái).
+    """
+    now = now or timezone.now()
+    expire_leases()
+    window = timedelta(seconds=settings.SCHEDULER_MISFIRE_GRACE)
+    ran = []
+    for entry in entries:
+        slot = entry.schedule.latest(now, window)
+        if slot is None:
+            continue
+        run = claim(entry, slot, instance)
+        if run is None:
+            continue
+        if run.status == ScheduledRun.SKIPPED:
+            logger.warning("Scheduled task %s (%s) skipped: previous run still holds its lease", entry.name, slot)
+            ran.append((entry.name, run.status))
+            continue
+        ran.append((entry.name, execute(entry, run)))
+    return ran
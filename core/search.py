@@ -0,0 +1,175 @@
+"""
+Tìm kiếm phòng không phân biệt dấu.
+
+Room.search_document giữ nội dung name + address + detail đã bỏ dấu và
+viết thường (xem fold_text), được cập nhật mỗi khi lưu phòng. Migration
+0018 tạo index full-text trên cột này theo từng loại DB:
+
+- PostgreSQL: GIN trên to_tsvector('simple', search_document)
+- SQLite: bảng ảo FTS5 core_room_fts, đồng bộ bằng trigger
+
+RoomSearchFilter dùng index tương ứng và sắp xếp theo độ liên quan; với DB
+khác (hoặc SQLite không có FTS5) thì quay về icontains trên search_document.
+"""
+import re
+import unicodedata
+
+from django.db import OperationalError, connection
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import BaseFilterBackend
+
+FTS_TABLE = "core_room_fts"
+# Biểu thức phải trùng với index GIN trong migration để Postgres dùng được index
+PG_TSVECTOR = "to_tsvector('simple', \"core_room\".\"search_document\")"
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+MAX_QUERY_TOKENS = 8
+
+
+def fold_text(*parts):
+    """'Phòng trọ Quận 7' -> 'phong tro quan 7' (bỏ dấu, đ -> d, viết thường)."""
+    text = " ".join(p for p in parts if p)
+    text = text.replace("đ", "d").replace("Đ", "D")
+    text = unicodedata.normalize("NFD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.lower().split())
+
+
+def query_tokens(query):
+    return _TOKEN_RE.findall(fold_text(query))[:MAX_QUERY_TOKENS]
+
+
+_SQLITE_TRIGGERS = {
+    f"{FTS_TABLE}_ai": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON core_room BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, search_document) VALUES (new.id, new.search_document);
+        END""",
+    f"{FTS_TABLE}_ad": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON core_room BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_document) VALUES ('delete', old.id, old.search_document);
+        END""",
+    f"{FTS_TABLE}_au": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF search_document ON core_room BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_document) VALUES ('delete', old.id, old.search_document);
+            INSERT INTO {FTS_TABLE}(rowid, search_document) VALUES (new.id, new.search_document);
+        END""",
+}
+
+_fts_available = None
+
+
+def sqlite_fts_available():
+    global _fts_available
+    if _fts_available is None:
+        with connection.cursor() as cursor:
+            _fts_available = FTS_TABLE in connection.introspection.table_names(cursor)
+    return _fts_available
+
+
+def install_fulltext_index(conn):
+    """
+    Tạo index full-text cho search_document (gọi từ migration và sau mỗi lần
+    migrate). Trên SQLite, migration nào dựng lại bảng core_room sẽ làm mất
+    trigger nên hàm này tạo lại trigger và rebuild bảng FTS khi cần.
+    """
+    global _fts_available
+    with conn.cursor() as cursor:
+        if conn.vendor == "postgresql":
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS room_search_document_gin "
+                f"ON core_room USING GIN ({PG_TSVECTOR})"
+            )
+        elif conn.vendor == "sqlite":
+            try:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                    "search_document, content='core_room', content_rowid='id')"
+                )
+            except OperationalError:
+                # SQLite build không có FTS5: dùng icontains
+                return
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'core_room'"
+            )
+            existing = {row[0] for row in cursor.fetchall()}
+            if not set(_SQLITE_TRIGGERS) <= existing:
+                for sql in _SQLITE_TRIGGERS.values():
+                    cursor.execute(sql)
+                cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    _fts_available = None
+
+
+def drop_fulltext_index(conn):
+    global _fts_available
+    with conn.cursor() as cursor:
+        if conn.vendor == "postgresql":
+            cursor.execute("DROP INDEX IF EXISTS room_search_document_gin")
+        elif conn.vendor == "sqlite":
+            for name in _SQLITE_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    _fts_available = None
+
+
+def search_rooms(queryset, query):
+    """
+    Lọc queryset phòng theo từ khoá (mọi từ phải xuất hiện, từ cuối khớp
+    tiền tố) và annotate search_rank: số càng lớn càng liên quan.
+    Trả về (queryset, ranked) với ranked=False khi không có index full-text.
+    """
+    tokens = query_tokens(query)
+    if not tokens:
+        return queryset, False
+
+    if connection.vendor == "postgresql":
+        tsquery = " & ".join(tokens) + ":*"
+        queryset = queryset.filter(
+            RawSQL(f"{PG_TSVECTOR} @@ to_tsquery('simple', %s)", (tsquery,), output_field=BooleanField())
+        ).annotate(
+            search_rank=RawSQL(f"ts_rank({PG_TSVECTOR}, to_tsquery('simple', %s))", (tsquery,), output_field=FloatField())
+        )
+        return queryset, True
+
+    if connection.vendor == "sqlite" and sqlite_fts_available():
+        match = " ".join(f'"{t}"' for t in tokens) + "*"
+        queryset = queryset.filter(
+            RawSQL(f'"core_room"."id" IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)', (match,), output_field=BooleanField())
+        ).annotate(
+            # bm25() càng âm càng liên quan nên đổi dấu
+            search_rank=RawSQL(
+                f'(SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid = "core_room"."id")',
+                (match,), output_field=FloatField(),
+            )
+        )
+        return queryset, True
+
+    for token in tokens:
+        queryset = queryset.filter(search_document__icontains=token)
+    return queryset, False
+
+
+class RoomSearchFilter(BaseFilterBackend):
+    """
+    ?search=phong tro quan 7 -> tìm trong tên, địa chỉ, mô tả, không phân biệt dấu.
+    Kết quả được sắp theo độ liên quan trừ khi client truyền ?ordering=.
+    """
+    search_param = "search"
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, "").strip()
+        if not query:
+            return queryset
+        queryset, ranked = search_rooms(queryset, query)
+        if ranked and not request.query_params.get("ordering"):
+            queryset = queryset.order_by("-search_rank", "id")
+        return queryset
+
+    def get_schema_operation_parameters(self, view):
+        return [{
+            "name": self.search_param,
+            "required": False,
+            "in": "query",
+            "description": "Tìm theo tên, địa chỉ, mô tả (không phân biệt dấu)",
+            "schema": {"type": "string"},
+        }]
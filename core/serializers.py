@@ -1,11 +1,34 @@
 from rest_framework import serializers
-from .models import Room, Contract, MeterReading, Invoice, Payment, RentalRequest
+from .models import Room, Contract, MeterReading, Invoice, Payment, RentalRequest, Tariff, Job
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, transaction
+from django.utils import timezone
+import re
 from django.contrib.auth import get_user_model
 from drf_spectacular.utils import extend_schema_field
 from decimal import Decimal
+from rest_framework.reverse import reverse
+from .exceptions import ConflictError, LockTimeoutError
+from .renewals import MODES as RENEWAL_MODES
+from .tariffs import attach_costs, parse_tiers
+from .billing import MAX_PERIODS as MAX_BILLING_PERIODS, change_invoice_status, period_range
+from .blobstore import BlobError, get_blob_store, get_private_blob_store, is_data_uri, resolve_blob_ref, save_data_uri
+from .imaging import ingest_images, thumbnail_url, thumbnail_urls
 
 User = get_user_model()
 
+
+def absolute_media_url(request, url):
+    """Đổi URL tương đối (/media/...) thành URL tuyệt đối theo host của request"""
+    if isinstance(url, str) and url.startswith('/'):
+        return request.build_absolute_uri(url)
+    return url
+
+
+# Kỳ ghi chỉ số / hoá đơn dạng YYYY-MM
+PERIOD_RE = re.compile(r"^\d{4}-(0[1-9]|1[0-2])$")
+
+
 class RoomSerializer(serializers.ModelSerializer):
     # Override image field to accept both file and base64 string
     image = serializers.CharField(required=False, allow_null=True, allow_blank=True)
@@ -19,10 +42,39 @@ class RoomSerializer(serializers.ModelSerializer):
         help_text="List of base64 encoded images"
     )
     
+    thumbnails = serializers.SerializerMethodField(help_text="URL thumbnail của ảnh đại diện theo kích thước (px)")
+    
     class Meta:
         model = Room
-        fields = "__all__"
-        
+        # search_document chỉ dùng nội bộ cho tìm kiếm
+        exclude = ["search_document"]
+        read_only_fields = ["location_source"]
+        
+    @extend_schema_field(serializers.DictField(child=serializers.CharField()))
+    def get_thumbnails(self, obj):
+        # Ảnh đại diện chọn như cover_image (Room.refresh_image_summary): image
+        # là base64/trống thì lấy ảnh đầu tiên trong images
+        images = obj.images if isinstance(obj.images, list) else []
+        cover = obj.cover_image or next(
+            (url for url in [obj.image] + images if isinstance(url, str) and url and not url.startswith("data:")),
+            "",
+        )
+        return {str(size): url for size, url in thumbnail_urls(cover).items()}
+    
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        request = self.context.get('request')
+        if request is not None:
+            # URL blob là đường dẫn tương đối, frontend chạy ở domain khác
+            if data.get('image'):
+                data['image'] = absolute_media_url(request, data['image'])
+            if data.get('images'):
+                data['images'] = [absolute_media_url(request, url) for url in data['images']]
+            data['thumbnails'] = {
+                size: absolute_media_url(request, url) for size, url in data['thumbnails'].items()
+            }
+        return data
+    
     def validate_bedrooms(self, value):
         if value < 1:
             raise serializers.ValidationError("Số phòng ngủ phải ít nhất là 1")
@@ -38,28 +90,35 @@ class RoomSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Giá thuê phải lớn hơn 0")
         return value
     
+    def validate_latitude(self, value):
+        if value is not None and not -90 <= value <= 90:
+            raise serializers.ValidationError("Vĩ độ phải trong khoảng -90 đến 90")
+        return value
+    
+    def validate_longitude(self, value):
+        if value is not None and not -180 <= value <= 180:
+            raise serializers.ValidationError("Kinh độ phải trong khoảng -180 đến 180")
+        return value
+    
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        if 'latitude' in attrs or 'longitude' in attrs:
+            lat = attrs.get('latitude', getattr(self.instance, 'latitude', None))
+            lng = attrs.get('longitude', getattr(self.instance, 'longitude', None))
+            if (lat is None) != (lng is None):
+                raise serializers.ValidationError("Cần nhập cả vĩ độ và kinh độ")
+            # Toạ độ chủ nhà nhập không bị ghi đè khi đổi địa chỉ; xoá toạ độ thì lấy lại theo quận
+            attrs['latitude'], attrs['longitude'] = lat, lng
+            attrs['location_source'] = Room.LOCATION_OWNER if lat is not None else ''
+        return attrs
+    
     def create(self, validated_data):
         additional_images_json = validated_data.pop('additional_images', None)
         image_base64 = validated_data.pop('image_base64', None)
         images_base64 = validated_data.pop('images_base64', None)
         
-        # Xử lý ảnh chính: lưu trực tiếp base64 string vào cột image
-        image_data = validated_data.get('image')
-        if image_data and isinstance(image_data, str) and image_data.startswith('data:image/'):
-            # Lưu base64 string trực tiếp vào cột image
-            validated_data['image'] = image_data
-        elif image_base64:
-            # Fallback cho image_base64 field (deprecated)
-            validated_data['image'] = image_base64
-        
-        # Xử lý array images từ frontend
-        images_data = validated_data.get('images')
-        if images_data and isinstance(images_data, list):
-            # Frontend đã gửi array string, lưu trực tiếp
-            validated_data['images'] = images_data
-        elif images_base64:
-            # Fallback cho images_base64 field (deprecated)
-            validated_data['images'] = images_base64
+        # Ảnh base64 được lưu vào blob store, cột image/images chỉ giữ URL
+        images_data = self._store_images(validated_data, image_base64, images_base64)
         
         # Tạo room
         room = super().create(validated_data)
@@ -75,23 +134,8 @@ class RoomSerializer(serializers.ModelSerializer):
         image_base64 = validated_data.pop('image_base64', None)
         images_base64 = validated_data.pop('images_base64', None)
         
-        # Xử lý ảnh chính: lưu trực tiếp base64 string vào cột image
-        image_data = validated_data.get('image')
-        if image_data and isinstance(image_data, str) and image_data.startswith('data:image/'):
-            # Lưu base64 string trực tiếp vào cột image
-            validated_data['image'] = image_data
-        elif image_base64:
-            # Fallback cho image_base64 field (deprecated)
-            validated_data['image'] = image_base64
-        
-        # Xử lý array images từ frontend
-        images_data = validated_data.get('images')
-        if images_data and isinstance(images_data, list):
-            # Frontend đã gửi array string, lưu trực tiếp
-            validated_data['images'] = images_data
-        elif images_base64:
-            # Fallback cho images_base64 field (deprecated)
-            validated_data['images'] = images_base64
+        # Ảnh base64 được lưu vào blob store, cột image/images chỉ giữ URL
+        images_data = self._store_images(validated_data, image_base64, images_base64)
         
         # Cập nhật room
         room = super().update(instance, validated_data)
@@ -102,51 +146,46 @@ class RoomSerializer(serializers.ModelSerializer):
         
         return room
     
-    def _convert_base64_to_file(self, base64_string, filename_prefix='image'):
-        """Convert base64 string to Django file object"""
-        import base64
-        import uuid
-        from django.core.files.base import ContentFile
-        
-        if not base64_string.startswith('data:image/'):
-            raise serializers.ValidationError("Invalid base64 image format")
-        
-        # Extract format and data
-        format_part, imgstr = base64_string.split(';base64,')
-        ext = format_part.split('/')[-1]
-        
-        # Generate unique filename
-        filename = f"{filename_prefix}_{uuid.uuid4().hex[:8]}.{ext}"
+    def _store_images(self, validated_data, image_base64=None, images_base64=None):
+        """
+        Chuẩn hoá ảnh base64 trong validated_data và chuyển sang blob store
+        (một lô, xử lý song song). Trả về danh sách images gốc mà client gửi lên.
+        """
+        image_data = validated_data.get('image')
+        if not image_data and image_base64:
+            # Fallback cho image_base64 field (deprecated)
+            image_data = image_base64
         
-        # Decode and create file
-        data = base64.b64decode(imgstr)
-        return ContentFile(data, name=filename)
+        images_data = validated_data.get('images')
+        images_list = images_data if images_data and isinstance(images_data, list) else images_base64
+        images_list = list(images_list or [])
+        
+        stored = self._ingest([image_data] + images_list)
+        if image_data:
+            validated_data['image'] = stored[0]
+        if images_list:
+            validated_data['images'] = stored[1:]
+        return images_data
+    
+    def _ingest(self, values):
+        try:
+            return ingest_images(values)
+        except BlobError as e:
+            raise serializers.ValidationError({"images": str(e)})
     
     def _process_base64_images(self, room, images_base64_list):
         """Xử lý và lưu danh sách ảnh từ base64"""
-        all_images = []
-        
-        # Convert all base64 images and store them
-        for i, base64_string in enumerate(images_base64_list):
-            try:
-                # Store the base64 data directly in the images array
-                all_images.append(base64_string)
-            except Exception as e:
-                print(f"Error processing image {i}: {e}")
-                continue
+        all_images = self._ingest(images_base64_list)
         
         # Lưu vào field images
         room.images = all_images
-        room.save(update_fields=['images'])
+        update_fields = ['images']
         
         # Also save the first image as main image if not already set
         if not room.image and all_images:
-            try:
-                room.image = self._convert_base64_to_file(all_images[0], f'room_{room.id}_main')
-                room.save(update_fields=['image'])
-                print(f"Saved first image as main image for room {room.id}")
-            except Exception as e:
-                print(f"Error saving main image: {e}")
+            room.image = all_images[0]
+            update_fields.append('image')
+        room.save(update_fields=update_fields)
     
     def _process_images(self, room, additional_images_json):
         """Xử lý và lưu danh sách ảnh"""
@@ -155,7 +194,7 @@ class RoomSerializer(serializers.ModelSerializer):
         # Bắt đầu với ảnh chính nếu có
         all_images = []
         if room.image:
-            all_images.append(room.image.url)
+            all_images.append(room.image)
         
         # Thêm các ảnh bổ sung
         if additional_images_json:
@@ -170,6 +209,115 @@ class RoomSerializer(serializers.ModelSerializer):
         room.images = all_images
         room.save(update_fields=['images'])
 
+class RoomCardSerializer(serializers.ModelSerializer):
+    """Dạng rút gọn cho danh sách phòng, không chứa dữ liệu ảnh/mô tả"""
+    image_url = serializers.SerializerMethodField()
+    
+    # Các cột được load khi list, image/images/detail bị defer ở SQL
+    QUERY_FIELDS = [
+        "id", "name", "base_price", "area_m2", "status", "bedrooms", "bathrooms",
+        "address", "cover_image", "image_count",
+    ]
+    
+    class Meta:
+        model = Room
+        fields = [
+            "id", "name", "base_price", "area_m2", "status", "bedrooms", "bathrooms",
+            "address", "image_url", "image_count",
+        ]
+    
+    @extend_schema_field(serializers.CharField(allow_null=True))
+    def get_image_url(self, obj):
+        if not obj.cover_image:
+            return None
+        url = thumbnail_url(obj.cover_image, settings.ROOM_CARD_THUMBNAIL_SIZE)
+        request = self.context.get('request')
+        return absolute_media_url(request, url) if request else url
+
+
+class RoomImportSerializer(RoomSerializer):
+    """Validate một dòng khi import phòng hàng loạt (không nhận ảnh)"""
+    image = None
+    additional_images = None
+    image_base64 = None
+    images_base64 = None
+    thumbnails = None
+    
+    class Meta:
+        model = Room
+        fields = [
+            "name", "base_price", "area_m2", "status", "bedrooms", "bathrooms",
+            "address", "detail", "latitude", "longitude",
+            "owner_name", "owner_phone", "owner_email",
+        ]
+
+
+class RoomPriceFacetSerializer(serializers.Serializer):
+    min = serializers.DecimalField(max_digits=12, decimal_places=0)
+    max = serializers.DecimalField(max_digits=12, decimal_places=0, allow_null=True)
+    count = serializers.IntegerField()
+
+
+class RoomFacetsSerializer(serializers.Serializer):
+    """Chỉ dùng cho schema của /api/rooms/facets/"""
+    total = serializers.IntegerField()
+    status = serializers.DictField(child=serializers.IntegerField())
+    bedrooms = serializers.DictField(child=serializers.IntegerField())
+    price = RoomPriceFacetSerializer(many=True)
+    price_range = serializers.DictField(child=serializers.DecimalField(max_digits=12, decimal_places=2, allow_null=True))
+
+
+class DateRangeQuerySerializer(serializers.Serializer):
+    """?from=YYYY-MM-DD&to=YYYY-MM-DD (khoảng đóng, tối đa MAX_DAYS ngày)"""
+    MAX_DAYS = 731
+    
+    def __init__(self, *args, defaults=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # "from" là từ khoá Python nên không khai báo field trong thân class được
+        defaults = defaults or {}
+        for name in ("from", "to"):
+            options = {"default": defaults[name]} if name in defaults else {}
+            self.fields[name] = serializers.DateField(**options)
+    
+    def validate(self, attrs):
+        if attrs["to"] < attrs["from"]:
+            raise serializers.ValidationError({"to": "Ngày kết thúc phải sau hoặc bằng ngày bắt đầu"})
+        if (attrs["to"] - attrs["from"]).days >= self.MAX_DAYS:
+            raise serializers.ValidationError({"to": f"Khoảng ngày tối đa {self.MAX_DAYS} ngày"})
+        return attrs
+
+
+class RoomAvailabilitySerializer(serializers.Serializer):
+    """Chỉ dùng cho schema của /api/rooms/availability/"""
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    available = serializers.BooleanField()
+    busy = serializers.ListField(child=serializers.DictField(child=serializers.DateField()))
+    free = serializers.ListField(child=serializers.DictField(child=serializers.DateField()))
+
+
+class RoomTimelineSegmentSerializer(serializers.Serializer):
+    """Chỉ dùng cho schema của /api/rooms/{id}/timeline/"""
+    start = serializers.DateField()
+    end = serializers.DateField()
+    state = serializers.ChoiceField(choices=["OCCUPIED", "ENDED", "MAINT", "FREE"])
+    contract = serializers.IntegerField(required=False, help_text="Chỉ trả về cho chủ nhà")
+
+
+class RoomNearbyQuerySerializer(serializers.Serializer):
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lng = serializers.FloatField(min_value=-180, max_value=180)
+    radius_km = serializers.FloatField(required=False, default=2, min_value=0.05, max_value=50)
+    limit = serializers.IntegerField(required=False, default=50, min_value=1, max_value=200)
+
+
+class RoomNearbySerializer(RoomCardSerializer):
+    distance_km = serializers.FloatField(read_only=True, help_text="Khoảng cách tới điểm tìm kiếm (km)")
+    
+    class Meta(RoomCardSerializer.Meta):
+        fields = RoomCardSerializer.Meta.fields + ["latitude", "longitude", "distance_km"]
+
+
 class RentalRequestCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = RentalRequest
@@ -226,22 +374,47 @@ class RentalRequestSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+def apply_contract_image_ref(validated_data):
+    """Gán ảnh hợp đồng đã upload qua /api/uploads/images/?kind=contract ('blob:<key>') vào contract_image"""
+    ref = validated_data.pop('contract_image_ref', None)
+    if ref:
+        try:
+            key = resolve_blob_ref(ref, store=get_private_blob_store())
+        except BlobError as e:
+            raise serializers.ValidationError({"contract_image_ref": str(e)})
+        validated_data['contract_image'] = get_private_blob_store().media_name(key)
+    return validated_data
+
+
+def apply_contract_image_base64(validated_data):
+    """Ảnh hợp đồng gửi dạng base64 được lưu vào blob store riêng, không giữ base64 trong bảng"""
+    value = validated_data.pop('contract_image_base64', None)
+    if value and is_data_uri(value):
+        try:
+            key = save_data_uri(value, store=get_private_blob_store())
+        except BlobError as e:
+            raise serializers.ValidationError({"contract_image_base64": str(e)})
+        validated_data['contract_image'] = get_private_blob_store().media_name(key)
+        validated_data['contract_image_base64'] = ''
+    return validated_data
+
+
 class ContractCreateSerializer(serializers.ModelSerializer):
     rental_request_id = serializers.IntegerField(write_only=True, required=False)
     contract_image_base64 = serializers.CharField(write_only=True, required=False, allow_blank=True, help_text="Base64 encoded contract image")
+    contract_image_ref = serializers.CharField(write_only=True, required=False, allow_blank=True, help_text="Tham chiếu 'blob:<key>' trả về từ /api/uploads/images/")
     
     class Meta:
         model = Contract
-        fields = ["id", "room", "tenant", "start_date", "end_date", "monthly_rent", "deposit", "billing_cycle", "status", "notes", "contract_image", "contract_image_base64", "rental_request_id"]
+        fields = ["id", "room", "tenant", "start_date", "end_date", "monthly_rent", "deposit", "billing_cycle", "status", "notes", "contract_image", "contract_image_base64", "contract_image_ref", "rental_request_id"]
         read_only_fields = ["status"]
+        # Ảnh hợp đồng chỉ tải qua /api/contracts/{id}/image/
+        extra_kwargs = {"contract_image": {"write_only": True}}
+        # Phòng đã có hợp đồng ACTIVE (uniq_active_contract_per_room) được kiểm tra trong create()
+        # sau khi khoá dòng phòng và trả 409, không dùng UniqueTogetherValidator (400)
+        validators = []
 
     def validate(self, attrs):
-        room: Room = attrs["room"]
-        
-        # Xác nhận phòng có trống không
-        if room.status not in [getattr(Room, "EMPTY", "EMPTY")]:
-            raise serializers.ValidationError({"room": "Phòng này hiện không còn trống"})
-        
         # Kiểm tra ngày bắt đầu và kết thúc
         start_date = attrs.get("start_date")
         end_date = attrs.get("end_date")
@@ -263,33 +436,50 @@ class ContractCreateSerializer(serializers.ModelSerializer):
         return attrs
         
     def create(self, validated_data):
-        # Xử lý contract_image_base64
-        contract_image_base64 = validated_data.pop('contract_image_base64', None)
+        """
+        Tạo hợp đồng trong một transaction: khoá dòng phòng (và yêu cầu thuê)
+        bằng select_for_update rồi kiểm tra trạng thái, nên hai request đồng
+        thời cho cùng một phòng chỉ một cái thành công. Phòng không còn trống,
+        dù do tranh chấp hay đã thuê từ trước, đều trả 409.
+        """
+        # Xử lý contract_image_base64 / contract_image_ref (ghi file trước khi khoá)
+        apply_contract_image_base64(validated_data)
+        apply_contract_image_ref(validated_data)
         
         # Đảm bảo trạng thái là ACTIVE
         validated_data['status'] = Contract.ACTIVE
         
-        # Lấy rental_request nếu có
-        rental_request = validated_data.get('rental_request')
-        
-        # Nếu có contract_image_base64, lưu vào cả 2 field
-        if contract_image_base64 and contract_image_base64.startswith('data:image/'):
-            # Lưu base64 string vào contract_image_base64 field
-            validated_data['contract_image_base64'] = contract_image_base64
-            # Có thể cũng convert thành file cho contract_image nếu cần
-            # validated_data['contract_image'] = self._convert_base64_to_file(contract_image_base64, 'contract')
-        
-        contract = super().create(validated_data)
-        
-        # Cập nhật trạng thái phòng thành RENTED
-        room = contract.room
-        room.status = getattr(Room, "RENTED", "RENTED")
-        room.save(update_fields=["status"])
-        
-        # Cập nhật trạng thái rental_request nếu có
-        if rental_request:
-            rental_request.status = RentalRequest.ACCEPTED
-            rental_request.save(update_fields=["status"])
+        try:
+            with transaction.atomic():
+                room = Room.objects.select_for_update().get(pk=validated_data["room"].pk)
+                if room.status != Room.EMPTY:
+                    raise ConflictError("Phòng này hiện không còn trống, vui lòng chọn phòng khác")
+                validated_data["room"] = room
+
+                # Lấy rental_request nếu có, khoá và kiểm tra lại trạng thái
+                rental_request = validated_data.get('rental_request')
+                if rental_request:
+                    rental_request = RentalRequest.objects.select_for_update().get(pk=rental_request.pk)
+                    if rental_request.status not in [RentalRequest.PENDING, RentalRequest.ACCEPTED]:
+                        raise ConflictError("Yêu cầu thuê đã được xử lý bởi thao tác khác")
+                    validated_data['rental_request'] = rental_request
+
+                contract = super().create(validated_data)
+
+                # Cập nhật trạng thái phòng thành RENTED
+                room.status = Room.RENTED
+                room.save(update_fields=["status", "updated_at"])
+
+                # Cập nhật trạng thái rental_request nếu có
+                if rental_request and rental_request.status != RentalRequest.ACCEPTED:
+                    rental_request.status = RentalRequest.ACCEPTED
+                    rental_request.save(update_fields=["status", "updated_at"])
+        except IntegrityError:
+            # uniq_active_contract_per_room: CSDL không hỗ trợ khoá dòng (SQLite) vẫn chặn được
+            raise ConflictError("Phòng này đã có hợp đồng đang hiệu lực")
+        except OperationalError:
+            # Chờ khoá quá lâu (SQLite "database is locked", lock timeout trên PostgreSQL)
+            raise LockTimeoutError()
             
         return contract
     
@@ -298,12 +488,93 @@ class ContractSerializer(serializers.ModelSerializer):
     tenant_phone = serializers.CharField(source="tenant.phone", read_only=True)
     tenant_email = serializers.EmailField(source="tenant.email", read_only=True)
     room_name = serializers.CharField(source="room.name", read_only=True)
+    contract_image_ref = serializers.CharField(write_only=True, required=False, allow_blank=True, help_text="Tham chiếu 'blob:<key>' trả về từ /api/uploads/images/")
+    contract_image_base64 = serializers.CharField(write_only=True, required=False, allow_blank=True, help_text="Base64 encoded contract image")
+    # Ảnh hợp đồng không nằm trong danh sách, lấy riêng qua /api/contracts/{id}/image/
+    has_contract_image = serializers.SerializerMethodField()
+    contract_image_url = serializers.SerializerMethodField()
     
     class Meta:
         model = Contract
-        fields = ["id","room","tenant","tenant_name","tenant_phone","tenant_email","room_name","monthly_rent","start_date","end_date","deposit","billing_cycle","status","notes","contract_image","contract_image_base64"]
+        fields = ["id","room","tenant","tenant_name","tenant_phone","tenant_email","room_name","monthly_rent","start_date","end_date","deposit","billing_cycle","status","notes","contract_image","contract_image_base64","contract_image_ref","has_contract_image","contract_image_url"]
+        # Ảnh hợp đồng là giấy tờ tùy thân: không trả đường dẫn file, chỉ contract_image_url (có kiểm tra quyền)
+        extra_kwargs = {"contract_image": {"write_only": True}}
+
+    def get_has_contract_image(self, obj) -> bool:
+        if bool(obj.contract_image):
+            return True
+        # has_legacy_image được annotate trong ContractViewSet để không phải đọc cột base64
+        legacy = getattr(obj, "has_legacy_image", None)
+        if legacy is None:
+            legacy = bool(obj.contract_image_base64)
+        return legacy
+
+    @extend_schema_field(serializers.CharField(allow_null=True))
+    def get_contract_image_url(self, obj):
+        if not self.get_has_contract_image(obj):
+            return None
+        return reverse("contract-image", args=[obj.pk], request=self.context.get("request"))
+
+    def update(self, instance, validated_data):
+        apply_contract_image_base64(validated_data)
+        return super().update(instance, apply_contract_image_ref(validated_data))
+
+
+
+class ContractRenewSerializer(serializers.Serializer):
+    # Điều kiện chọn hợp đồng ACTIVE cần gia hạn (cần ít nhất một điều kiện)
+    expiring_before = serializers.DateField(required=False, help_text="Chỉ gia hạn hợp đồng có end_date trước hoặc bằng ngày này")
+    rooms = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, allow_empty=False, help_text="Danh sách id phòng")
+    address = serializers.CharField(required=False, help_text="Địa chỉ phòng chứa chuỗi này (toà nhà, đường...)")
+    # Điều khoản mới
+    end_date = serializers.DateField(help_text="Ngày kết thúc mới")
+    rent_increase_percent = serializers.DecimalField(max_digits=5, decimal_places=2, min_value=Decimal("-100"), max_value=Decimal("100"), default=Decimal("0"))
+    mode = serializers.ChoiceField(choices=RENEWAL_MODES, default=RENEWAL_MODES[0], help_text="extend: sửa hợp đồng hiện tại; reissue: tạo hợp đồng mới (PENDING) nối tiếp, có hiệu lực khi hợp đồng hiện tại hết hạn")
+    dry_run = serializers.BooleanField(default=False, help_text="Chỉ tính kết quả, không lưu")
+
+    def validate(self, attrs):
+        if not any(attrs.get(name) for name in ("expiring_before", "rooms", "address")):
+            raise serializers.ValidationError("Cần ít nhất một điều kiện: expiring_before, rooms hoặc address")
+        if attrs["end_date"] <= timezone.localdate():
+            raise serializers.ValidationError({"end_date": "Ngày kết thúc mới phải sau hôm nay"})
+        return attrs
+
+    def filter_contracts(self, queryset):
+        data = self.validated_data
+        if data.get("expiring_before"):
+            queryset = queryset.filter(end_date__lte=data["expiring_before"])
+        if data.get("rooms"):
+            queryset = queryset.filter(room_id__in=data["rooms"])
+        if data.get("address"):
+            queryset = queryset.filter(room__address__icontains=data["address"])
+        return queryset
 
 
+class ContractRenewalSerializer(serializers.Serializer):
+    contract = serializers.IntegerField()
+    room = serializers.IntegerField()
+    old_end_date = serializers.DateField()
+    new_end_date = serializers.DateField()
+    old_rent = serializers.DecimalField(max_digits=12, decimal_places=2)
+    new_rent = serializers.DecimalField(max_digits=12, decimal_places=2)
+    new_contract = serializers.IntegerField(allow_null=True, help_text="Id hợp đồng mới (mode=reissue)")
+
+
+class ContractRenewResultSerializer(serializers.Serializer):
+    matched = serializers.IntegerField()
+    renewed = serializers.IntegerField()
+    skipped = serializers.IntegerField(help_text="Hợp đồng đã kéo dài quá ngày kết thúc mới hoặc (reissue) phòng đã có hợp đồng PENDING")
+    dry_run = serializers.BooleanField()
+    results = ContractRenewalSerializer(many=True)
+
+
+class MeterReadingListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        # Tính tiền điện nước theo bảng giá cho cả danh sách trong một lượt (core.tariffs)
+        readings = list(data.all() if hasattr(data, "all") else data)
+        attach_costs(readings)
+        return super().to_representation(readings)
+
 
 class MeterReadingSerializer(serializers.ModelSerializer):
     kwh = serializers.SerializerMethodField(read_only=True)
@@ -319,16 +590,40 @@ class MeterReadingSerializer(serializers.ModelSerializer):
             "elec_price","water_price",
             "kwh","m3","elec_cost","water_cost","created_at"
         ]
+        # Bỏ trống thì lấy theo chỉ số mới của kỳ trước (xem validate)
+        extra_kwargs = {"elec_prev": {"required": False}, "water_prev": {"required": False}}
+        list_serializer_class = MeterReadingListSerializer
 
     def validate(self, attrs):
-        if attrs["elec_curr"] < attrs["elec_prev"]:
-            raise serializers.ValidationError({"elec_curr":"Chỉ số điện mới không được nhỏ hơn chỉ số cũ."})
-        if attrs["water_curr"] < attrs["water_prev"]:
-            raise serializers.ValidationError({"water_curr":"Chỉ số nước mới không được nhỏ hơn chỉ số cũ."})
+        instance = self.instance
+        contract = attrs.get("contract", getattr(instance, "contract", None))
+        period = attrs.get("period", getattr(instance, "period", None))
+        if contract is not None and contract.status != Contract.ACTIVE:
+            raise serializers.ValidationError({"contract":"Hợp đồng không ở trạng thái ACTIVE."})
         # kỳ phải kiểu YYYY-MM
-        period = attrs["period"]
-        if len(period) != 7 or period[4] != "-" or not (period[:4].isdigit() and period[5:7].isdigit()):
+        if period is not None and not PERIOD_RE.match(period):
             raise serializers.ValidationError({"period":"Định dạng phải là YYYY-MM (ví dụ 2025-08)."})
+
+        # Không gửi chỉ số cũ: giữ giá trị đang lưu, hoặc lấy chỉ số mới của kỳ gần nhất trước đó
+        prior = None
+        for kind, label in (("elec", "điện"), ("water", "nước")):
+            prev_field, curr_field = f"{kind}_prev", f"{kind}_curr"
+            if prev_field not in attrs:
+                if instance is not None:
+                    attrs[prev_field] = getattr(instance, prev_field)
+                else:
+                    if prior is None:
+                        # Seek trên unique index (contract, period)
+                        prior = (
+                            MeterReading.objects.filter(contract=contract, period__lt=period)
+                            .order_by("-period").values("elec_curr", "water_curr").first()
+                        ) or {}
+                    if curr_field not in prior:
+                        raise serializers.ValidationError({prev_field: "Chưa có chỉ số kỳ trước, cần nhập chỉ số cũ."})
+                    attrs[prev_field] = prior[curr_field]
+            curr = attrs.get(curr_field, getattr(instance, curr_field, None))
+            if curr is not None and curr < attrs[prev_field]:
+                raise serializers.ValidationError({curr_field: f"Chỉ số {label} mới không được nhỏ hơn chỉ số cũ."})
         return attrs
 
     @extend_schema_field(serializers.DecimalField(max_digits=10, decimal_places=2))
@@ -341,20 +636,91 @@ class MeterReadingSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(serializers.DecimalField(max_digits=10, decimal_places=2))
     def get_elec_cost(self, obj):
-        return (obj.elec_curr - obj.elec_prev) * obj.elec_price
+        # Theo bảng giá bậc thang nếu có, ngược lại theo elec_price
+        if not hasattr(obj, "elec_cost"):
+            attach_costs([obj])
+        return obj.elec_cost
 
     @extend_schema_field(serializers.DecimalField(max_digits=10, decimal_places=2))
     def get_water_cost(self, obj):
-        return (obj.water_curr - obj.water_prev) * obj.water_price
-    
-    def validate(self, attrs):
-        attrs = super().validate(attrs)
-        contract = attrs["contract"]
-        if contract.status != Contract.ACTIVE:
-            raise serializers.ValidationError({"contract":"Hợp đồng không ở trạng thái ACTIVE."})
-        return attrs
+        if not hasattr(obj, "water_cost"):
+            attach_costs([obj])
+        return obj.water_cost
     
 
+class MeterReadingRowSerializer(serializers.Serializer):
+    """
+    Một dòng của /api/meter-readings/bulk/. Chỉ kiểm tra kiểu dữ liệu, không
+    truy vấn CSDL; hợp đồng và chỉ số kỳ trước được kiểm tra theo lô trong
+    core.readings. Bỏ trống elec_prev/water_prev thì lấy chỉ số mới của kỳ trước.
+    """
+    contract = serializers.IntegerField(min_value=1)
+    period = serializers.CharField(required=False, help_text="YYYY-MM, mặc định lấy theo ?period=")
+    elec_prev = serializers.IntegerField(min_value=0, required=False)
+    elec_curr = serializers.IntegerField(min_value=0)
+    water_prev = serializers.IntegerField(min_value=0, required=False)
+    water_curr = serializers.IntegerField(min_value=0)
+    elec_price = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=0, required=False)
+    water_price = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=0, required=False)
+
+    def validate_period(self, value):
+        if not PERIOD_RE.match(value):
+            raise serializers.ValidationError("Định dạng phải là YYYY-MM (ví dụ 2025-08).")
+        return value
+
+
+class MeterReadingSheetRowSerializer(serializers.Serializer):
+    contract = serializers.IntegerField()
+    room_id = serializers.IntegerField()
+    room_name = serializers.CharField()
+    tenant_name = serializers.CharField()
+    period = serializers.CharField()
+    prev_period = serializers.CharField(allow_null=True, help_text="Kỳ lấy chỉ số cũ, null nếu chưa có")
+    elec_prev = serializers.IntegerField(allow_null=True)
+    water_prev = serializers.IntegerField(allow_null=True)
+    elec_price = serializers.DecimalField(max_digits=12, decimal_places=2)
+    water_price = serializers.DecimalField(max_digits=12, decimal_places=2)
+    reading = serializers.IntegerField(allow_null=True, help_text="Id chỉ số đã nhập của kỳ này")
+    elec_curr = serializers.IntegerField(allow_null=True)
+    water_curr = serializers.IntegerField(allow_null=True)
+
+
+class MeterReadingAnomalySerializer(serializers.Serializer):
+    reading = serializers.IntegerField()
+    contract = serializers.IntegerField()
+    period = serializers.CharField()
+    metric = serializers.ChoiceField(choices=["kwh", "m3"])
+    value = serializers.FloatField(help_text="Tiêu thụ của kỳ")
+    median = serializers.FloatField(allow_null=True, help_text="Trung vị các kỳ trước")
+    mad = serializers.FloatField(allow_null=True)
+    q1 = serializers.FloatField(allow_null=True)
+    q3 = serializers.FloatField(allow_null=True)
+    z = serializers.FloatField(allow_null=True, help_text="Robust z-score")
+    direction = serializers.ChoiceField(choices=["HIGH", "LOW", "NEGATIVE"])
+    history = serializers.IntegerField(help_text="Số kỳ lịch sử dùng làm mốc")
+
+
+class MeterReadingBulkResultSerializer(serializers.Serializer):
+    created = serializers.IntegerField()
+    updated = serializers.IntegerField()
+    failed = serializers.IntegerField()
+    errors = serializers.ListField(child=serializers.DictField())
+
+
+class TariffSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Tariff
+        fields = ["id", "kind", "name", "effective_from", "tiers", "created_at"]
+        read_only_fields = ["created_at"]
+
+    def validate_tiers(self, value):
+        try:
+            parse_tiers(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+        return value
+
+
 class InvoiceSerializer(serializers.ModelSerializer):
     contract_info = serializers.SerializerMethodField(read_only=True)
     room_name = serializers.CharField(source="contract.room.name", read_only=True)
@@ -374,8 +740,8 @@ class InvoiceSerializer(serializers.ModelSerializer):
         return {
             "id": obj.contract.id,
             "room_name": obj.contract.room.name,
-            "tenant_name": obj.contract.tenant.user.full_name,
-            "tenant_email": obj.contract.tenant.user.email
+            "tenant_name": obj.contract.tenant.full_name,
+            "tenant_email": obj.contract.tenant.email
         }
 
     def validate_period(self, value):
@@ -402,6 +768,7 @@ class InvoiceGenerateSerializer(serializers.Serializer):
     period = serializers.CharField(max_length=7)
     service_cost = serializers.DecimalField(max_digits=12, decimal_places=2, default=0, required=False)
     due_days = serializers.IntegerField(default=30, required=False, help_text="Số ngày để thanh toán")
+    force = serializers.BooleanField(default=False, help_text="Vẫn tạo hóa đơn khi chỉ số điện nước bất thường")
 
     def validate_period(self, value):
         if len(value) != 7 or value[4] != "-" or not (value[:4].isdigit() and value[5:7].isdigit()):
@@ -419,6 +786,85 @@ class InvoiceGenerateSerializer(serializers.Serializer):
         return attrs
 
 
+class InvoiceBatchSerializer(serializers.Serializer):
+    period = serializers.CharField(required=False, help_text="Một kỳ YYYY-MM")
+    period_from = serializers.CharField(required=False, help_text="Kỳ đầu (YYYY-MM) khi lập bù nhiều kỳ")
+    period_to = serializers.CharField(required=False, help_text="Kỳ cuối (YYYY-MM), tính cả kỳ này")
+    rooms = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, allow_empty=False)
+    contracts = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, allow_empty=False)
+    service_cost = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=0, default=Decimal("0"))
+    due_days = serializers.IntegerField(min_value=0, default=30, help_text="Số ngày để thanh toán")
+    force = serializers.BooleanField(default=False, help_text="Vẫn lập hóa đơn khi chỉ số điện nước bất thường")
+    dry_run = serializers.BooleanField(default=False, help_text="Chỉ tính kết quả, không lưu")
+
+    def validate(self, attrs):
+        for name in ("period", "period_from", "period_to"):
+            if name in attrs and not PERIOD_RE.match(attrs[name]):
+                raise serializers.ValidationError({name: "Định dạng phải là YYYY-MM (ví dụ 2025-08)."})
+        if "period" in attrs:
+            if "period_from" in attrs or "period_to" in attrs:
+                raise serializers.ValidationError("Chỉ truyền period hoặc period_from/period_to")
+            attrs["periods"] = [attrs["period"]]
+        elif "period_from" in attrs and "period_to" in attrs:
+            if attrs["period_from"] > attrs["period_to"]:
+                raise serializers.ValidationError({"period_to": "Kỳ cuối phải sau hoặc bằng kỳ đầu"})
+            attrs["periods"] = period_range(attrs["period_from"], attrs["period_to"])
+            if len(attrs["periods"]) > MAX_BILLING_PERIODS:
+                raise serializers.ValidationError({"period_to": f"Tối đa {MAX_BILLING_PERIODS} kỳ mỗi lần"})
+        else:
+            raise serializers.ValidationError("Cần period hoặc cả period_from và period_to")
+        return attrs
+
+    def filter_contracts(self, queryset):
+        data = self.validated_data
+        if data.get("rooms"):
+            queryset = queryset.filter(room_id__in=data["rooms"])
+        if data.get("contracts"):
+            queryset = queryset.filter(pk__in=data["contracts"])
+        return queryset
+
+
+class ContractPeriodSerializer(serializers.Serializer):
+    contract = serializers.IntegerField()
+    period = serializers.CharField()
+
+
+class InvoiceBatchResultSerializer(serializers.Serializer):
+    periods = serializers.ListField(child=serializers.CharField())
+    dry_run = serializers.BooleanField()
+    created = serializers.IntegerField(help_text="Số hóa đơn đã lập (dry_run: luôn 0)")
+    would_create = serializers.IntegerField(required=False, help_text="Chỉ khi dry_run: số hóa đơn sẽ được lập")
+    existing = serializers.IntegerField(help_text="Số hóa đơn đã có (kể cả vừa được lập song song), bỏ qua")
+    missing_reading = ContractPeriodSerializer(many=True, help_text="Chưa có chỉ số điện nước, bỏ qua")
+    anomaly = ContractPeriodSerializer(many=True, help_text="Chỉ số bất thường, bỏ qua (gửi force=true để vẫn lập)")
+
+
+class JobSerializer(serializers.ModelSerializer):
+    percent = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = [
+            "id", "name", "payload", "status", "attempts", "max_attempts", "run_at",
+            "progress_done", "progress_total", "progress_message", "percent",
+            "result", "error", "created_by", "created_at", "started_at", "finished_at",
+        ]
+        read_only_fields = fields
+
+    @extend_schema_field(serializers.FloatField(allow_null=True))
+    def get_percent(self, obj):
+        if obj.status == Job.SUCCEEDED:
+            return 100.0
+        if not obj.progress_total:
+            return None
+        return round(min(obj.progress_done / obj.progress_total, 1) * 100, 1)
+
+
+class JobQueuedSerializer(serializers.Serializer):
+    job = serializers.IntegerField()
+    status_url = serializers.URLField(help_text="GET để theo dõi tiến độ và kết quả")
+
+
 class TenantSerializer(serializers.ModelSerializer):
     """Serializer cho User với role TENANT"""
     
@@ -469,8 +915,14 @@ class PaymentSerializer(serializers.ModelSerializer):
     def _recompute_invoice_status(self, invoice: Invoice):
         paid = sum(p.amount for p in invoice.payments.filter(status="CONFIRMED"))
         # nếu cần làm tròn: paid = Decimal(paid).quantize(Decimal("0.01"))
+        target = invoice.status
         if paid >= invoice.total and invoice.status not in ("CANCELLED",):
-            invoice.status = "PAID"
+            target = "PAID"
         elif invoice.status == "PAID" and paid < invoice.total:
-            invoice.status = "UNPAID"
-        invoice.save(update_fields=["status"])
+            target = "UNPAID"
+        if target != invoice.status:
+            user = getattr(self.context.get("request"), "user", None)
+            # Đổi trạng thái và ghi log trong một transaction
+            change_invoice_status(
+                invoice, target, user=user if getattr(user, "is_authenticated", False) else None,
+            )
@@ -0,0 +1,13 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_room_version
+from .models import Room
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+def invalidate_room_cache(sender, **kwargs):
+    # Đợi commit để request khác không cache lại dữ liệu cũ trước khi transaction kết thúc
+    transaction.on_commit(bump_room_version)
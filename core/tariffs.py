@@ -0,0 +1,177 @@
+"""
+Tính tiền điện nước theo bảng giá bậc thang (core.models.Tariff).
+
+Tiền được tính bằng số nguyên (xu = 1/100 đồng) để không sai số. Với một
+mảng sản lượng u và các bậc [lower_i, upper_i) giá p_i:
+
+    cost = sum_i clip(u - lower_i, 0, upper_i - lower_i) * p_i
+
+tính một lần cho cả mảng bằng NumPy (ma trận sản lượng theo bậc nhân giá).
+Kỳ chưa có bảng giá áp dụng thì tính theo đơn giá phẳng trên MeterReading.
+
+Các bảng giá được nạp một lần và giữ trong bộ nhớ của process, chỉ nạp lại
+khi phiên bản bảng giá đọc từ CSDL (số bản ghi, updated_at mới nhất) thay
+đổi, nên mọi process (web, run_worker, run_scheduler) thấy cùng bảng giá.
+"""
+import bisect
+import threading
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+import numpy as np
+from django.db.models import Count, Max
+
+from .models import Tariff
+
+CENTS = 100
+# Độ rộng bậc cuối (không giới hạn), đủ lớn và không tràn int64 khi nhân giá
+UNBOUNDED = 10 ** 12
+
+
+def parse_tiers(tiers):
+    """
+    Kiểm tra danh sách bậc và trả về (upper_bounds, price_cents); bậc cuối có
+    upper = None. Sai định dạng thì raise ValueError.
+    """
+    if not isinstance(tiers, list) or not tiers:
+        raise ValueError("Cần ít nhất một bậc giá")
+    bounds, prices = [], []
+    previous = 0
+    for index, tier in enumerate(tiers, start=1):
+        if not isinstance(tier, dict) or "price" not in tier:
+            raise ValueError(f"Bậc {index}: cần có price")
+        try:
+            price = Decimal(str(tier["price"]))
+        except InvalidOperation:
+            raise ValueError(f"Bậc {index}: price không hợp lệ")
+        if price < 0 or price != price.quantize(Decimal("0.01")):
+            raise ValueError(f"Bậc {index}: price phải không âm và tối đa 2 chữ số thập phân")
+        up_to = tier.get("up_to")
+        last = index == len(tiers)
+        if up_to is None:
+            if not last:
+                raise ValueError(f"Bậc {index}: chỉ bậc cuối được để up_to = null")
+        elif not isinstance(up_to, int) or isinstance(up_to, bool) or up_to <= previous:
+            raise ValueError(f"Bậc {index}: up_to phải là số nguyên lớn hơn bậc trước")
+        else:
+            previous = up_to
+        bounds.append(up_to)
+        prices.append(int(price * CENTS))
+    return bounds, prices
+
+
+class TieredTariff:
+    def __init__(self, tariff_id, effective_from, tiers):
+        self.id = tariff_id
+        self.effective_from = effective_from
+        bounds, prices = parse_tiers(tiers)
+        upper = np.array([UNBOUNDED if b is None else b for b in bounds], dtype=np.int64)
+        self.lower = np.concatenate(([0], upper[:-1]))
+        self.width = upper - self.lower
+        self.price_cents = np.array(prices, dtype=np.int64)
+
+    def cost_cents(self, usage):
+        """Mảng sản lượng (số nguyên) -> mảng tiền (xu). Sản lượng âm tính là 0."""
+        usage = np.asarray(usage, dtype=np.int64)
+        per_tier = np.clip(usage[:, None] - self.lower[None, :], 0, self.width[None, :])
+        return per_tier @ self.price_cents
+
+
+class TariffBook:
+    """Mọi bảng giá, tra theo loại và ngày."""
+
+    def __init__(self, tariffs):
+        self._by_kind = {}
+        for tariff in sorted(tariffs, key=lambda t: (t.kind, t.effective_from)):
+            self._by_kind.setdefault(tariff.kind, []).append(
+                TieredTariff(tariff.id, tariff.effective_from, tariff.tiers)
+            )
+        self._dates = {kind: [t.effective_from for t in items] for kind, items in self._by_kind.items()}
+
+    @classmethod
+    def load(cls):
+        return cls(Tariff.objects.all())
+
+    def for_date(self, kind, day):
+        index = bisect.bisect_right(self._dates.get(kind, []), day) - 1
+        return self._by_kind[kind][index] if index >= 0 else None
+
+    def for_period(self, kind, period):
+        # Áp dụng bảng giá có hiệu lực vào ngày đầu kỳ
+        return self.for_date(kind, date(int(period[:4]), int(period[5:7]), 1))
+
+
+_book = None
+_book_version = None
+_book_lock = threading.Lock()
+
+
+def get_tariff_version():
+    # Tạo/sửa làm đổi updated_at mới nhất, xoá làm đổi số bản ghi
+    version = Tariff.objects.aggregate(count=Count("id"), updated=Max("updated_at"))
+    return version["count"], version["updated"]
+
+
+def get_tariff_book():
+    global _book, _book_version
+    version = get_tariff_version()
+    with _book_lock:
+        if _book is None or _book_version != version:
+            _book = TariffBook.load()
+            _book_version = version
+        return _book
+
+
+def _cents(values):
+    return np.rint(np.asarray(values, dtype=np.float64) * CENTS).astype(np.int64)
+
+
+def usage_costs(kind, periods, usage, flat_prices, book=None):
+    """
+    Tiền (xu, mảng int64) cho các sản lượng usage thuộc các kỳ periods.
+    Nhóm theo kỳ để mỗi bảng giá được áp dụng một lần cho cả nhóm; kỳ không
+    có bảng giá thì dùng flat_prices (đơn giá trên chỉ số).
+    """
+    book = book or get_tariff_book()
+    periods = np.asarray(periods)
+    usage = np.asarray(usage, dtype=np.int64)
+    # Đơn giá phẳng tính theo xu: usage * round(price * 100)
+    costs = np.maximum(usage, 0) * _cents(flat_prices)
+    for period in np.unique(periods):
+        tariff = book.for_period(kind, str(period))
+        if tariff is not None:
+            mask = periods == period
+            costs[mask] = tariff.cost_cents(usage[mask])
+    return costs
+
+
+def to_decimal(cents):
+    return Decimal(int(cents)).scaleb(-2)
+
+
+def reading_costs(readings, book=None):
+    """
+    Tiền điện và nước (Decimal) cho danh sách MeterReading trong một lượt:
+    trả về list (elec_cost, water_cost) theo thứ tự readings.
+    """
+    if not readings:
+        return []
+    book = book or get_tariff_book()
+    periods = [r.period for r in readings]
+    elec = usage_costs(
+        Tariff.ELEC, periods,
+        [r.elec_curr - r.elec_prev for r in readings], [r.elec_price for r in readings], book,
+    )
+    water = usage_costs(
+        Tariff.WATER, periods,
+        [r.water_curr - r.water_prev for r in readings], [r.water_price for r in readings], book,
+    )
+    return [(to_decimal(e), to_decimal(w)) for e, w in zip(elec, water)]
+
+
+def attach_costs(readings):
+    """Gán reading.elec_cost / reading.water_cost (Decimal) cho cả danh sách."""
+    for reading, (elec_cost, water_cost) in zip(readings, reading_costs(readings)):
+        reading.elec_cost = elec_cost
+        reading.water_cost = water_cost
+    return readings
@@ -0,0 +1,169 @@
+"""
+Các tác vụ nền chạy định kỳ (management command hoặc bộ lập lịch).
+
+Mỗi tác vụ là một hàm nhận tham số keyword, trả về dict thống kê và chạy
+lại nhiều lần vẫn cho cùng kết quả (idempotent).
+"""
+import logging
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .anomalies import shift_period
+from .billing import generate_invoices
+from .blobgc import gc_blobs
+from .cache import bump_room_version
+from .jobs import report_progress
+from .models import Contract, Invoice, InvoiceStatusLog, Room
+
+logger = logging.getLogger(__name__)
+
+
+def end_contracts(ids, today, now):
+    """
+    Kết thúc các hợp đồng ACTIVE trong ids bằng vài câu UPDATE (gọi trong
+    transaction; dùng chung cho expire_contracts và API kết thúc hợp đồng).
+
+    Hợp đồng gia hạn (PENDING) của cùng phòng được chuyển ACTIVE nếu đã tới
+    start_date; chưa tới (kết thúc sớm) thì bị huỷ (ENDED) để không chặn
+    phòng mãi. Phòng chỉ được trả về EMPTY nếu không còn hợp đồng ACTIVE nào.
+    Trả về dict ended, activated, canceled, released.
+    """
+    # Điều kiện status lặp lại để chạy đồng thời với thao tác khác vẫn đúng
+    ended = Contract.objects.filter(pk__in=ids, status=Contract.ACTIVE).update(
+        status=Contract.ENDED, updated_at=now
+    )
+    successors = Contract.objects.filter(
+        status=Contract.PENDING,
+        room_id__in=Contract.objects.filter(pk__in=ids).values("room_id"),
+    )
+    # Hợp đồng gia hạn bắt đầu ngay sau hợp đồng vừa kết thúc
+    activated = successors.filter(start_date__lte=today).update(status=Contract.ACTIVE, updated_at=now)
+    canceled = successors.filter(start_date__gt=today).update(status=Contract.ENDED, updated_at=now)
+    released = (
+        Room.objects.filter(contracts__pk__in=ids, status=Room.RENTED)
+        .exclude(contracts__status=Contract.ACTIVE)
+        .update(status=Room.EMPTY, updated_at=now)
+    )
+    if ended:
+        transaction.on_commit(bump_room_version)
+    return {"ended": ended, "activated": activated, "canceled": canceled, "released": released}
+
+
+def expire_contracts(today=None, batch_size=1000, dry_run=False):
+    """
+    Kết thúc các hợp đồng ACTIVE đã quá end_date, chuyển hợp đồng gia hạn
+    (PENDING) của các phòng đó sang ACTIVE và trả phòng còn lại về EMPTY.
+
+    Xử lý theo lô id tăng dần; mỗi lô là một transaction gọi end_contracts,
+    không save() từng bản ghi.
+    """
+    today = today or timezone.localdate()
+    now = timezone.now()
+    stats = {"contracts_ended": 0, "contracts_activated": 0, "renewals_canceled": 0, "rooms_released": 0, "batches": 0}
+    last_id = 0
+
+    while True:
+        ids = list(
+            Contract.objects.filter(status=Contract.ACTIVE, end_date__lt=today, pk__gt=last_id)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        last_id = ids[-1]
+        stats["batches"] += 1
+
+        if dry_run:
+            stats["contracts_ended"] += len(ids)
+            continue
+
+        with transaction.atomic():
+            result = end_contracts(ids, today, now)
+        stats["contracts_ended"] += result["ended"]
+        stats["contracts_activated"] += result["activated"]
+        stats["renewals_canceled"] += result["canceled"]
+        stats["rooms_released"] += result["released"]
+        report_progress(stats["contracts_ended"], message=f"Đã kết thúc {stats['contracts_ended']} hợp đồng")
+
+    logger.info("expire_contracts(%s): %s", today, stats)
+    return stats
+
+
+def mark_overdue_invoices(today=None, batch_size=1000, dry_run=False):
+    """
+    Chuyển hóa đơn UNPAID đã quá due_date sang OVERDUE và ghi InvoiceStatusLog.
+
+    Chỉ các hóa đơn vừa quá hạn còn UNPAID nên mỗi lần chạy chỉ tốn công cho
+    phần mới (index status, due_date). Xử lý theo lô id tăng dần, mỗi lô một
+    transaction ngắn: UPDATE các id còn UNPAID rồi bulk_create log.
+    """
+    today = today or timezone.localdate()
+    stats = {"invoices_overdue": 0, "batches": 0}
+    last_id = 0
+
+    while True:
+        ids = list(
+            Invoice.objects.filter(status=Invoice.UNPAID, due_date__lt=today, pk__gt=last_id)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        last_id = ids[-1]
+        stats["batches"] += 1
+
+        if dry_run:
+            stats["invoices_overdue"] += len(ids)
+            continue
+
+        now = timezone.now()
+        with transaction.atomic():
+            # Khoá lại các dòng còn UNPAID: hóa đơn vừa được thanh toán song song thì bỏ qua
+            ids = list(
+                Invoice.objects.select_for_update()
+                .filter(pk__in=ids, status=Invoice.UNPAID)
+                .values_list("pk", flat=True)
+            )
+            Invoice.objects.filter(pk__in=ids).update(status=Invoice.OVERDUE, updated_at=now)
+            InvoiceStatusLog.objects.bulk_create([
+                InvoiceStatusLog(invoice_id=pk, from_status=Invoice.UNPAID, to_status=Invoice.OVERDUE, changed_at=now)
+                for pk in ids
+            ])
+        stats["invoices_overdue"] += len(ids)
+        report_progress(stats["invoices_overdue"], message=f"Đã chuyển {stats['invoices_overdue']} hóa đơn quá hạn")
+
+    logger.info("mark_overdue_invoices(%s): %s", today, stats)
+    return stats
+
+
+def generate_invoices_task(periods=None, rooms=None, contracts=None, service_cost="0", due_days=30, force=False, dry_run=False):
+    """
+    Bản nhận tham số JSON của core.billing.generate_invoices, dùng cho job nền
+    và bộ lập lịch. periods bỏ trống thì lập cho kỳ của tháng trước.
+    """
+    if not periods:
+        periods = [shift_period(timezone.localdate().strftime("%Y-%m"), -1)]
+    queryset = Contract.objects.all()
+    if rooms:
+        queryset = queryset.filter(room_id__in=rooms)
+    if contracts:
+        queryset = queryset.filter(pk__in=contracts)
+    return generate_invoices(
+        periods,
+        contracts=queryset,
+        service_cost=Decimal(str(service_cost)),
+        due_days=due_days,
+        force=force,
+        dry_run=dry_run,
+    )
+
+
+# Tác vụ có thể gọi theo tên (job nền core.jobs, bộ lập lịch, management command)
+TASKS = {
+    "expire_contracts": expire_contracts,
+    "mark_overdue_invoices": mark_overdue_invoices,
+    "generate_invoices": generate_invoices_task,
+    "gc_blobs": gc_blobs,
+}
@@ -0,0 +1,90 @@
+"""
+Upload ảnh theo luồng (multipart/form-data) thẳng vào blob store.
+
+BlobUploadHandler thay cho upload handler mặc định của Django: mỗi chunk
+được băm SHA-256 và ghi ra file tạm ngay khi nhận, nên bộ nhớ dùng cho một
+upload không phụ thuộc kích thước ảnh. Khi file kết thúc, file tạm được đổi
+tên thành blob theo nội dung.
+"""
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+
+from .blobstore import BLOB_REF_PREFIX, get_blob_store, sniff_image_ext
+
+
+class StoredBlob:
+    """Kết quả của một file đã upload xong (thay cho UploadedFile)."""
+
+    def __init__(self, key, url, size, created, field_name, file_name):
+        self.key = key
+        self.url = url
+        self.size = size
+        self.created = created
+        self.field_name = field_name
+        self.name = file_name
+
+    @property
+    def ref(self):
+        return f"{BLOB_REF_PREFIX}{self.key}"
+
+
+class BlobUploadHandler(FileUploadHandler):
+    def __init__(self, request=None, max_size=None, store=None):
+        super().__init__(request)
+        self.max_size = max_size or settings.BLOB_UPLOAD_MAX_BYTES
+        self.store = store or get_blob_store()
+        self.errors = []
+        self.too_large = False
+        self._tmp = None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self._tmp = self.store.open_temp()
+        self._hasher = hashlib.sha256()
+        self._size = 0
+        self._ext = None
+
+    def receive_data_chunk(self, raw_data, start):
+        if self._ext is None:
+            self._ext = sniff_image_ext(raw_data[:32])
+            if self._ext is None:
+                self._abort(f"{self.file_name}: chỉ chấp nhận ảnh JPEG, PNG, GIF, WebP hoặc AVIF")
+        self._size += len(raw_data)
+        if self._size > self.max_size:
+            self.too_large = True
+            self._abort(f"{self.file_name}: ảnh vượt quá {self.max_size // (1024 * 1024)} MB")
+        self._hasher.update(raw_data)
+        self._tmp.write(raw_data)
+        # Không chuyển dữ liệu cho handler khác (không giữ bản sao trong RAM)
+        return None
+
+    def file_complete(self, file_size):
+        if self._tmp is None:
+            return None
+        self._tmp.close()
+        if self._ext is None:
+            self._cleanup()
+            self.errors.append(f"{self.file_name}: file rỗng")
+            return None
+        key, created = self.store.commit_temp(self._tmp.name, self._hasher.hexdigest(), self._ext)
+        self._tmp = None
+        return StoredBlob(key, self.store.url(key), file_size, created, self.field_name, self.file_name)
+
+    def upload_interrupted(self):
+        self._cleanup()
+
+    def _abort(self, message):
+        self.errors.append(message)
+        self._cleanup()
+        # Đọc bỏ phần body còn lại để trả lỗi 4xx bình thường cho client
+        raise StopUpload(connection_reset=False)
+
+    def _cleanup(self):
+        if self._tmp is not None:
+            self._tmp.close()
+            if os.path.exists(self._tmp.name):
+                os.unlink(self._tmp.name)
+            self._tmp = None
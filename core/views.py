@@ -1,21 +1,52 @@
 from rest_framework import viewsets, filters, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.reverse import reverse
 from rest_framework.permissions import IsAuthenticated 
 from rest_framework.views import APIView
+from rest_framework.parsers import JSONParser, MultiPartParser
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Room, Contract, MeterReading, Invoice, Payment, RentalRequest
+from .models import Room, Contract, MeterReading, Invoice, Payment, RentalRequest, Tariff, Job
 from django.contrib.auth import get_user_model
 from .serializers import (
-    RoomSerializer, ContractSerializer, ContractCreateSerializer, 
-    MeterReadingSerializer, InvoiceSerializer, InvoiceGenerateSerializer,
-    TenantSerializer, PaymentSerializer, RentalRequestSerializer, RentalRequestCreateSerializer
+    RoomSerializer, RoomCardSerializer, RoomFacetsSerializer, DateRangeQuerySerializer,
+    RoomAvailabilitySerializer, RoomTimelineSegmentSerializer, RoomImportSerializer, RoomNearbySerializer, RoomNearbyQuerySerializer, ContractSerializer, ContractCreateSerializer, 
+    MeterReadingSerializer, MeterReadingRowSerializer, MeterReadingBulkResultSerializer, MeterReadingSheetRowSerializer, MeterReadingAnomalySerializer, TariffSerializer, InvoiceSerializer, InvoiceGenerateSerializer, InvoiceBatchSerializer, InvoiceBatchResultSerializer,
+    JobSerializer, JobQueuedSerializer,
+    TenantSerializer, PaymentSerializer, RentalRequestSerializer, RentalRequestCreateSerializer,
+    ContractRenewSerializer, ContractRenewResultSerializer, PERIOD_RE, absolute_media_url,
 )
 from drf_spectacular.utils import extend_schema_view, extend_schema, OpenApiParameter
+from drf_spectacular.types import OpenApiTypes
 from .permissions import IsOwnerRole, TenantSelfManagePermission, ContractPermission
+from .filters import RoomFilterSet, room_facets
+from .search import RoomSearchFilter
+from .geo import nearby_room_ids
+from .cache import bump_room_version, cached_room_response
+from .renewals import renew_contracts
+from .tasks import end_contracts
+from .readings import reading_sheet, upsert_readings
+from .anomalies import detect_anomalies
+from .tariffs import reading_costs
+from .billing import change_invoice_status, generate_invoices, invoice_room_price
+from .jobs import enqueue
+from .occupancy import room_availability, room_timeline
+from .importers import FORMATS as IMPORT_FORMATS, CSVRowsParser, JSONLinesParser, detect_format, iter_rows
+from .pagination import RoomPagination
+from .blobstore import BLOB_REF_PREFIX, EXTENSION_CONTENT_TYPES, BlobError, decode_data_uri, get_blob_store, get_private_blob_store
+from .imaging import VARIANT_SOURCE_EXTENSIONS, ensure_variant, ingest_blob, thumbnail_urls, variant_supported
+from .uploads import BlobUploadHandler
+from .exceptions import ConflictError
+from .blobgc import discard_unreferenced
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.views.decorators.http import require_safe
+from django.utils.cache import patch_vary_headers
 from django.utils import timezone
 from datetime import timedelta
-from django.db.models import Sum, Count, Q
+from django.db import transaction
+from django.db.models import BooleanField, Count, ExpressionWrapper, Q, Sum
 from django.db.models.functions import TruncMonth
 import re
 
@@ -23,7 +54,7 @@ User = get_user_model()
 
 # ---------- ROOMS ----------
 @extend_schema_view(
-    list=extend_schema(tags=["Rooms"]),
+    list=extend_schema(tags=["Rooms"], responses=RoomCardSerializer(many=True)),
     retrieve=extend_schema(tags=["Rooms"]),
     create=extend_schema(tags=["Rooms"]),
     update=extend_schema(tags=["Rooms"]),
@@ -34,10 +65,430 @@ class RoomViewSet(viewsets.ModelViewSet):
     queryset = Room.objects.all().order_by("id")
     serializer_class = RoomSerializer
     permission_classes = [IsOwnerRole]
+    pagination_class = RoomPagination
+
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, RoomSearchFilter]
+    filterset_class = RoomFilterSet
+    ordering_fields = ["id", "area_m2", "base_price", "name", "bedrooms"]  
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == "list":
+            # Không đọc image/images/detail khi list, ảnh đại diện lấy từ cover_image
+            queryset = queryset.only(*RoomCardSerializer.QUERY_FIELDS)
+        return queryset
+
+    def get_serializer_class(self):
+        return RoomCardSerializer if self.action == "list" else RoomSerializer
+
+    def list(self, request, *args, **kwargs):
+        # Danh sách phòng là public, cache theo phiên bản bảng phòng (core.cache)
+        return cached_room_response(request, "list", lambda: super(RoomViewSet, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return cached_room_response(request, "detail", lambda: super(RoomViewSet, self).retrieve(request, *args, **kwargs))
+
+    @extend_schema(
+        tags=["Rooms"],
+        parameters=[
+            DateRangeQuerySerializer,
+            OpenApiParameter(name="available", description="1: chỉ trả về phòng trống suốt khoảng ngày", required=False, type=bool),
+        ],
+        responses={200: RoomAvailabilitySerializer(many=True)},
+    )
+    @action(detail=False, methods=["get"], url_path="availability")
+    def availability(self, request):
+        """
+        Phòng trống trong khoảng ngày [from, to] (tính cả hai đầu), dùng được cùng
+        bộ lọc của danh sách phòng. Mỗi phòng kèm các đoạn bận (busy) và trống (free).
+        """
+        params = DateRangeQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        start, end = params.validated_data["from"], params.validated_data["to"]
+
+        rooms = self.filter_queryset(self.get_queryset()).order_by("id").values("id", "name", "status")
+        results = room_availability(rooms, start, end)
+        if request.query_params.get("available", "").lower() in ("1", "true"):
+            results = [room for room in results if room["available"]]
+        return Response({
+            "from": start,
+            "to": end,
+            "count": sum(1 for room in results if room["available"]),
+            "results": results,
+        })
+
+    @extend_schema(
+        tags=["Rooms"],
+        parameters=[DateRangeQuerySerializer],
+        responses={200: RoomTimelineSegmentSerializer(many=True)},
+    )
+    @action(detail=True, methods=["get"], url_path="timeline")
+    def timeline(self, request, pk=None):
+        """Lịch sử dụng của phòng theo từng đoạn ngày (mặc định 180 ngày trước đến 365 ngày sau hôm nay)"""
+        room = self.get_object()
+        today = timezone.localdate()
+        params = DateRangeQuerySerializer(
+            data=request.query_params,
+            defaults={"from": today - timedelta(days=180), "to": today + timedelta(days=365)},
+        )
+        params.is_valid(raise_exception=True)
+        start, end = params.validated_data["from"], params.validated_data["to"]
+        is_owner = getattr(request.user, "role", None) == "OWNER"
+        return Response({
+            "room": room.id,
+            "from": start,
+            "to": end,
+            "segments": room_timeline(room, start, end, include_contracts=is_owner, today=today),
+        })
+
+    @extend_schema(tags=["Rooms"], responses={200: RoomFacetsSerializer})
+    @action(detail=False, methods=["get"], url_path="facets")
+    def facets(self, request):
+        """
+        Số phòng theo trạng thái, số phòng ngủ và khoảng giá, áp dụng cùng bộ
+        lọc/tìm kiếm với danh sách phòng (vd. /api/rooms/facets/?search=quan 7).
+        """
+        def compute():
+            queryset = self.filter_queryset(self.get_queryset())
+            return Response(room_facets(queryset))
+
+        return cached_room_response(
+            request, "facets", compute,
+            ignore_params=(RoomPagination.page_query_param, RoomPagination.page_size_query_param,
+                           RoomPagination.cursor_query_param, RoomPagination.mode_query_param, "ordering"),
+        )
+
+    @extend_schema(
+        tags=["Rooms"],
+        parameters=[
+            OpenApiParameter(name="type", description="csv hoặc jsonl (mặc định đoán theo tên file/Content-Type)", required=False, type=str),
+            OpenApiParameter(name="atomic", description="1: có dòng lỗi thì không tạo phòng nào", required=False, type=bool),
+        ],
+        request={
+            "multipart/form-data": {"type": "object", "properties": {"file": {"type": "string", "format": "binary"}}},
+            "text/csv": {"type": "string"},
+            "application/x-ndjson": {"type": "string"},
+        },
+    )
+    @action(
+        detail=False, methods=["post"], url_path="bulk",
+        parser_classes=[MultiPartParser, CSVRowsParser, JSONLinesParser],
+    )
+    def bulk(self, request):
+        """
+        Import nhiều phòng từ file CSV (dòng đầu là tên cột) hoặc JSON Lines
+        (mỗi dòng một object). Cột giống field của phòng: name, base_price,
+        area_m2, status, bedrooms, bathrooms, address, detail, latitude,
+        longitude, owner_name, owner_phone, owner_email.
+        Dòng hợp lệ được tạo theo lô bulk_create, dòng lỗi được báo theo số dòng.
+        """
+        fmt = request.query_params.get("type")
+        upload = request.FILES.get("file")
+        if upload is not None:
+            stream = upload
+            fmt = fmt or detect_format(upload.name, upload.content_type)
+        else:
+            # Body thô text/csv hoặc application/x-ndjson (core.importers.RowStreamParser)
+            stream = request.data.get("stream")
+            fmt = fmt or request.data.get("format")
+        if stream is None:
+            return Response({"detail": "Thiếu dữ liệu import (field 'file' hoặc body CSV/JSON Lines)"}, status=status.HTTP_400_BAD_REQUEST)
+        if fmt not in IMPORT_FORMATS:
+            return Response({"detail": "type phải là csv hoặc jsonl"}, status=status.HTTP_400_BAD_REQUEST)
+
+        atomic = request.query_params.get("atomic", "").lower() in ("1", "true")
+        batch_size = settings.BULK_IMPORT_BATCH_SIZE
+        errors = []
+        error_count = 0
+        created_ids = []
+        created_count = 0
+        batch = []
+
+        def flush():
+            nonlocal created_count
+            created = Room.objects.bulk_create(batch, batch_size=batch_size)
+            created_count += len(created)
+            created_ids.extend(room.pk for room in created if room.pk is not None)
+            batch.clear()
+
+        with transaction.atomic():
+            for rows, (line_no, row, error) in enumerate(iter_rows(stream, fmt), start=1):
+                if rows > settings.BULK_IMPORT_MAX_ROWS:
+                    errors.append({"line": line_no, "errors": f"Vượt quá {settings.BULK_IMPORT_MAX_ROWS} dòng mỗi lần import"})
+                    error_count += 1
+                    break
+                if error is None:
+                    serializer = RoomImportSerializer(data=row)
+                    if serializer.is_valid():
+                        if atomic and error_count:
+                            # Chế độ atomic đã có lỗi: chỉ validate tiếp để báo lỗi
+                            continue
+                        room = Room(**serializer.validated_data)
+                        # bulk_create không gọi save() nên tự tính các field dẫn xuất
+                        room.refresh_image_summary()
+                        room.refresh_search_document()
+                        room.refresh_location()
+                        batch.append(room)
+                        if len(batch) >= batch_size:
+                            flush()
+                        continue
+                    error = serializer.errors
+                error_count += 1
+                if len(errors) < settings.BULK_IMPORT_MAX_ERRORS:
+                    errors.append({"line": line_no, "errors": error})
+
+            if atomic and error_count:
+                transaction.set_rollback(True)
+                created_ids, created_count = [], 0
+            else:
+                if batch:
+                    flush()
+                if created_count:
+                    transaction.on_commit(bump_room_version)
+
+        body = {"created": created_count, "failed": error_count, "ids": created_ids, "errors": errors}
+        return Response(body, status=status.HTTP_201_CREATED if created_count else status.HTTP_400_BAD_REQUEST)
+
+    @extend_schema(
+        tags=["Rooms"],
+        parameters=[RoomNearbyQuerySerializer],
+        responses={200: RoomNearbySerializer(many=True)},
+    )
+    @action(detail=False, methods=["get"], url_path="nearby")
+    def nearby(self, request):
+        """Phòng trong bán kính radius_km quanh (lat, lng), gần nhất trước; dùng được cùng các bộ lọc của danh sách"""
+        params = RoomNearbyQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        lat, lng = params.validated_data["lat"], params.validated_data["lng"]
+
+        matches = nearby_room_ids(
+            self.filter_queryset(self.get_queryset()), lat, lng,
+            params.validated_data["radius_km"], params.validated_data["limit"],
+        )
+        rooms = Room.objects.only(*RoomCardSerializer.QUERY_FIELDS, "latitude", "longitude").in_bulk(
+            [room_id for room_id, _ in matches]
+        )
+        results = []
+        for room_id, distance in matches:
+            room = rooms.get(room_id)
+            if room is None:
+                continue
+            room.distance_km = round(distance, 3)
+            results.append(room)
+        data = RoomNearbySerializer(results, many=True, context=self.get_serializer_context()).data
+        return Response({"count": len(data), "results": data})
+
+# ---------- UPLOADS ----------
+class ImageUploadView(APIView):
+    """
+    Upload ảnh phòng/hợp đồng dạng multipart/form-data (field "file", có thể nhiều file).
+    Dữ liệu được ghi thẳng vào blob store theo từng chunk; kết quả trả về
+    tham chiếu "blob:<key>" để gửi kèm images/image (phòng) hoặc
+    contract_image_ref (hợp đồng). Ảnh hợp đồng nằm trong store riêng nên
+    không có url.
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    KINDS = ("room", "contract")
+
+    @extend_schema(
+        tags=["Uploads"],
+        parameters=[
+            OpenApiParameter(name="kind", description="room (mặc định) hoặc contract", required=False, type=str),
+        ],
+        request={"multipart/form-data": {"type": "object", "properties": {"file": {"type": "string", "format": "binary"}}}},
+    )
+    def post(self, request):
+        kind = request.query_params.get("kind", "room")
+        if kind not in self.KINDS:
+            return Response({"detail": "kind phải là room hoặc contract"}, status=status.HTTP_400_BAD_REQUEST)
+        # Ảnh hợp đồng cũng chỉ chủ nhà upload (người thuê gửi yêu cầu thuê, không kèm ảnh)
+        if getattr(request.user, "role", None) != "OWNER":
+            label = "ảnh phòng" if kind == "room" else "ảnh hợp đồng"
+            return Response({"detail": f"Chỉ chủ nhà mới được upload {label}"}, status=status.HTTP_403_FORBIDDEN)
+
+        # Ảnh hợp đồng vào store riêng ngoài MEDIA_ROOT, không có URL công khai
+        store = get_private_blob_store() if kind == "contract" else get_blob_store()
+        # Phải gán trước khi đọc request.data/FILES
+        handler = BlobUploadHandler(request._request, store=store)
+        request._request.upload_handlers = [handler]
+        uploaded = request.FILES.getlist("file")
+
+        if handler.errors:
+            # Chỉ xoá blob do request này tạo ra và chưa ai dùng; phần còn lại để gc_blobs dọn
+            discard_unreferenced(store, {blob.key for blob in uploaded if blob.created})
+            return Response(
+                {"detail": handler.errors},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE if handler.too_large else status.HTTP_400_BAD_REQUEST,
+            )
+        if not uploaded:
+            return Response({"detail": "Thiếu file ảnh (field 'file')"}, status=status.HTTP_400_BAD_REQUEST)
+
+        created = {blob.key for blob in uploaded if blob.created}
+        normalized = {}
+        if kind == "room":
+            # Ảnh phòng được chuẩn hoá + sinh thumbnail trong process pool,
+            # bản gốc vừa upload (còn EXIF) bị xoá sau khi chuẩn hoá
+            for blob in uploaded:
+                if blob.key in normalized:
+                    continue
+                try:
+                    normalized[blob.key] = ingest_blob(blob.key)
+                except BlobError as e:
+                    discard_unreferenced(store, created - set(normalized.values()))
+                    return Response({"detail": [f"{blob.name}: {e}"]}, status=status.HTTP_400_BAD_REQUEST)
+            discard_unreferenced(store, created - set(normalized.values()))
+
+        files = []
+        for blob in uploaded:
+            key = normalized.get(blob.key, blob.key)
+            item = {"name": blob.name, "key": key, "ref": f"{BLOB_REF_PREFIX}{key}", "size": store.size(key)}
+            if kind == "room":
+                item["url"] = request.build_absolute_uri(store.url(key))
+                item["thumbnails"] = {
+                    str(size): request.build_absolute_uri(url)
+                    for size, url in thumbnail_urls(store.url(key)).items()
+                }
+            files.append(item)
+        return Response({"files": files}, status=status.HTTP_201_CREATED)
+
+
+# ---------- MEDIA ----------
+BLOB_CACHE_CONTROL = "public, max-age=31536000, immutable"
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _etag_matches(header, etag):
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    # So sánh yếu theo RFC 9110: bỏ tiền tố W/
+    return "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+
+def _parse_range(header, size):
+    """Trả về (start, end) cho Range một đoạn, None nếu không hỗ trợ, False nếu không thỏa được."""
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first == "":
+        # bytes=-N: N byte cuối
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _negotiate_variant(accept):
+    """Chọn định dạng ảnh tốt nhất client chấp nhận (theo IMAGE_NEGOTIATED_FORMATS)."""
+    accepted = set()
+    for part in (accept or "").split(","):
+        media_type, *params = [item.strip() for item in part.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(media_type.lower())
+    for fmt in settings.IMAGE_NEGOTIATED_FORMATS:
+        if f"image/{fmt}" in accepted and variant_supported(fmt):
+            return fmt
+    return None
+
+
+def _file_range_iterator(path, start, length, chunk_size=64 * 1024):
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        while length > 0:
+            chunk = fh.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+@require_safe
+def serve_blob(request, path):
+    """
+    Phục vụ ảnh trong blob store công khai (ảnh phòng, thumbnail); ảnh hợp
+    đồng nằm trong store riêng, chỉ tải qua /api/contracts/<id>/image/.
+    Blob bất biến theo nội dung nên ETag lấy từ SHA-256 và cache vĩnh viễn;
+    hỗ trợ If-None-Match (304), Range (206), chọn WebP/AVIF theo header Accept
+    và chuyển cho proxy phía trước bằng X-Accel-Redirect/X-Sendfile khi cấu
+    hình BLOB_SENDFILE.
+    """
+    store = get_blob_store()
+    resolved = store.resolve_relpath(path)
+    if resolved is None:
+        raise Http404("Không tìm thấy ảnh")
+    file_path, key, size = resolved
+    if not file_path.exists():
+        raise Http404("Không tìm thấy ảnh")
+
+    digest, ext = key.split(".", 1)
+    etag_value = digest if size is None else f"{digest}-{size}"
+    negotiable = ext in VARIANT_SOURCE_EXTENSIONS and settings.IMAGE_NEGOTIATED_FORMATS
+
+    # Trả WebP/AVIF (tạo lần đầu rồi lưu cạnh ảnh gốc) nếu trình duyệt chấp nhận
+    fmt = _negotiate_variant(request.headers.get("Accept")) if negotiable else None
+    variant_path = ensure_variant(file_path, fmt) if fmt else None
+    if variant_path is not None:
+        file_path = variant_path
+        path = f"{path}.{fmt}"
+        ext = fmt
+        etag_value = f"{etag_value}.{fmt}"
+
+    etag = f'"{etag_value}"'
+    content_type = EXTENSION_CONTENT_TYPES.get(ext, "application/octet-stream")
+
+    if _etag_matches(request.headers.get("If-None-Match"), etag):
+        response = HttpResponseNotModified()
+    elif settings.BLOB_SENDFILE == "nginx":
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = settings.BLOB_SENDFILE_PREFIX.rstrip("/") + "/" + path
+    elif settings.BLOB_SENDFILE == "apache":
+        response = HttpResponse(content_type=content_type)
+        response["X-Sendfile"] = str(file_path)
+    else:
+        file_size = file_path.stat().st_size
+        byte_range = None
+        range_header = request.headers.get("Range")
+        if_range = request.headers.get("If-Range")
+        if range_header and (not if_range or if_range == etag):
+            byte_range = _parse_range(range_header, file_size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{file_size}"
+        elif byte_range:
+            start, end = byte_range
+            length = end - start + 1
+            response = StreamingHttpResponse(
+                _file_range_iterator(file_path, start, length), status=206, content_type=content_type
+            )
+            response["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+            response["Content-Length"] = str(length)
+        else:
+            # FileResponse dùng wsgi.file_wrapper (sendfile) nếu server hỗ trợ
+            response = FileResponse(open(file_path, "rb"), content_type=content_type)
+        response["Accept-Ranges"] = "bytes"
+
+    response["ETag"] = etag
+    response["Cache-Control"] = BLOB_CACHE_CONTROL
+    if negotiable:
+        patch_vary_headers(response, ["Accept"])
+    return response
 
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, filters.SearchFilter]
-    search_fields = ["name"]                          
-    ordering_fields = ["id", "area_m2", "base_price", "name"]  
 
 # ---------- RENTAL REQUESTS ----------
 @extend_schema_view(
@@ -166,7 +617,10 @@ class ContractViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         """Filter contracts based on user role"""
-        queryset = super().get_queryset()
+        # Không đọc ảnh base64 cũ khi list/retrieve, chỉ cần biết có ảnh hay không
+        queryset = super().get_queryset().defer("contract_image_base64").annotate(
+            has_legacy_image=ExpressionWrapper(~Q(contract_image_base64=""), output_field=BooleanField())
+        )
         user = self.request.user
         
         if not user.is_authenticated:
@@ -189,23 +643,81 @@ class ContractViewSet(viewsets.ModelViewSet):
         """Create contract with appropriate data"""
         # Chỉ có OWNER mới được tạo hợp đồng chính thức
         if getattr(self.request.user, 'role', None) != 'OWNER':
-            return Response({"detail": "Chỉ chủ nhà mới có quyền tạo hợp đồng"}, status=status.HTTP_403_FORBIDDEN)
-        
+            raise PermissionDenied("Chỉ chủ nhà mới có quyền tạo hợp đồng")
+
         serializer.save()
 
     @extend_schema(tags=["Contracts"])
     @action(detail=True, methods=["post"], url_path="end")
     def end_contract(self, request, pk=None):
+        """
+        Kết thúc hợp đồng ACTIVE giống expire_contracts (core.tasks.end_contracts):
+        hợp đồng gia hạn đã tới ngày bắt đầu được chuyển ACTIVE, chưa tới thì bị
+        huỷ; phòng không còn hợp đồng ACTIVE trả về EMPTY.
+        """
         contract = self.get_object()
-        if contract.status != Contract.ACTIVE:
+        with transaction.atomic():
+            result = end_contracts([contract.pk], timezone.localdate(), timezone.now())
+        if not result["ended"]:
             return Response({"detail": "Hợp đồng không ở trạng thái ACTIVE."}, status=400)
-        contract.status = Contract.ENDED
-        contract.save(update_fields=["status"])
-        # trả phòng về EMPTY
-        room = contract.room
-        room.status = getattr(room, "EMPTY", "EMPTY")
-        room.save(update_fields=["status"])
-        return Response(ContractSerializer(contract).data, status=200)
+        contract.refresh_from_db()
+        return Response(ContractSerializer(contract, context=self.get_serializer_context()).data, status=200)
+
+    @extend_schema(tags=["Contracts"], request=ContractRenewSerializer, responses={200: ContractRenewResultSerializer})
+    @action(detail=False, methods=["post"], url_path="renew")
+    def renew(self, request):
+        """
+        Gia hạn hàng loạt hợp đồng ACTIVE theo điều kiện (expiring_before, rooms,
+        address) với ngày kết thúc và mức tăng giá mới, trong một transaction.
+        """
+        if getattr(request.user, "role", None) != "OWNER":
+            return Response({"detail": "Chỉ chủ nhà mới có quyền gia hạn hợp đồng"}, status=status.HTTP_403_FORBIDDEN)
+        serializer = ContractRenewSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        result = renew_contracts(
+            serializer.filter_contracts(Contract.objects.all()),
+            end_date=data["end_date"],
+            rent_increase_percent=data["rent_increase_percent"],
+            mode=data["mode"],
+            dry_run=data["dry_run"],
+        )
+        return Response(ContractRenewResultSerializer({**result, "dry_run": data["dry_run"]}).data)
+
+    @extend_schema(tags=["Contracts"], responses={(200, "image/*"): OpenApiTypes.BINARY})
+    @action(detail=True, methods=["get"], url_path="image")
+    def image(self, request, pk=None):
+        """
+        Ảnh hợp đồng đã ký (nội dung ảnh). Ảnh là giấy tờ tùy thân nên chỉ tải
+        được qua đây sau khi kiểm tra quyền và không được cache ở proxy/trình duyệt.
+        """
+        contract = self.get_object()
+        if contract.contract_image:
+            name = contract.contract_image.name
+            content_type = EXTENSION_CONTENT_TYPES.get(name.rsplit(".", 1)[-1].lower(), "application/octet-stream")
+            if settings.BLOB_SENDFILE == "nginx":
+                response = HttpResponse(content_type=content_type)
+                response["X-Accel-Redirect"] = contract.contract_image.url
+            elif settings.BLOB_SENDFILE == "apache":
+                response = HttpResponse(content_type=content_type)
+                response["X-Sendfile"] = contract.contract_image.path
+            else:
+                try:
+                    response = FileResponse(contract.contract_image.open("rb"), content_type=content_type)
+                except FileNotFoundError:
+                    raise Http404("Không tìm thấy ảnh hợp đồng")
+        elif contract.has_legacy_image:
+            value = Contract.objects.filter(pk=contract.pk).values_list("contract_image_base64", flat=True).first()
+            try:
+                data, ext = decode_data_uri(value)
+            except BlobError:
+                raise Http404("Ảnh hợp đồng bị lỗi")
+            response = HttpResponse(data, content_type=EXTENSION_CONTENT_TYPES[ext])
+        else:
+            return Response({"detail": "Hợp đồng chưa có ảnh"}, status=status.HTTP_404_NOT_FOUND)
+        response["Cache-Control"] = "private, no-store"
+        response["X-Content-Type-Options"] = "nosniff"
+        return response
 
 @extend_schema_view(
     list=extend_schema(tags=["Readings"]),
@@ -223,8 +735,158 @@ class MeterReadingViewSet(viewsets.ModelViewSet):
     filterset_fields = ["contract", "period"]
     search_fields = ["period"]
     ordering_fields = ["created_at", "period"]
+
+    @extend_schema(
+        tags=["Readings"],
+        parameters=[
+            OpenApiParameter(name="period", description="Kỳ cần kiểm tra (YYYY-MM)", required=True, type=str),
+            OpenApiParameter(name="contract", description="Chỉ kiểm tra một hợp đồng", required=False, type=int),
+        ],
+        responses={200: MeterReadingAnomalySerializer(many=True)},
+    )
+    @action(detail=False, methods=["get"], url_path="anomalies")
+    def anomalies(self, request):
+        """Chỉ số bất thường của một kỳ so với lịch sử tiêu thụ của từng hợp đồng (xem core.anomalies)"""
+        if getattr(request.user, "role", None) != "OWNER":
+            return Response({"detail": "Chỉ chủ nhà mới được xem chỉ số bất thường"}, status=status.HTTP_403_FORBIDDEN)
+        period = request.query_params.get("period", "")
+        if not PERIOD_RE.match(period):
+            return Response({"detail": "period phải có dạng YYYY-MM"}, status=status.HTTP_400_BAD_REQUEST)
+        contract = request.query_params.get("contract")
+        if contract is not None and not contract.isdigit():
+            return Response({"detail": "contract phải là số"}, status=status.HTTP_400_BAD_REQUEST)
+        report = detect_anomalies(period, contract_ids=[int(contract)] if contract else None)
+        return Response({
+            "period": period,
+            "checked": report["checked"],
+            "evaluated": report["evaluated"],
+            "count": len(report["results"]),
+            "results": MeterReadingAnomalySerializer(report["results"], many=True).data,
+        })
+
+    @extend_schema(
+        tags=["Readings"],
+        parameters=[OpenApiParameter(name="period", description="Kỳ cần ghi chỉ số (YYYY-MM)", required=True, type=str)],
+        responses={200: MeterReadingSheetRowSerializer(many=True)},
+    )
+    @action(detail=False, methods=["get"], url_path="sheet")
+    def sheet(self, request):
+        """
+        Phiếu ghi chỉ số của một kỳ cho mọi hợp đồng ACTIVE: chỉ số cũ và đơn giá
+        điền sẵn từ kỳ trước, kèm chỉ số đã nhập của kỳ này (nếu có).
+        """
+        if getattr(request.user, "role", None) != "OWNER":
+            return Response({"detail": "Chỉ chủ nhà mới được xem phiếu ghi chỉ số"}, status=status.HTTP_403_FORBIDDEN)
+        period = request.query_params.get("period", "")
+        if not PERIOD_RE.match(period):
+            return Response({"detail": "period phải có dạng YYYY-MM"}, status=status.HTTP_400_BAD_REQUEST)
+        rows = reading_sheet(period)
+        data = MeterReadingSheetRowSerializer(rows, many=True).data
+        return Response({"period": period, "count": len(data), "results": data})
+
+    @extend_schema(
+        tags=["Readings"],
+        parameters=[
+            OpenApiParameter(name="period", description="Kỳ mặc định (YYYY-MM) cho dòng không có cột period", required=False, type=str),
+            OpenApiParameter(name="type", description="csv hoặc jsonl khi upload file (mặc định đoán theo tên file)", required=False, type=str),
+            OpenApiParameter(name="atomic", description="1: có dòng lỗi thì không ghi dòng nào", required=False, type=bool),
+        ],
+        request={
+            "application/json": MeterReadingRowSerializer(many=True),
+            "multipart/form-data": {"type": "object", "properties": {"file": {"type": "string", "format": "binary"}}},
+            "text/csv": {"type": "string"},
+            "application/x-ndjson": {"type": "string"},
+        },
+        responses={200: MeterReadingBulkResultSerializer},
+    )
+    @action(
+        detail=False, methods=["post"], url_path="bulk",
+        parser_classes=[JSONParser, MultiPartParser, CSVRowsParser, JSONLinesParser],
+    )
+    def bulk(self, request):
+        """
+        Nhập chỉ số cả kỳ cho nhiều hợp đồng: JSON (list, hoặc {"period", "readings"}),
+        CSV hoặc JSON Lines với các cột contract, period, elec_prev, elec_curr,
+        water_prev, water_curr, elec_price, water_price. Kỳ đã có chỉ số thì được ghi đè.
+        """
+        if getattr(request.user, "role", None) != "OWNER":
+            return Response({"detail": "Chỉ chủ nhà mới được nhập chỉ số hàng loạt"}, status=status.HTTP_403_FORBIDDEN)
+
+        period = request.query_params.get("period")
+        upload = request.FILES.get("file")
+        data = request.data
+        if upload is not None:
+            fmt = request.query_params.get("type") or detect_format(upload.name, upload.content_type)
+            if fmt not in IMPORT_FORMATS:
+                return Response({"detail": "type phải là csv hoặc jsonl"}, status=status.HTTP_400_BAD_REQUEST)
+            rows = iter_rows(upload, fmt)
+        elif isinstance(data, dict) and "stream" in data:
+            # Body thô text/csv hoặc application/x-ndjson (core.importers.RowStreamParser)
+            rows = iter_rows(data["stream"], data["format"])
+        else:
+            if isinstance(data, dict):
+                period = period or data.get("period")
+                data = data.get("readings")
+            if not isinstance(data, list):
+                return Response({"detail": "Body JSON phải là list chỉ số hoặc {\"period\", \"readings\": [...]}"}, status=status.HTTP_400_BAD_REQUEST)
+            rows = (
+                (line_no, row, None) if isinstance(row, dict) else (line_no, None, "Mỗi phần tử phải là một object JSON")
+                for line_no, row in enumerate(data, start=1)
+            )
+        if period and not PERIOD_RE.match(period):
+            return Response({"detail": "period phải có dạng YYYY-MM"}, status=status.HTTP_400_BAD_REQUEST)
+
+        atomic = request.query_params.get("atomic", "").lower() in ("1", "true")
+        result = upsert_readings(rows, period=period, atomic=atomic)
+        written = result["created"] + result["updated"]
+        return Response(result, status=status.HTTP_200_OK if written else status.HTTP_400_BAD_REQUEST)
     
     
+# ---------- TARIFFS ----------
+@extend_schema_view(
+    list=extend_schema(tags=["Tariffs"]),
+    retrieve=extend_schema(tags=["Tariffs"]),
+    create=extend_schema(tags=["Tariffs"]),
+    update=extend_schema(tags=["Tariffs"]),
+    partial_update=extend_schema(tags=["Tariffs"]),
+    destroy=extend_schema(tags=["Tariffs"]),
+)
+class TariffViewSet(viewsets.ModelViewSet):
+    """Bảng giá điện nước bậc thang theo ngày hiệu lực"""
+    queryset = Tariff.objects.all()
+    serializer_class = TariffSerializer
+
+    filterset_fields = ["kind"]
+    ordering_fields = ["effective_from", "kind"]
+
+    def get_permissions(self):
+        # OWNER tạo/sửa/xóa, người dùng đã đăng nhập được xem
+        if self.action in ["create", "update", "partial_update", "destroy"]:
+            return [IsOwnerRole()]
+        return [IsAuthenticated()]
+
+
+# ---------- JOBS ----------
+@extend_schema_view(
+    list=extend_schema(tags=["Jobs"]),
+    retrieve=extend_schema(tags=["Jobs"]),
+)
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Trạng thái, tiến độ và kết quả các job nền (core.jobs)"""
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
+
+    filterset_fields = ["name", "status"]
+    ordering_fields = ["created_at", "run_at"]
+
+    def get_queryset(self):
+        queryset = Job.objects.all()
+        # OWNER xem mọi job, người dùng khác chỉ xem job mình tạo
+        if getattr(self.request.user, "role", None) != "OWNER":
+            queryset = queryset.filter(created_by=self.request.user)
+        return queryset
+
+
 # ---------- INVOICES ----------
 @extend_schema_view(
     list=extend_schema(tags=["Invoices"]),
@@ -256,7 +918,7 @@ class InvoiceViewSet(viewsets.ModelViewSet):
 
     def get_permissions(self):
         # OWNER có thể tạo/sửa/xóa, TENANT chỉ xem
-        if self.action in ["create", "update", "partial_update", "destroy", "generate", "send", "cancel"]:
+        if self.action in ["create", "update", "partial_update", "destroy", "generate", "generate_batch", "send", "cancel"]:
             return [IsOwnerRole()]
         return [IsAuthenticated()]
 
@@ -275,20 +937,26 @@ class InvoiceViewSet(viewsets.ModelViewSet):
         period = serializer.validated_data["period"]
         service_cost = serializer.validated_data.get("service_cost", 0)
         due_days = serializer.validated_data.get("due_days", 30)
+
+        # Kiểm tra chỉ số điện nước bất thường trước khi lập hóa đơn
+        if not serializer.validated_data["force"]:
+            anomalies = detect_anomalies(period, contract_ids=[contract.id])["results"]
+            if anomalies:
+                return Response({
+                    "detail": "Chỉ số điện nước của kỳ này bất thường, kiểm tra lại hoặc gửi force=true để vẫn tạo hóa đơn",
+                    "anomalies": MeterReadingAnomalySerializer(anomalies, many=True).data,
+                }, status=status.HTTP_409_CONFLICT)
         
         # Tính tiền phòng
-        room_price = contract.room.base_price
+        room_price = invoice_room_price(contract.monthly_rent, contract.room.base_price)
         
-        # Tính tiền điện và nước từ MeterReading
+        # Tính tiền điện và nước từ MeterReading (bảng giá bậc thang nếu có, xem core.tariffs)
         elec_cost = 0
         water_cost = 0
         
         try:
             meter_reading = MeterReading.objects.get(contract=contract, period=period)
-            elec_usage = meter_reading.elec_curr - meter_reading.elec_prev
-            water_usage = meter_reading.water_curr - meter_reading.water_prev
-            elec_cost = elec_usage * meter_reading.elec_price
-            water_cost = water_usage * meter_reading.water_price
+            elec_cost, water_cost = reading_costs([meter_reading])[0]
         except MeterReading.DoesNotExist:
             # Nếu chưa có meter reading, có thể để 0 hoặc báo lỗi
             pass
@@ -308,6 +976,47 @@ class InvoiceViewSet(viewsets.ModelViewSet):
         
         return Response(InvoiceSerializer(invoice).data, status=status.HTTP_201_CREATED)
 
+    @extend_schema(
+        tags=["Invoices"],
+        request=InvoiceBatchSerializer,
+        parameters=[
+            OpenApiParameter("async", bool, description="1: chạy nền, trả 202 kèm job để theo dõi tiến độ"),
+        ],
+        responses={200: InvoiceBatchResultSerializer, 202: JobQueuedSerializer},
+    )
+    @action(detail=False, methods=["post"], url_path="generate-batch")
+    def generate_batch(self, request):
+        """
+        Lập hóa đơn cho mọi hợp đồng ACTIVE của một kỳ (hoặc nhiều kỳ khi lập bù),
+        có thể giới hạn theo rooms/contracts. Hóa đơn đã có thì bỏ qua.
+        Với ?async=1, việc lập hóa đơn chạy trong job nền (GET /api/jobs/{id}/).
+        """
+        serializer = InvoiceBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        if request.query_params.get("async") in ("1", "true"):
+            job = enqueue("generate_invoices", {
+                "periods": data["periods"],
+                "rooms": data.get("rooms"),
+                "contracts": data.get("contracts"),
+                "service_cost": str(data["service_cost"]),
+                "due_days": data["due_days"],
+                "force": data["force"],
+                "dry_run": data["dry_run"],
+            }, user=request.user)
+            body = {"job": job.id, "status_url": reverse("job-detail", args=[job.id], request=request)}
+            return Response(JobQueuedSerializer(body).data, status=status.HTTP_202_ACCEPTED)
+        result = generate_invoices(
+            data["periods"],
+            contracts=serializer.filter_contracts(Contract.objects.all()),
+            service_cost=data["service_cost"],
+            due_days=data["due_days"],
+            force=data["force"],
+            dry_run=data["dry_run"],
+        )
+        body = {"periods": data["periods"], "dry_run": data["dry_run"], **result}
+        return Response(InvoiceBatchResultSerializer(body).data)
+
     @extend_schema(tags=["Invoices"])
     @action(detail=True, methods=["patch"], url_path="send")
     def send(self, request, pk=None):
@@ -358,8 +1067,8 @@ class InvoiceViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        invoice.status = Invoice.PAID
-        invoice.save(update_fields=["status", "updated_at"])
+        if not change_invoice_status(invoice, Invoice.PAID, user=request.user):
+            raise ConflictError("Trạng thái hóa đơn vừa được thay đổi bởi thao tác khác, vui lòng tải lại")
         
         return Response(
             {"detail": "Hóa đơn đã được đánh dấu thanh toán.", "invoice": InvoiceSerializer(invoice).data},
@@ -378,8 +1087,8 @@ class InvoiceViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        invoice.status = Invoice.OVERDUE
-        invoice.save(update_fields=["status", "updated_at"])
+        if not change_invoice_status(invoice, Invoice.OVERDUE, user=request.user):
+            raise ConflictError("Trạng thái hóa đơn vừa được thay đổi bởi thao tác khác, vui lòng tải lại")
         
         return Response(
             {"detail": "Hóa đơn đã được đánh dấu quá hạn.", "invoice": InvoiceSerializer(invoice).data},
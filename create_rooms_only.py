@@ -46,6 +46,29 @@ def create_room(token, room_data):
         print(f'❌ Lỗi kết nối khi tạo phòng {room_data["name"]}: {e}')
         return None
 
+def create_rooms_bulk(token, rooms):
+    """Tạo nhiều phòng trong một request (JSON Lines, /rooms/bulk/)"""
+    url = f'{BASE_URL}/rooms/bulk/'
+    headers = {
+        'Authorization': f'Bearer {token}',
+        'Content-Type': 'application/x-ndjson'
+    }
+    body = '\n'.join(json.dumps(room, ensure_ascii=False) for room in rooms).encode('utf-8')
+    
+    try:
+        response = requests.post(url, data=body, headers=headers)
+        result = response.json()
+        if response.status_code == 201:
+            print(f'✓ Tạo thành công {result["created"]} phòng')
+        else:
+            print(f'❌ Lỗi tạo phòng: {response.status_code}')
+        for error in result.get('errors', []):
+            print(f'   Dòng {error["line"]}: {error["errors"]}')
+        return result
+    except Exception as e:
+        print(f'❌ Lỗi kết nối khi tạo phòng: {e}')
+        return None
+
 def main():
     print('🏠 Bắt đầu tạo phòng qua API...')
     
@@ -89,8 +112,7 @@ def main():
             }
         ]
         
-        for room_data in rooms_landlord1:
-            create_room(landlord1_token, room_data)
+        create_rooms_bulk(landlord1_token, rooms_landlord1)
 
     # Đăng nhập với landlord2 để tạo phòng
     landlord2_token = login_user('landlord2', 'LandlordSecure456!')
@@ -121,8 +143,7 @@ def main():
             }
         ]
         
-        for room_data in rooms_landlord2:
-            create_room(landlord2_token, room_data)
+        create_rooms_bulk(landlord2_token, rooms_landlord2)
 
     print('\n🎉 Hoàn thành tạo phòng qua API!')
     print('\nDữ liệu đã được tạo:')
@@ -48,6 +48,8 @@ class RentalAPI {
 
     if (contentType && contentType.includes('application/json')) {
       data = await response.json();
+    } else if (contentType && contentType.startsWith('image/')) {
+      data = await response.blob();
     } else {
       data = await response.text();
     }
@@ -174,8 +176,12 @@ class RentalAPI {
   }
 
   // Room methods
-  async getRooms() {
-    return await this.request('/rooms/');
+  async getRooms(params = {}) {
+    // params: bộ lọc của /api/rooms/ (search, base_price__gte, base_price__lte, ...)
+    const query = new URLSearchParams(
+      Object.entries(params).filter(([, value]) => value !== undefined && value !== null && value !== '')
+    ).toString();
+    return await this.request(query ? `/rooms/?${query}` : '/rooms/');
   }
 
   async getRoom(id) {
@@ -278,6 +284,13 @@ class RentalAPI {
     return await this.request(`/contracts/${id}/`);
   }
 
+  // Ảnh hợp đồng không có trong danh sách hợp đồng, chỉ tải khi cần xem
+  async getContractImage(id) {
+    // Ảnh hợp đồng không có URL công khai: tải kèm token rồi hiển thị qua object URL
+    const blob = await this.request(`/contracts/${id}/image/`);
+    return { image: URL.createObjectURL(blob) };
+  }
+
   async createContract(contractData) {
     console.log('Sending contract data:', contractData);
     
@@ -333,6 +346,10 @@ class RentalAPI {
     return await this.request(endpoint);
   }
 
+  async getMeterReadingSheet(period) {
+    return await this.request(`/meter-readings/sheet/?period=${encodeURIComponent(period)}`);
+  }
+
   async createMeterReading(readingData) {
     return await this.request('/meter-readings/', {
       method: 'POST',
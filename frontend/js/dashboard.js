@@ -370,6 +370,8 @@ document.addEventListener("DOMContentLoaded", async () => {
         return { class: 'ended', text: 'Đã kết thúc' };
       case 'SUSPENDED':
         return { class: 'suspended', text: 'Tạm dừng' };
+      case 'PENDING':
+        return { class: 'pending', text: 'Chờ hiệu lực' };
       default:
         return { class: 'pending', text: 'Không xác định' };
     }
@@ -446,10 +448,12 @@ document.addEventListener("DOMContentLoaded", async () => {
       }
 
       // Load additional data
-      const [room, tenant] = await Promise.all([
+      const [room, tenant, contractImage] = await Promise.all([
         api.getRoom(contract.room),
-        api.getTenant(contract.tenant)
+        api.getTenant(contract.tenant),
+        contract.has_contract_image ? api.getContractImage(contract.id) : null
       ]);
+      contract.contract_image_src = contractImage ? contractImage.image : '';
 
       showContractDetailsModal(contract, room, tenant);
     } catch (error) {
@@ -555,7 +559,7 @@ document.addEventListener("DOMContentLoaded", async () => {
             ` : ''}
 
             <!-- Contract Image Section -->
-            ${contract.contract_image_base64 ? `
+            ${contract.contract_image_src ? `
               <div class="info-card">
                 <h3 class="card-title">
                   <i class="fas fa-file-image"></i>
@@ -563,16 +567,16 @@ document.addEventListener("DOMContentLoaded", async () => {
                 </h3>
                 <div class="contract-image-content">
                   <div class="contract-image-wrapper">
-                    <img src="${contract.contract_image_base64}" 
+                    <img src="${contract.contract_image_src}" 
                          alt="Ảnh hợp đồng" 
                          class="contract-image-preview"
-                         onclick="openImageLightbox('${contract.contract_image_base64}')"
+                         onclick="openImageLightbox('${contract.contract_image_src}')"
                          style="cursor: pointer; max-width: 100%; height: auto; border: 1px solid #ddd; border-radius: 4px;">
                   </div>
                   <div class="contract-image-actions" style="margin-top: 10px;">
                     <button type="button" 
                             class="btn btn-primary btn-sm" 
-                            onclick="downloadContractImage('${contract.contract_image_base64}', 'hop-dong-${contract.id}')">
+                            onclick="downloadContractImage('${contract.contract_image_src}', 'hop-dong-${contract.id}')">
                       <i class="fas fa-download"></i> Tải xuống ảnh
                     </button>
                   </div>
@@ -669,10 +673,10 @@ document.addEventListener("DOMContentLoaded", async () => {
     
     // Show download button if contract image exists
     const downloadBtn = document.getElementById('downloadContractBtn');
-    if (contract.contract_image_base64 && downloadBtn) {
+    if (contract.contract_image_src && downloadBtn) {
       downloadBtn.style.display = 'inline-flex';
       downloadBtn.innerHTML = '<i class="fas fa-download"></i> Tải ảnh hợp đồng';
-      downloadBtn.onclick = () => downloadContractImage(contract.contract_image_base64, `hop-dong-${contract.id}`);
+      downloadBtn.onclick = () => downloadContractImage(contract.contract_image_src, `hop-dong-${contract.id}`);
     } else if (downloadBtn) {
       downloadBtn.style.display = 'none';
     }
@@ -1,8 +1,10 @@
 // Function to get rooms from API (using the API client)
-async function fetchRoomsFromAPI() {
+async function fetchRoomsFromAPI(params = {}) {
   try {
     console.log('fetchRoomsFromAPI: Starting API call...');
-    const rooms = await api.getRooms();
+    const data = await api.getRooms(params);
+    // Danh sách phòng có phân trang: {count, next, previous, results}
+    const rooms = Array.isArray(data) ? data : (data.results || []);
     console.log('fetchRoomsFromAPI: Successfully fetched rooms from API:', rooms.length, 'rooms');
     return rooms;
   } catch (error) {
@@ -77,7 +79,6 @@ function renderRooms(rooms) {
     const title = r.name || r.title || 'Phòng không tên';
     const location = r.building?.address || r.address || r.location || 'Chưa có địa chỉ';
     const price = parseFloat(r.base_price || r.price || 0);
-    const description = r.detail || r.description || 'Phòng hiện đại, đầy đủ tiện nghi';
     const bedrooms = r.bedrooms || 1;
     const bathrooms = r.bathrooms || 1;
     const area = r.area_m2 || '45';
@@ -108,7 +109,7 @@ function renderRooms(rooms) {
           <span>${location}</span>
         </div>
         
-        <div class="features" style="display: flex; gap: 0.75rem; margin-bottom: 1rem; flex-wrap: wrap;">
+        <div class="features" style="display: flex; gap: 0.75rem; margin-bottom: 1.5rem; flex-wrap: wrap;">
           <div class="badge feature-badge" style="display: flex; align-items: center; gap: 0.25rem;">
             <i class="fas fa-bed" style="color: var(--accent-blue);"></i>
             <span>${bedrooms} PN</span>
@@ -123,10 +124,6 @@ function renderRooms(rooms) {
           </div>
         </div>
         
-        <p style="color: var(--text-muted); margin-bottom: 1.5rem; line-height: 1.5; font-size: 0.875rem;">
-          ${description.length > 80 ? description.substring(0, 80) + '...' : description}
-        </p>
-        
         <div class="actions" style="display: flex; gap: 0.75rem;">
           <a class="btn btn-primary" href="room.html?id=${r.id}" style="flex: 1; justify-content: center;">
             <i class="fas fa-eye"></i>
@@ -181,30 +178,16 @@ function handleRentNow(roomId) {
   }
 }
 async function applySearch() {
-  const kw = qs("#kw").value.trim().toLowerCase();
-  const loc = qs("#location").value.trim().toLowerCase();
+  const kw = qs("#kw").value.trim();
+  const loc = qs("#location").value.trim();
   const min = parseInt(qs("#priceMin").value || "0", 10);
   const max = parseInt(qs("#priceMax").value || "0", 10);
   
-  // Get rooms from API
-  let rooms = await fetchRoomsFromAPI();
-  
-  // Apply client-side filtering
-  rooms = rooms.filter((r) => {
-    // Map API fields for search
-    const title = r.name || r.title || '';
-    const description = r.detail || r.description || '';
-    const location = r.address || r.location || '';
-    const price = parseFloat(r.base_price || r.price || 0);
-    
-    const okKw =
-      !kw ||
-      title.toLowerCase().includes(kw) ||
-      description.toLowerCase().includes(kw);
-    const okLoc = !loc || location.toLowerCase().includes(loc);
-    const okMin = !min || price >= min;
-    const okMax = !max || price <= max;
-    return okKw && okLoc && okMin && okMax;
+  // Lọc ở server: ?search= tìm không dấu trong tên, địa chỉ và mô tả (danh sách không trả mô tả)
+  const rooms = await fetchRoomsFromAPI({
+    search: [kw, loc].filter(Boolean).join(' '),
+    base_price__gte: min || '',
+    base_price__lte: max || '',
   });
   renderRooms(rooms);
 }
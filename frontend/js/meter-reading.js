@@ -47,6 +47,10 @@ document.addEventListener('DOMContentLoaded', function() {
         input.addEventListener('input', calculateWaterUsage);
     });
 
+    // Điền sẵn chỉ số cũ và đơn giá từ phiếu ghi chỉ số của kỳ
+    contractSelect.addEventListener('change', prefillFromSheet);
+    document.getElementById('period').addEventListener('change', prefillFromSheet);
+
     // Set current month as default
     const now = new Date();
     const currentMonth = `${now.getFullYear()}-${String(now.getMonth() + 1).padStart(2, '0')}`;
@@ -79,6 +83,35 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
+    // Phiếu ghi chỉ số theo kỳ: { 'YYYY-MM': { contractId: row } }
+    const sheetCache = {};
+
+    async function prefillFromSheet() {
+        // Đang sửa chỉ số đã có thì giữ nguyên giá trị
+        if (document.getElementById('readingId').value) return;
+        const contractId = contractSelect.value;
+        const period = document.getElementById('period').value;
+        if (!contractId || !/^\d{4}-\d{2}$/.test(period)) return;
+
+        try {
+            if (!sheetCache[period]) {
+                const sheet = await api.getMeterReadingSheet(period);
+                sheetCache[period] = {};
+                sheet.results.forEach(row => { sheetCache[period][row.contract] = row; });
+            }
+            const row = sheetCache[period][contractId];
+            if (!row) return;
+            if (row.elec_prev !== null) elecPrevInput.value = row.elec_prev;
+            if (row.water_prev !== null) waterPrevInput.value = row.water_prev;
+            elecPriceInput.value = row.elec_price;
+            waterPriceInput.value = row.water_price;
+            calculateElecUsage();
+            calculateWaterUsage();
+        } catch (error) {
+            console.error('Error loading reading sheet:', error);
+        }
+    }
+
     async function loadMeterReadings(params = {}) {
         try {
             showLoading();
@@ -158,6 +191,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 showSuccess('Lưu chỉ số thành công');
             }
             
+            Object.keys(sheetCache).forEach(period => delete sheetCache[period]);
             meterReadingForm.reset();
             document.getElementById('readingId').value = '';
             resetCalculations();
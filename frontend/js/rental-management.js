@@ -1195,6 +1195,7 @@ document.addEventListener("DOMContentLoaded", async () => {
         api.getTenant(contract.tenant)
       ]);
 
+      await loadContractImage(contract);
       showTenantContractDetailsModal(contract, room, tenant);
     } catch (error) {
       console.error('Error loading tenant contract:', error);
@@ -1202,6 +1203,18 @@ document.addEventListener("DOMContentLoaded", async () => {
     }
   };
 
+  // Ảnh hợp đồng được tải riêng qua /contracts/{id}/image/ khi mở chi tiết
+  async function loadContractImage(contract) {
+    contract.contract_image_src = '';
+    if (!contract.has_contract_image) return;
+    try {
+      const result = await api.getContractImage(contract.id);
+      contract.contract_image_src = result.image;
+    } catch (error) {
+      console.error('Error loading contract image:', error);
+    }
+  }
+
   function showTenantContractDetailsModal(contract, room, tenant) {
     const modal = document.getElementById('tenantContractModal');
     const content = document.getElementById('tenantContractDetailsContent');
@@ -1301,7 +1314,7 @@ document.addEventListener("DOMContentLoaded", async () => {
               ` : ''}
 
               <!-- Contract Image Section -->
-              ${contract.contract_image_base64 ? `
+              ${contract.contract_image_src ? `
                 <div class="info-card">
                   <h3 class="card-title">
                     <i class="fas fa-file-image"></i>
@@ -1309,16 +1322,16 @@ document.addEventListener("DOMContentLoaded", async () => {
                   </h3>
                   <div class="contract-image-content">
                     <div class="contract-image-wrapper">
-                      <img src="${contract.contract_image_base64}" 
+                      <img src="${contract.contract_image_src}" 
                            alt="Ảnh hợp đồng" 
                            class="contract-image-preview"
-                           onclick="openTenantImageLightbox('${contract.contract_image_base64}')"
+                           onclick="openTenantImageLightbox('${contract.contract_image_src}')"
                            style="cursor: pointer; max-width: 100%; height: auto; border: 1px solid #ddd; border-radius: 4px;">
                     </div>
                     <div class="contract-image-actions" style="margin-top: 10px;">
                       <button type="button" 
                               class="btn btn-primary btn-sm" 
-                              onclick="downloadContractImage('${contract.contract_image_base64}', 'hop-dong-${contract.id}')">
+                              onclick="downloadContractImage('${contract.contract_image_src}', 'hop-dong-${contract.id}')">
                         <i class="fas fa-download"></i> Tải xuống ảnh
                       </button>
                     </div>
@@ -1430,10 +1443,10 @@ document.addEventListener("DOMContentLoaded", async () => {
     
     // Show download button if contract image exists
     const downloadBtn = document.getElementById('downloadTenantContractBtn');
-    if (contract.contract_image_base64 && downloadBtn) {
+    if (contract.contract_image_src && downloadBtn) {
       downloadBtn.style.display = 'inline-flex';
       downloadBtn.innerHTML = '<i class="fas fa-download"></i> Tải ảnh hợp đồng';
-      downloadBtn.onclick = () => downloadContractImage(contract.contract_image_base64, `hop-dong-${contract.id}`);
+      downloadBtn.onclick = () => downloadContractImage(contract.contract_image_src, `hop-dong-${contract.id}`);
     } else if (downloadBtn) {
       downloadBtn.style.display = 'none';
     }
@@ -2043,6 +2056,8 @@ document.addEventListener("DOMContentLoaded", async () => {
         return { class: 'ended', text: 'Đã kết thúc' };
       case 'SUSPENDED':
         return { class: 'suspended', text: 'Tạm dừng' };
+      case 'PENDING':
+        return { class: 'pending', text: 'Chờ hiệu lực' };
       default:
         return { class: 'pending', text: 'Không xác định' };
     }
@@ -2091,6 +2106,7 @@ document.addEventListener("DOMContentLoaded", async () => {
       const tenant = await api.getTenant(contract.tenant);
 
       // Hiển thị hợp đồng
+      await loadContractImage(contract);
       showTenantContractDetailsModal(contract, room, tenant);
     } catch (error) {
       console.error('Error viewing contract for request:', error);
@@ -104,7 +104,9 @@ function renderRoomsTable() {
     rooms.forEach(room => {
         // Determine image to display
         let imageUrl = null;
-        if (room.image) {
+        if (room.image_url) {
+            imageUrl = room.image_url; // Ảnh đại diện từ danh sách rút gọn
+        } else if (room.image) {
             imageUrl = room.image;
         } else if (room.images && room.images.length > 0) {
             imageUrl = room.images[0];
@@ -158,9 +160,18 @@ function showAddRoomModal() {
     document.getElementById('room-modal').style.display = 'block';
 }
 
-function editRoom(roomId) {
-    const room = rooms.find(r => r.id === roomId);
-    if (!room) return;
+async function editRoom(roomId) {
+    if (!rooms.find(r => r.id === roomId)) return;
+    
+    // Danh sách chỉ có dạng rút gọn, lấy đầy đủ thông tin phòng (ảnh, mô tả, chủ nhà)
+    let room;
+    try {
+        room = await api.getRoom(roomId);
+    } catch (error) {
+        console.error('Error loading room:', error);
+        showError('Không thể tải thông tin phòng: ' + error.message);
+        return;
+    }
     
     currentEditingRoom = room;
     document.getElementById('modal-title').innerHTML = '<i class="fas fa-edit"></i> Sửa thông tin phòng';
@@ -178,9 +178,87 @@ else:
             } if os.getenv('DB_ENGINE') == 'django.db.backends.mysql' else {},
         }
     }
+    if DATABASES["default"]["ENGINE"] == 'django.db.backends.sqlite3':
+        # BEGIN IMMEDIATE: transaction giữ khoá ghi ngay từ đầu. Với BEGIN mặc định (DEFERRED),
+        # hai transaction cùng đọc rồi cùng nâng lên khoá ghi thì một bên bị "database is locked"
+        # ngay lập tức, không chờ timeout (xung đột giả khi tạo hợp đồng cho các phòng khác nhau).
+        DATABASES["default"]["OPTIONS"] = {"transaction_mode": "IMMEDIATE", "timeout": 20}
 
 
 
+# Cache: CACHE_BACKEND = locmem (mặc định, mỗi process một cache), file, redis hoặc
+# fakeredis (RedisCache chạy trên fakeredis trong process, thay Redis khi test; cần `pip install fakeredis`)
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+if CACHE_BACKEND in ('redis', 'fakeredis'):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+            "KEY_PREFIX": "rental",
+        }
+    }
+    if CACHE_BACKEND == 'fakeredis':
+        import fakeredis
+        CACHES["default"]["OPTIONS"] = {"connection_class": fakeredis.FakeConnection}
+elif CACHE_BACKEND == 'file':
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.getenv('CACHE_LOCATION', BASE_DIR / '.cache'),
+            "OPTIONS": {"MAX_ENTRIES": 5000},
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "rental",
+            "OPTIONS": {"MAX_ENTRIES": 2000},
+        }
+    }
+
+# Cache response danh sách/chi tiết phòng (core.cache)
+ROOM_CACHE_ALIAS = 'default'
+ROOM_CACHE_TIMEOUT = int(os.getenv('ROOM_CACHE_TIMEOUT', 300))
+ROOM_CACHE_LOCK_TIMEOUT = 5
+
+# Khoảng giá (VND) cho /api/rooms/facets/
+ROOM_PRICE_BUCKETS = [0, 2_000_000, 3_000_000, 5_000_000, 8_000_000]
+ROOM_BEDROOM_FACETS = [1, 2, 3]  # số phòng ngủ lớn hơn gộp vào "4+"
+
+# Import phòng hàng loạt qua /api/rooms/bulk/
+BULK_IMPORT_BATCH_SIZE = 500
+BULK_IMPORT_MAX_ROWS = int(os.getenv('BULK_IMPORT_MAX_ROWS', 5000))
+BULK_IMPORT_MAX_ERRORS = 100
+
+# Phát hiện chỉ số điện nước bất thường (core.anomalies)
+ANOMALY_HISTORY_MONTHS = 24      # số kỳ trước dùng làm mốc
+ANOMALY_MIN_HISTORY = 3          # ít kỳ hơn thì không đánh giá
+ANOMALY_Z_THRESHOLD = 3.5        # robust z-score (MAD)
+ANOMALY_IQR_K = 3.0              # hàng rào Tukey Q1 - k*IQR, Q3 + k*IQR
+ANOMALY_MIN_SPREAD = 0.1         # sàn của MAD/IQR theo tỉ lệ trung vị
+ANOMALY_MIN_RATIO = 2.5          # chỉ đánh dấu khi > trung vị * 2.5 hoặc < trung vị / 2.5
+ANOMALY_MIN_DELTA = {"kwh": 30, "m3": 3}  # và lệch khỏi trung vị ít nhất chừng này
+
+# Hàng đợi tác vụ nền (core.jobs, manage.py run_worker)
+JOB_MAX_ATTEMPTS = 3
+JOB_RETRY_BACKOFF = 30           # giây, nhân đôi sau mỗi lần thất bại
+JOB_RETRY_BACKOFF_MAX = 3600
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', 2))
+JOB_LOCK_TIMEOUT = 600           # job RUNNING không có heartbeat quá lâu thì coi như worker đã chết
+JOB_HEARTBEAT_INTERVAL = 60      # giây giữa hai lần worker làm mới locked_at của job đang chạy
+
+# Tác vụ định kỳ (core.scheduler, manage.py run_scheduler). schedule theo cú pháp cron, giờ theo TIME_ZONE;
+# task là tên trong core.tasks.TASKS; queue=True thì giao cho run_worker thay vì chạy trong scheduler.
+SCHEDULED_TASKS = {
+    "mark-overdue-invoices": {"schedule": "*/15 * * * *", "task": "mark_overdue_invoices"},
+    "expire-contracts": {"schedule": "10 0 * * *", "task": "expire_contracts"},
+    # Ngày 1 hằng tháng lập hóa đơn cho kỳ tháng trước
+    "monthly-invoices": {"schedule": "0 6 1 * *", "task": "generate_invoices", "queue": True},
+    "gc-blobs": {"schedule": "30 3 * * *", "task": "gc_blobs"},
+}
+SCHEDULER_LEASE = 3600           # giây giữ lịch mỗi lần chạy; hết hạn thì coi như scheduler đã chết
+SCHEDULER_MISFIRE_GRACE = 300    # mốc bị lỡ quá số giây này thì bỏ qua
 
 
 # Password validation
@@ -227,6 +305,33 @@ STATIC_ROOT = os.getenv('STATIC_ROOT', BASE_DIR / 'staticfiles')
 MEDIA_URL = os.getenv('MEDIA_URL', '/media/')
 MEDIA_ROOT = os.getenv('MEDIA_ROOT', BASE_DIR / 'media')
 
+# Thư mục con của MEDIA_ROOT chứa ảnh lưu theo SHA-256 (core.blobstore)
+BLOB_STORAGE_DIR = os.getenv('BLOB_STORAGE_DIR', 'blobs')
+
+# Ảnh hợp đồng (giấy tờ tùy thân) nằm ngoài MEDIA_ROOT, chỉ tải được qua /api/contracts/{id}/image/.
+# Với BLOB_SENDFILE = 'nginx', PRIVATE_SENDFILE_PREFIX là location internal trỏ tới PRIVATE_MEDIA_ROOT.
+PRIVATE_MEDIA_ROOT = os.getenv('PRIVATE_MEDIA_ROOT', BASE_DIR / 'private')
+PRIVATE_SENDFILE_PREFIX = os.getenv('PRIVATE_SENDFILE_PREFIX', '/_private/')
+
+# Ảnh phòng được thu nhỏ về cạnh dài tối đa này và sinh thumbnail các cỡ bên dưới (core.imaging)
+ROOM_IMAGE_MAX_DIMENSION = int(os.getenv('ROOM_IMAGE_MAX_DIMENSION', 2048))
+ROOM_IMAGE_THUMBNAIL_SIZES = (160, 480, 1280)
+ROOM_CARD_THUMBNAIL_SIZE = 480
+IMAGE_PROCESS_WORKERS = int(os.getenv('IMAGE_PROCESS_WORKERS', 2))
+# Thứ tự ưu tiên định dạng trả về thay cho JPEG/PNG theo header Accept (bỏ trống để tắt)
+IMAGE_NEGOTIATED_FORMATS = [f for f in os.getenv('IMAGE_NEGOTIATED_FORMATS', 'avif,webp').split(',') if f]
+
+# Giới hạn kích thước mỗi ảnh upload qua /api/uploads/images/ (bytes)
+BLOB_UPLOAD_MAX_BYTES = int(os.getenv('BLOB_UPLOAD_MAX_BYTES', 10 * 1024 * 1024))
+
+# gc_blobs chỉ xoá blob không được tham chiếu và cũ hơn số giây này (ảnh vừa upload chưa kịp gắn vào phòng)
+BLOB_GC_MIN_AGE = int(os.getenv('BLOB_GC_MIN_AGE', 24 * 3600))
+
+# Giao việc gửi file ảnh cho proxy phía trước: '' (Django tự gửi), 'nginx' (X-Accel-Redirect)
+# hoặc 'apache' (X-Sendfile). Với nginx, BLOB_SENDFILE_PREFIX là location internal trỏ tới thư mục blobs.
+BLOB_SENDFILE = os.getenv('BLOB_SENDFILE', '')
+BLOB_SENDFILE_PREFIX = os.getenv('BLOB_SENDFILE_PREFIX', '/protected-media/blobs/')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
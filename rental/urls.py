@@ -15,10 +15,11 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
+from core.views import serve_blob
 
 
 urlpatterns = [
@@ -28,6 +29,12 @@ urlpatterns = [
     path("api/redoc/", SpectacularRedocView.as_view(url_name="schema"), name="redoc"),
     path("api/", include("core.api")),  # nơi đặt endpoint
     path("api/auth/", include("accounts.urls")),
+    # Ảnh trong blob store được phục vụ cả khi DEBUG=False (ETag, Range, X-Accel-Redirect)
+    re_path(
+        rf"^{settings.MEDIA_URL.lstrip('/')}{settings.BLOB_STORAGE_DIR.strip('/')}/(?P<path>.+)$",
+        serve_blob,
+        name="blob",
+    ),
 ]
 
 # Serve media files in development